@@ -3,13 +3,11 @@ Módulo de control de acceso, permisos y rate limiting.
 """
 import os
 import json
+import asyncio
 from datetime import datetime
 from collections import defaultdict
-from dotenv import load_dotenv
 from telegram import Update
 
-load_dotenv()
-
 # Configuración de acceso
 ADMIN_IDS = set(json.loads(os.getenv("ADMIN_IDS", "[]")))
 MODO_ACCESO = os.getenv("MODO_ACCESO", "abierto")
@@ -24,6 +22,12 @@ peticiones_usuario: dict[int, list[datetime]] = defaultdict(list)
 avisos_usuario: dict[int, int] = defaultdict(int)
 usuarios_baneados: set[int] = set()
 
+# Con varios workers (fragmentos.py) el modo, el límite, los baneados y la lista blanca son comunes:
+# viven en un dict del Manager y cada worker lo copia a sus globales cada INTERVALO_SINCRONIZACION.
+# Claves: "modo", "max_peticiones", ("baneado", user_id) y ("permitido", user_id)
+INTERVALO_SINCRONIZACION = 1
+_compartido = None
+
 
 def es_admin(user_id: int) -> bool:
     """Comprueba si un usuario es administrador."""
@@ -48,6 +52,16 @@ def verificar_rate_limit(user_id: int) -> tuple[bool, int]:
     return True, conteo + 1
 
 
+def acceso_permitido(user_id: int) -> bool:
+    """Comprueba baneos y modo restringido sin contar para el rate limit.
+    Para peticiones muy frecuentes y ligeras (inline queries)."""
+    if es_admin(user_id):
+        return True
+    if user_id in usuarios_baneados:
+        return False
+    return MODO_ACCESO != "restringido" or user_id in USUARIOS_PERMITIDOS
+
+
 async def control_acceso(update: Update, stats_callback=None) -> bool:
     """Verifica permisos y rate limit. Devuelve True si puede continuar.
     
@@ -80,7 +94,7 @@ async def control_acceso(update: Update, stats_callback=None) -> bool:
     if not permitido:
         avisos_usuario[user_id] += 1
         if avisos_usuario[user_id] >= MAX_AVISOS_ANTES_DE_BAN:
-            usuarios_baneados.add(user_id)
+            banear_usuario(user_id)
             # Notificar al callback de stats si existe
             if stats_callback:
                 stats_callback("baneados")
@@ -113,6 +127,8 @@ def establecer_modo_acceso(nuevo_modo: str):
     """Establece un nuevo modo de acceso."""
     global MODO_ACCESO
     MODO_ACCESO = nuevo_modo
+    if _compartido is not None:
+        _compartido["modo"] = nuevo_modo
 
 
 def obtener_max_peticiones():
@@ -125,29 +141,82 @@ def establecer_max_peticiones(nuevo_limite: int):
     """Establece un nuevo límite de peticiones."""
     global MAX_PETICIONES_POR_MINUTO
     MAX_PETICIONES_POR_MINUTO = nuevo_limite
+    if _compartido is not None:
+        _compartido["max_peticiones"] = nuevo_limite
 
 
 def banear_usuario(user_id: int):
     """Añade un usuario a la lista de baneados."""
     usuarios_baneados.add(user_id)
+    if _compartido is not None:
+        _compartido[("baneado", user_id)] = True
 
 
 def desbanear_usuario(user_id: int):
     """Elimina un usuario de la lista de baneados."""
     usuarios_baneados.discard(user_id)
     avisos_usuario.pop(user_id, None)
+    if _compartido is not None:
+        _compartido.pop(("baneado", user_id), None)
 
 
 def permitir_usuario(user_id: int):
     """Añade un usuario a la lista blanca."""
     USUARIOS_PERMITIDOS.add(user_id)
+    if _compartido is not None:
+        _compartido[("permitido", user_id)] = True
 
 
 def denegar_usuario(user_id: int):
     """Elimina un usuario de la lista blanca."""
     USUARIOS_PERMITIDOS.discard(user_id)
+    if _compartido is not None:
+        _compartido.pop(("permitido", user_id), None)
 
 
 def obtener_usuarios_baneados() -> set[int]:
-    """Devuelve el conjunto de usuarios baneados."""
+    """Devuelve el conjunto de usuarios baneados (de todos los workers)."""
+    if _compartido is not None:
+        return _usuarios(_compartido.copy(), "baneado")
     return usuarios_baneados
+
+
+# --- Estado compartido entre workers ---
+
+def estado_inicial() -> dict:
+    """Estado de acceso de este proceso, para crear el dict compartido."""
+    estado: dict = {"modo": MODO_ACCESO, "max_peticiones": MAX_PETICIONES_POR_MINUTO}
+    estado.update({("baneado", uid): True for uid in usuarios_baneados})
+    estado.update({("permitido", uid): True for uid in USUARIOS_PERMITIDOS})
+    return estado
+
+
+def _usuarios(estado: dict, tipo: str) -> set[int]:
+    return {clave[1] for clave in estado if isinstance(clave, tuple) and clave[0] == tipo}
+
+
+def _aplicar(estado: dict):
+    """Copia a las globales de este proceso una instantánea del estado compartido."""
+    global MODO_ACCESO, MAX_PETICIONES_POR_MINUTO
+    MODO_ACCESO = estado["modo"]
+    MAX_PETICIONES_POR_MINUTO = estado["max_peticiones"]
+    # Se modifican en sitio: otros módulos pueden tener una referencia a los conjuntos
+    baneados = _usuarios(estado, "baneado")
+    usuarios_baneados.intersection_update(baneados)
+    usuarios_baneados.update(baneados)
+    permitidos = _usuarios(estado, "permitido")
+    USUARIOS_PERMITIDOS.intersection_update(permitidos)
+    USUARIOS_PERMITIDOS.update(permitidos)
+
+
+def compartir_estado(compartido):
+    """Usa `compartido` (dict de un multiprocessing.Manager) como estado de acceso común."""
+    global _compartido
+    _compartido = compartido
+    _aplicar(compartido.copy())
+
+
+async def sincronizar_estado(context=None):
+    """Job periódico de cada worker: trae los cambios hechos por los demás."""
+    if _compartido is not None:
+        _aplicar(await asyncio.to_thread(_compartido.copy))
@@ -1,6 +1,7 @@
 """
 Módulo de comandos administrativos.
 """
+import asyncio
 from telegram import Update
 from telegram.ext import ContextTypes
 
@@ -16,6 +17,8 @@ from acceso import (
     obtener_max_peticiones,
     establecer_max_peticiones,
 )
+from cola_envios import formatear_estado_envios
+from rutas import formatear_rutas
 
 
 async def admin_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -34,7 +37,15 @@ async def admin_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
             "/admin deny <user\\_id> — Quitar de lista blanca\n"
             "/admin modo <abierto|restringido> — Cambiar modo\n"
             "/admin baneados — Ver usuarios bloqueados\n"
-            "/admin ratelimit <número> — Cambiar límite/minuto",
+            "/admin ratelimit <número> — Cambiar límite/minuto\n"
+            "/admin cache [purgar] — Ver o vaciar la caché de MusicBrainz\n"
+            "/admin envios — Ver la cola de envíos a Telegram\n"
+            "/admin rutas — Pulsaciones y tiempos por botón\n"
+            "/admin profile [segundos] [archivo] — Perfil de CPU del proceso\n"
+            "/admin mem [parar] — Mayores sitios de asignación de memoria\n"
+            "/admin broadcast <texto> — Enviar un mensaje a todos los usuarios\n"
+            "/admin broadcast [parar] — Progreso de la última difusión, o cancelarla\n"
+            "/admin compactar — Eliminar ya los turnos caducados del calendario",
             parse_mode="Markdown",
         )
         return
@@ -100,5 +111,85 @@ async def admin_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
         except ValueError:
             await update.message.reply_text("❌ Número inválido. Usa un entero positivo.")
 
+    elif accion == "cache":
+        # Los módulos de diagnóstico se cargan al usarlos, no al arrancar
+        from cache_bandas import formatear_estado_cache, purgar_cache
+        if len(context.args) >= 2 and context.args[1].lower() == "purgar":
+            eliminadas = await purgar_cache()
+            await update.message.reply_text(f"🗑 Caché de MusicBrainz vaciada ({eliminadas} entradas).")
+        else:
+            await update.message.reply_text(formatear_estado_cache(), parse_mode="Markdown")
+
+    elif accion == "envios":
+        await update.message.reply_text(formatear_estado_envios(context.bot.rate_limiter), parse_mode="Markdown")
+
+    elif accion == "rutas":
+        await update.message.reply_text(formatear_rutas(), parse_mode="Markdown")
+
+    elif accion == "profile":
+        import perfilado
+        try:
+            segundos = int(context.args[1]) if len(context.args) >= 2 else 10
+            if not 1 <= segundos <= perfilado.PERFIL_MAX_SEGUNDOS:
+                raise ValueError
+        except ValueError:
+            await update.message.reply_text(f"❌ Duración inválida. Usa entre 1 y {perfilado.PERFIL_MAX_SEGUNDOS} segundos.")
+            return
+        if perfilado.perfilando():
+            await update.message.reply_text("⏳ Ya hay un perfil en curso.")
+            return
+
+        await update.message.reply_text(f"🔬 Perfilando durante {segundos}s...")
+        pilas, inactivas = await perfilado.perfilar(segundos)
+        await update.message.reply_text(perfilado.formatear_perfil(pilas, inactivas, segundos), parse_mode="Markdown")
+        if len(context.args) >= 3 and context.args[2].lower() == "archivo" and pilas:
+            await update.message.reply_document(
+                document=perfilado.pilas_colapsadas(pilas).encode(),
+                filename="perfil.collapsed.txt",
+                caption="Pilas colapsadas (flamegraph.pl / speedscope)",
+            )
+
+    elif accion == "mem":
+        import perfilado
+        if len(context.args) >= 2 and context.args[1].lower() == "parar":
+            if perfilado.parar_memoria():
+                await update.message.reply_text("🧠 Rastreo de memoria desactivado.")
+            else:
+                await update.message.reply_text("ℹ️ El rastreo de memoria no estaba activo.")
+        else:
+            await update.message.reply_text(await perfilado.informe_memoria(), parse_mode="Markdown")
+
+    elif accion == "broadcast":
+        import difusion
+        # El texto se toma del mensaje original para conservar los saltos de línea
+        partes = update.message.text.split(maxsplit=2)
+        texto = partes[2].strip() if len(partes) == 3 else ""
+        if not texto:
+            await update.message.reply_text(difusion.formatear_difusion(), parse_mode="Markdown")
+        elif texto.lower() == "parar":
+            difusion_id = difusion.parar()
+            if difusion_id is None:
+                await update.message.reply_text("ℹ️ No hay ninguna difusión en curso.")
+            else:
+                await update.message.reply_text(difusion.formatear_difusion(difusion_id), parse_mode="Markdown")
+        else:
+            try:
+                difusion_id, total = await difusion.iniciar(context.application, texto, update.effective_chat.id)
+            except RuntimeError:
+                await update.message.reply_text(
+                    "⏳ Ya hay una difusión en curso. Usa `/admin broadcast` para ver su progreso "
+                    "o `/admin broadcast parar` para cancelarla.",
+                    parse_mode="Markdown",
+                )
+                return
+            await update.message.reply_text(
+                f"📣 Difusión #{difusion_id} en marcha para {total} usuarios. Te aviso al terminar."
+            )
+
+    elif accion == "compactar":
+        from calendario import compactar_calendario, formatear_compactacion
+        resultado = await asyncio.to_thread(compactar_calendario)
+        await update.message.reply_text(formatear_compactacion(resultado))
+
     else:
         await update.message.reply_text("❌ Comando no reconocido. Escribe /admin para ver la ayuda.")
@@ -0,0 +1,88 @@
+"""
+Medición del tiempo de arranque del bot (importación de bot.py).
+Ejecuta varias veces `python -X importtime -c "import bot"` en procesos nuevos
+y resume la mediana del total y de cada módulo importado directamente por
+bot.py (tiempo acumulado, incluidas sus dependencias).
+
+    python arranque.py              # mide y compara con arranque.json
+    python arranque.py --guardar    # mide y guarda el resultado como referencia
+    python arranque.py --sin-webhooks   # simula una instalación sin tornado
+
+arranque.json está versionado: al tocar imports, compara antes de subir.
+"""
+import os
+import sys
+import json
+import statistics
+import subprocess
+from pathlib import Path
+
+# Fichero de referencia (versionado junto al código)
+ARRANQUE_FILE = Path(__file__).parent / "arranque.json"
+# Ejecuciones medidas (más una previa que se descarta para calentar los .pyc)
+REPETICIONES = 7
+
+
+def _medir_una_vez(entorno: dict, codigo: str) -> dict[str, float]:
+    """Tiempos acumulados (ms) de bot y de sus imports directos en un proceso nuevo."""
+    salida = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", codigo],
+        cwd=Path(__file__).parent, env=entorno, capture_output=True, text=True, check=True,
+    ).stderr
+
+    tiempos = {}
+    # Cada línea: "import time:  propio | acumulado | <sangría>módulo". Las líneas de un
+    # módulo aparecen tras las de sus dependencias, así que se agrupan por sangría
+    pendientes: list[tuple[int, str, float]] = []
+    for linea in salida.splitlines():
+        if not linea.startswith("import time:") or "self [us]" in linea:
+            continue
+        _, acumulado, modulo = linea[len("import time:"):].split("|")
+        nivel = (len(modulo) - len(modulo.lstrip())) // 2
+        if modulo.strip() == "bot":
+            tiempos["total"] = int(acumulado) / 1000
+            for nivel_hijo, nombre, ms in pendientes:
+                if nivel_hijo == nivel + 1:
+                    tiempos[nombre] = tiempos.get(nombre, 0) + ms
+            break
+        # Un módulo de nivel 0 cierra un import completo anterior (p. ej. los de site)
+        pendientes = [] if nivel == 0 else pendientes + [(nivel, modulo.strip(), int(acumulado) / 1000)]
+    return tiempos
+
+
+def medir(repeticiones: int = REPETICIONES, sin_webhooks: bool = False) -> dict:
+    """Mediana de varias ejecuciones. Devuelve {"total_ms": ..., "modulos": {módulo: ms}}."""
+    entorno = dict(os.environ)
+    # Sin tornado, python-telegram-bot no carga su servidor de webhooks
+    codigo = "import sys; sys.modules['tornado'] = None; import bot" if sin_webhooks else "import bot"
+    _medir_una_vez(entorno, codigo)
+    ejecuciones = [_medir_una_vez(entorno, codigo) for _ in range(repeticiones)]
+    modulos = {m for e in ejecuciones for m in e if m != "total"}
+    return {
+        "python": sys.version.split()[0],
+        "total_ms": round(statistics.median(e["total"] for e in ejecuciones), 1),
+        "modulos": {
+            m: round(statistics.median(e.get(m, 0.0) for e in ejecuciones), 1)
+            for m in sorted(modulos, key=lambda m: -statistics.median(e.get(m, 0.0) for e in ejecuciones))
+        },
+    }
+
+
+def _formatear(resultado: dict, referencia: dict | None, top: int = 20) -> str:
+    lineas = [f"⏱️ Importar bot: {resultado['total_ms']:.1f} ms (mediana de {REPETICIONES}, Python {resultado['python']})"]
+    if referencia:
+        lineas[0] += f"  [referencia {referencia['total_ms']:.1f} ms, {resultado['total_ms'] - referencia['total_ms']:+.1f}]"
+    lineas.append(f"   {'módulo':<24} {'ms':>7} {'ref.':>7}")
+    for modulo, ms in list(resultado["modulos"].items())[:top]:
+        ref = referencia["modulos"].get(modulo) if referencia else None
+        lineas.append(f"   {modulo:<24} {ms:>7.1f} {'' if ref is None else f'{ref:7.1f}':>7}")
+    return "\n".join(lineas)
+
+
+if __name__ == "__main__":
+    referencia = json.loads(ARRANQUE_FILE.read_text(encoding="utf-8")) if ARRANQUE_FILE.exists() else None
+    resultado = medir(sin_webhooks="--sin-webhooks" in sys.argv)
+    print(_formatear(resultado, referencia))
+    if "--guardar" in sys.argv:
+        ARRANQUE_FILE.write_text(json.dumps(resultado, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
+        print(f"💾 Guardado en {ARRANQUE_FILE.name}")
@@ -1,77 +1,145 @@
 """
 Módulo de búsqueda de bandas musicales usando MusicBrainz.
 """
-import httpx
+import asyncio
 import urllib.parse
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram import (
+    Update, InlineKeyboardButton, InlineKeyboardMarkup,
+    InlineQueryResultArticle, InputTextMessageContent,
+)
 from telegram.ext import ContextTypes
 
-from acceso import control_acceso
+from acceso import control_acceso, acceso_permitido
 from estadisticas import registrar
-
-# Configuración de MusicBrainz
-MUSICBRAINZ_BASE = "https://musicbrainz.org/ws/2"
-HEADERS_MB = {"User-Agent": "TelegramMusicBot/1.0 (bot_telegram)", "Accept": "application/json"}
-
-
-async def buscar_banda_en_musicbrainz(nombre: str) -> dict | None:
-    """Busca un artista en MusicBrainz y devuelve info + discografía."""
-    async with httpx.AsyncClient(headers=HEADERS_MB, timeout=15) as client:
-        # 1. Buscar el artista
-        resp = await client.get(
-            f"{MUSICBRAINZ_BASE}/artist/",
-            params={"query": nombre, "limit": 1, "fmt": "json"},
+import cache_bandas
+import indice_artistas
+from cola_musicbrainz import peticion_mb, PRIORIDAD_FONDO
+from rutas import ruta, datos, Entero, Uuid
+
+# Álbumes por página de discografía, y por petición a MusicBrainz (su máximo es 100)
+ALBUMES_POR_PAGINA = 25
+ALBUMES_POR_PETICION = 100
+
+# Inline queries: longitud mínima para consultar MusicBrainz y tiempo máximo de espera
+INLINE_MIN_CARACTERES_API = 3
+INLINE_TIMEOUT_API = 5
+
+
+def _info_artista(artista: dict, nombre: str) -> dict:
+    """Extrae los datos que mostramos de un artista de MusicBrainz."""
+    # Determinar si sigue activo
+    life_span = artista.get("life-span", {})
+    return {
+        "mbid": artista["id"],
+        "nombre": artista.get("name", nombre),
+        "pais": artista.get("country", "Desconocido"),
+        "tipo": artista.get("type", ""),
+        "activo": not life_span.get("ended", False),
+        "inicio": life_span.get("begin", "?"),
+        "fin": life_span.get("end", None),
+    }
+
+
+async def obtener_pagina_discografia(mbid: str, pagina: int = 0, aviso=None) -> dict:
+    """Devuelve una página de la discografía: {"albumes": [(fecha, titulo), ...], "total": n}.
+    MusicBrainz no ordena el browse, así que en un fallo de caché se pide la discografía
+    entera, se ordena por fecha y se cachean todas sus páginas."""
+    pagina_datos = cache_bandas.obtener_pagina(mbid, pagina)
+    if pagina_datos:
+        return pagina_datos
+
+    albumes = []
+    total = None
+    while total is None or len(albumes) < total:
+        rg_data = await peticion_mb(
+            "release-group/",
+            {
+                "artist": mbid,
+                "type": "album",
+                "limit": ALBUMES_POR_PETICION,
+                "offset": len(albumes),
+                "fmt": "json",
+            },
+            aviso=aviso,
         )
-        resp.raise_for_status()
-        data = resp.json()
+        grupos = rg_data.get("release-groups", [])
+        for rg in grupos:
+            albumes.append((rg.get("first-release-date", "?"), rg.get("title", "Sin título")))
+        total = rg_data.get("release-group-count", len(albumes))
+        if not grupos:
+            break
+
+    # Ordenar por fecha
+    albumes.sort(key=lambda x: x[0] if x[0] not in ("?", "") else "9999")
+
+    total = len(albumes)
+    for n in range(_total_paginas(total)):
+        inicio = n * ALBUMES_POR_PAGINA
+        datos_n = {"albumes": albumes[inicio:inicio + ALBUMES_POR_PAGINA], "total": total}
+        cache_bandas.guardar_pagina(mbid, n, datos_n)
+        if n == pagina:
+            pagina_datos = datos_n
+    return pagina_datos or {"albumes": [], "total": total}
+
+
+async def obtener_artista_por_mbid(mbid: str) -> dict:
+    """Devuelve la info de un artista por MBID (caché o lookup directo)."""
+    info = cache_bandas.obtener_artista(mbid)
+    if info:
+        return info
+    artista = await peticion_mb(f"artist/{mbid}", {"fmt": "json"})
+    info = _info_artista(artista, "")
+    cache_bandas.guardar_artista(mbid, info)
+    indice_artistas.registrar_artista(info)
+    return info
+
+
+async def buscar_sugerencias_musicbrainz(texto: str, limite: int = 5) -> list[dict]:
+    """Busca varios artistas en MusicBrainz (prioridad baja) y los añade al índice local."""
+    data = await peticion_mb(
+        "artist/", {"query": texto, "limit": limite, "fmt": "json"}, prioridad=PRIORIDAD_FONDO,
+    )
+    resultados = []
+    for artista in data.get("artists", []):
+        info = _info_artista(artista, texto)
+        if not cache_bandas.obtener_artista(info["mbid"]):
+            cache_bandas.guardar_artista(info["mbid"], info)
+        indice_artistas.registrar_artista(info)
+        resultados.append(info)
+    return resultados
+
+
+async def buscar_banda_en_musicbrainz(nombre: str, aviso=None) -> dict | None:
+    """Busca un artista en MusicBrainz y devuelve su info + la primera página de discografía.
+    Consulta primero la caché (búsqueda → MBID → info) y solo llama a la API en los fallos.
+    Las llamadas pasan por la cola global; `aviso` se llama si la espera en cola es larga."""
+    info = None
+    mbid = cache_bandas.obtener_mbid(nombre)
+    if mbid:
+        info = cache_bandas.obtener_artista(mbid)
 
+    if not info:
+        # La búsqueda ya devuelve todos los datos del artista: no hace falta un lookup aparte
+        data = await peticion_mb("artist/", {"query": nombre, "limit": 1, "fmt": "json"}, aviso=aviso)
         artistas = data.get("artists", [])
         if not artistas:
             return None
+        info = _info_artista(artistas[0], nombre)
+        cache_bandas.guardar_consulta(nombre, info["mbid"])
+        cache_bandas.guardar_artista(info["mbid"], info)
+        indice_artistas.registrar_artista(info)
 
-        artista = artistas[0]
-        artist_id = artista["id"]
-        nombre_oficial = artista.get("name", nombre)
-        pais = artista.get("country", "Desconocido")
-        tipo = artista.get("type", "")
-
-        # Determinar si sigue activo
-        life_span = artista.get("life-span", {})
-        activo = not life_span.get("ended", False)
-        inicio = life_span.get("begin", "?")
-        fin = life_span.get("end", None)
-
-        # 2. Obtener discografía (release-groups = álbumes)
-        resp2 = await client.get(
-            f"{MUSICBRAINZ_BASE}/release-group/",
-            params={
-                "artist": artist_id,
-                "type": "album",
-                "limit": 50,
-                "fmt": "json",
-            },
-        )
-        resp2.raise_for_status()
-        rg_data = resp2.json()
-
-        albumes = []
-        for rg in rg_data.get("release-groups", []):
-            titulo = rg.get("title", "Sin título")
-            fecha = rg.get("first-release-date", "?")
-            albumes.append((fecha, titulo))
+    pagina = await obtener_pagina_discografia(info["mbid"])
+    return {**info, "albumes": pagina["albumes"], "total_albumes": pagina["total"], "pagina": 0}
 
-        # Ordenar por fecha
-        albumes.sort(key=lambda x: x[0] if x[0] != "?" else "9999")
 
-        return {
-            "nombre": nombre_oficial,
-            "pais": pais,
-            "tipo": tipo,
-            "activo": activo,
-            "inicio": inicio,
-            "fin": fin,
-            "albumes": albumes,
-        }
+def crear_aviso_cola(message):
+    """Devuelve un callback que avisa al usuario de su posición en la cola de MusicBrainz."""
+    async def aviso(posicion: int, espera: float):
+        await message.reply_text(
+            f"⏳ Hay mucha demanda: tienes {posicion} búsquedas por delante (~{espera:.0f}s)."
+        )
+    return aviso
 
 
 def generar_enlace_youtube(nombre_banda: str) -> str:
@@ -80,14 +148,29 @@ def generar_enlace_youtube(nombre_banda: str) -> str:
     return f"https://www.youtube.com/results?search_query={query}"
 
 
-def crear_teclado_banda(nombre_banda: str) -> InlineKeyboardMarkup:
-    """Crea teclado inline con enlaces a YouTube y más info."""
+def _total_paginas(total_albumes: int) -> int:
+    """Número de páginas de discografía (al menos una)."""
+    return max(1, -(-total_albumes // ALBUMES_POR_PAGINA))
+
+
+def crear_teclado_banda(nombre_banda: str, mbid: str | None = None, pagina: int = 0, total_albumes: int = 0) -> InlineKeyboardMarkup:
+    """Crea teclado inline con enlaces a YouTube y navegación de la discografía."""
     youtube_url = generar_enlace_youtube(nombre_banda)
     keyboard = [
         [
             InlineKeyboardButton("▶️ Ver en YouTube", url=youtube_url),
         ]
     ]
+
+    if mbid:
+        navegacion = []
+        if pagina > 0:
+            navegacion.append(InlineKeyboardButton("◀️ Anterior", callback_data=datos("bp", mbid, pagina - 1)))
+        if pagina + 1 < _total_paginas(total_albumes):
+            navegacion.append(InlineKeyboardButton("Siguiente ▶️", callback_data=datos("bp", mbid, pagina + 1)))
+        if navegacion:
+            keyboard.append(navegacion)
+
     return InlineKeyboardMarkup(keyboard)
 
 
@@ -106,9 +189,14 @@ def formatear_info_banda(info: dict, incluir_enlace_youtube: bool = True) -> str
         youtube_url = generar_enlace_youtube(info['nombre'])
         lineas.append(f"▶️ [Buscar en YouTube]({youtube_url})")
     
+    total = info.get("total_albumes", len(info["albumes"]))
+    paginas = _total_paginas(total)
+    cabecera = f"💿 *Discografía ({total} álbumes)"
+    if paginas > 1:
+        cabecera += f" — página {info.get('pagina', 0) + 1}/{paginas}"
     lineas.extend([
         "",
-        f"💿 *Discografía ({len(info['albumes'])} álbumes):*",
+        cabecera + ":*",
     ])
 
     if info["albumes"]:
@@ -141,7 +229,7 @@ async def banda_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await update.message.reply_text(f"🔍 Buscando información sobre *{nombre}*...", parse_mode="Markdown")
 
     try:
-        info = await buscar_banda_en_musicbrainz(nombre)
+        info = await buscar_banda_en_musicbrainz(nombre, aviso=crear_aviso_cola(update.message))
     except Exception as e:
         await update.message.reply_text(f"❌ Error al consultar MusicBrainz: {e}")
         return
@@ -151,7 +239,7 @@ async def banda_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
 
     mensaje = formatear_info_banda(info)
-    teclado = crear_teclado_banda(info['nombre'])
+    teclado = crear_teclado_banda(info['nombre'], info['mbid'], 0, info['total_albumes'])
     await update.message.reply_text(
         mensaje, 
         parse_mode="Markdown",
@@ -166,7 +254,7 @@ async def procesar_busqueda_banda_boton(update: Update, context: ContextTypes.DE
     await update.message.reply_text(f"🔍 Buscando información sobre *{nombre}*...", parse_mode="Markdown")
 
     try:
-        info = await buscar_banda_en_musicbrainz(nombre)
+        info = await buscar_banda_en_musicbrainz(nombre, aviso=crear_aviso_cola(update.message))
     except Exception as e:
         await update.message.reply_text(
             f"❌ Error al consultar MusicBrainz: {e}", 
@@ -182,7 +270,7 @@ async def procesar_busqueda_banda_boton(update: Update, context: ContextTypes.DE
         return
 
     mensaje = formatear_info_banda(info)
-    teclado = crear_teclado_banda(info['nombre'])
+    teclado = crear_teclado_banda(info['nombre'], info['mbid'], 0, info['total_albumes'])
     await update.message.reply_text(
         mensaje, 
         parse_mode="Markdown",
@@ -194,3 +282,63 @@ async def procesar_busqueda_banda_boton(update: Update, context: ContextTypes.DE
         "¿Qué más quieres hacer?",
         reply_markup=get_main_keyboard_func()
     )
+
+
+@ruta("bp", Uuid(), Entero(), nombre="banda_pagina")
+async def banda_pagina_callback(update: Update, context: ContextTypes.DEFAULT_TYPE, mbid: str, pagina: int):
+    """Muestra otra página de la discografía editando el mensaje."""
+    query = update.callback_query
+    try:
+        info = await obtener_artista_por_mbid(mbid)
+        pagina_datos = await obtener_pagina_discografia(mbid, pagina)
+    except Exception as e:
+        await query.message.reply_text(f"❌ Error al consultar MusicBrainz: {e}")
+        return
+
+    info = {**info, "albumes": pagina_datos["albumes"], "total_albumes": pagina_datos["total"], "pagina": pagina}
+    await query.edit_message_text(
+        formatear_info_banda(info),
+        parse_mode="Markdown",
+        reply_markup=crear_teclado_banda(info['nombre'], mbid, pagina, pagina_datos["total"]),
+        disable_web_page_preview=True,
+    )
+
+
+async def inline_banda_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Inline query (@bot <nombre>) — sugiere artistas desde el índice local."""
+    inline_query = update.inline_query
+    user = update.effective_user
+    if not user or not acceso_permitido(user.id):
+        return
+
+    texto = inline_query.query.strip()
+    if not texto:
+        await inline_query.answer([], cache_time=300)
+        return
+
+    await indice_artistas.cargar_indice()
+    sugerencias = indice_artistas.buscar_prefijo(texto)
+
+    # Solo si el índice local no conoce nada se recurre a MusicBrainz
+    if not sugerencias and len(texto) >= INLINE_MIN_CARACTERES_API:
+        try:
+            encontrados = await asyncio.wait_for(buscar_sugerencias_musicbrainz(texto), INLINE_TIMEOUT_API)
+            sugerencias = [(i["nombre"], i["mbid"], indice_artistas.describir_artista(i)) for i in encontrados]
+        except Exception as e:
+            print(f"⚠️ Error en sugerencias inline de MusicBrainz: {e}")
+
+    resultados = [
+        InlineQueryResultArticle(
+            id=mbid,
+            title=nombre,
+            description=descripcion or None,
+            input_message_content=InputTextMessageContent(
+                f"🎸 *{nombre}*\n{descripcion}\n▶️ [Buscar en YouTube]({generar_enlace_youtube(nombre)})",
+                parse_mode="Markdown",
+                disable_web_page_preview=True,
+            ),
+            reply_markup=crear_teclado_banda(nombre),
+        )
+        for nombre, mbid, descripcion in sugerencias
+    ]
+    await inline_query.answer(resultados, cache_time=300)
@@ -0,0 +1,271 @@
+"""
+Mediciones de las estructuras de datos del bot, fuera de las pruebas.
+Cada caso prepara datos sintéticos en un directorio temporal e imprime los
+tiempos; los resultados citados en INSTRUCTIONS.md salen de aquí.
+
+    python benchmarks.py                       # todos los casos
+    python benchmarks.py calendario importacion
+    python benchmarks.py geocodificador --geonames cities15000.txt
+"""
+import json
+import time
+import random
+import argparse
+import tempfile
+import tracemalloc
+from contextlib import contextmanager
+from datetime import date, timedelta
+from pathlib import Path
+
+
+@contextmanager
+def _calendario_temporal(festivos: str = ""):
+    """Apunta el calendario a un directorio temporal mientras dura el bloque."""
+    import calendario
+
+    anteriores = calendario.CALENDARIO_FILE, calendario.FESTIVOS_FILE
+    with tempfile.TemporaryDirectory() as carpeta:
+        calendario.CALENDARIO_FILE = Path(carpeta) / "calendario.json"
+        calendario.FESTIVOS_FILE = festivos
+        try:
+            yield carpeta
+        finally:
+            calendario.CALENDARIO_FILE, calendario.FESTIVOS_FILE = anteriores
+
+
+def _por_llamada(funcion, repeticiones: int) -> float:
+    """Segundos por llamada de `funcion` repetida `repeticiones` veces."""
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        funcion()
+    return (time.perf_counter() - inicio) / repeticiones
+
+
+def calendario_rotaciones():
+    """Una rotación como regla frente a la misma rotación de un año guardada como fechas sueltas."""
+    from calendario import ocurrencias
+
+    turno = {"dia": "rotacion:2026-01-05:11110000", "hora": "07:00", "tipo": "entrada"}
+    un_anio = date(2026, 12, 31)
+    sueltas = [{"dia": m.date().isoformat(), "hora": "07:00", "tipo": "entrada"}
+               for m in ocurrencias(turno, date(2026, 1, 5), un_anio)]
+    for nombre, turnos in (("fechas sueltas", sueltas), ("una regla", [turno])):
+        coste = _por_llamada(lambda: [next(ocurrencias(t, un_anio, un_anio), None) for t in turnos], 1000)
+        print(f"📅 {nombre:<15} {len(turnos):>4} turnos, {len(json.dumps(turnos)):>6} bytes, "
+              f"{coste * 1e6:7.1f} µs por comprobación de recordatorios")
+
+
+def calendario_ausencias():
+    """Recorrer todas las ausencias de un usuario frente a la búsqueda en el índice de intervalos."""
+    from calendario import _dentro, _intervalos
+
+    rnd = random.Random(0)
+    for n in (10, 100, 1000):
+        inicios = [rnd.randrange(700_000, 800_000) for _ in range(n)]
+        rangos = [(a, a + rnd.randrange(15)) for a in inicios]
+        indice = _intervalos(rangos)
+        consultas = [rnd.randrange(700_000, 800_000) for _ in range(2000)]
+        inicio = time.perf_counter()
+        lineal = [any(a <= d <= b for a, b in rangos) for d in consultas]
+        t_lineal = (time.perf_counter() - inicio) / len(consultas)
+        inicio = time.perf_counter()
+        binaria = [_dentro(indice, d) for d in consultas]
+        t_binaria = (time.perf_counter() - inicio) / len(consultas)
+        assert lineal == binaria
+        print(f"🏖 {n:>5} ausencias: recorrido {t_lineal * 1e6:7.2f} µs, índice {t_binaria * 1e6:5.2f} µs por consulta")
+
+
+def calendario_compactacion():
+    """Recorrido de recordatorios de cada minuto antes y después de compactar un año de fechas pasadas."""
+    import calendario
+
+    hoy = date(2026, 6, 15)
+    rnd = random.Random(0)
+    with _calendario_temporal():
+        calendario.guardar_calendario({
+            str(uid): [{"dia": (hoy - timedelta(days=rnd.randrange(30, 365))).isoformat(),
+                        "hora": "09:00", "tipo": "entrada"} for _ in range(40)]
+            + [{"dia": "lunes", "hora": "08:00", "tipo": "entrada"}]
+            for uid in range(2000)
+        })
+        antes = (_por_llamada(calendario.obtener_turnos_proximos, 1), calendario.CALENDARIO_FILE.stat().st_size)
+        inicio = time.perf_counter()
+        resultado = calendario.compactar_calendario(7, hoy)
+        coste = time.perf_counter() - inicio
+        despues = (_por_llamada(calendario.obtener_turnos_proximos, 1), calendario.CALENDARIO_FILE.stat().st_size)
+    print(f"{calendario.formatear_compactacion(resultado)} en {coste * 1000:.0f} ms")
+    for nombre, (t, tam) in (("antes", antes), ("después", despues)):
+        print(f"🧹 {nombre:<8} {tam / 1024:7.0f} KB, recorrido de recordatorios {t * 1000:6.1f} ms")
+
+
+def calendario_proximos():
+    """/proximo frente a «Ver turnos» con un calendario grande de semanales, rotaciones y fechas sueltas."""
+    import calendario
+
+    with _calendario_temporal():
+        for dia in calendario.DIAS_SEMANA_NOMBRE.values():
+            for hora in ("06:00", "14:00", "22:00"):
+                calendario.agregar_turno(2, dia.lower(), hora, "entrada")
+        for k in range(4):
+            calendario.agregar_turno(2, f"rotacion:2026-01-0{k + 1}:11110000", "07:00", "salida")
+        for k in range(300):
+            calendario.agregar_turno(2, (date.today() + timedelta(days=k)).isoformat(), "12:00", "entrada")
+        for nombre, funcion in (("Ver turnos", lambda: calendario.formatear_calendario(2)),
+                                ("/proximo", lambda: calendario.formatear_proximos(2)),
+                                ("búsqueda", lambda: calendario.proximos_turnos(2))):
+            print(f"⏭ {nombre:<11} {_por_llamada(funcion, 100) * 1000:6.2f} ms por consulta")
+    print("   (la búsqueda es sobre la agenda ya calculada)")
+
+
+def importacion(turnos: int = 500):
+    """Importar un fichero grande: una sola escritura frente a una por turno."""
+    import io
+    import calendario
+    from calendario_archivos import leer_fichero
+
+    filas = "".join(f"{(date(2027, 1, 1) + timedelta(days=k)).strftime('%d/%m/%Y')};08:00;entrada\n"
+                    for k in range(turnos))
+    with _calendario_temporal():
+        inicio = time.perf_counter()
+        validos, _, _, _ = leer_fichero("grande.csv", io.BytesIO(filas.encode()))
+        lectura = time.perf_counter() - inicio
+        inicio = time.perf_counter()
+        calendario.agregar_turnos(3, validos)
+        de_golpe = time.perf_counter() - inicio
+        inicio = time.perf_counter()
+        for t in validos:
+            calendario.agregar_turno(4, t["dia"], t["hora"], t["tipo"])
+        uno_a_uno = time.perf_counter() - inicio
+    print(f"📥 {len(validos)} turnos: lectura {lectura * 1000:.0f} ms, guardado de golpe {de_golpe * 1000:.0f} ms, "
+          f"uno a uno {uno_a_uno * 1000:.0f} ms")
+
+
+def _geonames_sintetico(ruta: Path, n: int):
+    """Genera un fichero con formato GeoNames."""
+    rnd = random.Random(0)
+    silabas = ["ma", "dri", "se", "vi", "lla", "bar", "ce", "lo", "na", "to", "le", "do", "san", "ta", "ro"]
+    with open(ruta, "w", encoding="utf-8") as f:
+        for i in range(n):
+            nombre = "".join(rnd.choice(silabas) for _ in range(rnd.randint(2, 4))).capitalize()
+            campos = [""] * 19
+            campos[0] = str(i)
+            campos[1] = campos[2] = nombre
+            campos[4] = f"{rnd.uniform(-60, 70):.5f}"
+            campos[5] = f"{rnd.uniform(-180, 180):.5f}"
+            campos[8] = rnd.choice(["ES", "AR", "MX", "US", "FR"])
+            campos[14] = str(rnd.randint(1000, 5_000_000))
+            f.write("\t".join(campos) + "\n")
+
+
+def geocodificador(ruta: str | None = None, n: int = 150_000):
+    """Tiempo de carga, memoria del índice y latencia de búsqueda del geocodificador local."""
+    import geocodificador
+
+    if not ruta:
+        ruta = Path(tempfile.gettempdir()) / f"geonames_sintetico_{n}.txt"
+        if not ruta.exists():
+            _geonames_sintetico(ruta, n)
+
+    inicio = time.perf_counter()
+    total = geocodificador.cargar_indice(ruta)
+    carga = time.perf_counter() - inicio
+
+    # Segunda carga con tracemalloc activo (más lenta) solo para medir memoria
+    tracemalloc.start()
+    geocodificador.cargar_indice(ruta)
+    memoria, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    claves = geocodificador._claves
+    consultas = claves[:: max(1, len(claves) // 10_000)]
+    por_consulta = _por_llamada(lambda: [geocodificador.buscar(q) for q in consultas], 1) / len(consultas)
+
+    print(f"Ciudades:         {total}")
+    print(f"Claves indexadas: {len(claves)}")
+    print(f"Tiempo de carga:  {carga:.2f} s")
+    print(f"Memoria índice:   {memoria / 1e6:.1f} MB (pico {pico / 1e6:.1f} MB)")
+    print(f"Búsqueda:         {por_consulta * 1e6:.1f} µs/consulta")
+
+
+def lugares(n: int = 150_000, consultas: int = 10_000):
+    """Latencia de búsqueda del vecino más cercano con `n` lugares."""
+    import lugares
+
+    rnd = random.Random(0)
+    lugares.registrar_lugares((rnd.uniform(35, 44), rnd.uniform(-10, 4), f"Lugar {i}") for i in range(n))
+    puntos = [(rnd.uniform(35, 44), rnd.uniform(-10, 4)) for _ in range(consultas)]
+    inicio = time.perf_counter()
+    encontrados = sum(1 for la, lo in puntos if lugares.lugar_cercano(la, lo))
+    por_consulta = (time.perf_counter() - inicio) / consultas
+
+    print(f"Lugares:     {lugares.total_lugares()}")
+    print(f"Encontrados: {encontrados}/{consultas} (radio {lugares.RADIO_LUGAR_KM} km)")
+    print(f"Búsqueda:    {por_consulta * 1e6:.1f} µs/consulta")
+
+
+def saludos(num_frases: int, num_mensajes: int = 2000):
+    """Clasificador de saludos.py (palabras completas) frente al recorrido lineal `frase in texto`."""
+    from saludos import SALUDO, Clasificador
+
+    rnd = random.Random(0)
+    letras = "abcdefghijklmnopqrstuvwxyz"
+
+    def palabra():
+        return "".join(rnd.choice(letras) for _ in range(rnd.randint(4, 9)))
+
+    frases = {f"{palabra()} {palabra()}" if i % 3 == 0 else palabra(): f"r{i}" for i in range(num_frases)}
+    lista = list(frases)
+    mensajes = [
+        " ".join(rnd.choice(lista) if rnd.random() < 0.1 else palabra() for _ in range(rnd.randint(3, 12)))
+        for _ in range(num_mensajes)
+    ]
+
+    inicio = time.perf_counter()
+    clasificador = Clasificador({f: (SALUDO, r) for f, r in frases.items()})
+    preparacion = time.perf_counter() - inicio
+
+    def lineal():
+        for m in mensajes:
+            texto = m.lower().strip()
+            for frase in frases:
+                if frase in texto:
+                    break
+
+    t_lineal = _por_llamada(lineal, 1) / num_mensajes
+    t_clasificador = _por_llamada(lambda: [clasificador.clasificar(m) for m in mensajes], 1) / num_mensajes
+
+    print(f"📊 {num_frases} frases, {num_mensajes} mensajes (preparación {preparacion * 1000:.0f} ms)")
+    print(f"   Recorrido lineal:  {t_lineal * 1e6:8.1f} µs/mensaje")
+    print(f"   Clasificador:      {t_clasificador * 1e6:8.1f} µs/mensaje ({t_lineal / t_clasificador:.1f}x)")
+
+
+def _frases_saludos() -> int:
+    """Número de frases que reconoce hoy saludos.py."""
+    import saludos as s
+    return len(s.SALUDOS) + len(s.FRASES_TIEMPO) + len(s.FRASES_BANDA) + len(s.FRASES_TURNOS)
+
+
+def main():
+    casos = {
+        "calendario": lambda a: (calendario_rotaciones(), calendario_ausencias(),
+                                 calendario_compactacion(), calendario_proximos()),
+        "importacion": lambda a: importacion(),
+        "geocodificador": lambda a: geocodificador(a.geonames),
+        "lugares": lambda a: lugares(),
+        "saludos": lambda a: [saludos(n) for n in (_frases_saludos(), 100)],
+    }
+    parser = argparse.ArgumentParser(description="Mediciones de rendimiento del bot")
+    parser.add_argument("casos", nargs="*", metavar="caso",
+                        help=f"casos a medir ({', '.join(casos)}); por defecto todos")
+    parser.add_argument("--geonames", help="fichero de GeoNames real (por defecto, uno sintético)")
+    args = parser.parse_args()
+    desconocidos = set(args.casos) - set(casos)
+    if desconocidos:
+        parser.error(f"casos desconocidos: {', '.join(sorted(desconocidos))}")
+    for nombre in args.casos or casos:
+        print(f"\n=== {nombre} ===")
+        casos[nombre](args)
+
+
+if __name__ == "__main__":
+    main()
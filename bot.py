@@ -4,137 +4,97 @@ Coordina todos los módulos y maneja los handlers.
 """
 import os
 import asyncio
-from dotenv import load_dotenv
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
-from telegram.ext import ApplicationBuilder, MessageHandler, CommandHandler, CallbackQueryHandler, ContextTypes, filters
+import importlib.util
+# Primero: carga el .env, del que leen los demás módulos al importarse
+from configuracion import BANDAS_ACTIVO, TIEMPO_ACTIVO, CALENDARIO_ACTIVO
+from telegram import Update
+from telegram.ext import (
+    ApplicationBuilder, MessageHandler, CommandHandler, CallbackQueryHandler, InlineQueryHandler,
+    ContextTypes, filters,
+)
 
 # Importar módulos propios
 from acceso import control_acceso
-from estadisticas import registrar, formatear_estadisticas
-from bandas import banda_handler, procesar_busqueda_banda_boton
-from tiempo import tiempo_handler, ubicacion_handler, enviar_tiempo, geocodificar
+from concurrencia import ProcesadorPorUsuario
+from cola_envios import LimitadorEnvios
+from persistencia import PersistenciaUsuarios
+from vigilancia import PeticionPoll, activar as activar_vigilancia
+from pendientes import PENDIENTES_ARRANQUE, activar as activar_pendientes
+from difusion import activar as activar_difusion
+from estadisticas import registrar
+from rutas import despachar
 from saludos import procesar_saludo
 from admin import admin_handler
-from comandos import start_handler, stats_handler, miid_handler, get_main_keyboard, get_calendario_keyboard
-from calendario_cmd import (
-    horario_handler, comprobar_notificaciones,
-    calendario_ver_callback, calendario_add_callback, calendario_del_callback,
-    calendario_clear_callback, calendario_clear_si_callback,
-    calendario_dia_callback, calendario_tipo_callback, calendario_del_idx_callback,
-    procesar_hora_texto, procesar_dia_texto,
-)
+from comandos import start_handler, stats_handler, miid_handler, get_main_keyboard
+# bandas, tiempo y calendario se importan en registrar_handlers solo si están activos
 
 # Configuración
-load_dotenv()
 TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
+# Servidor de la Bot API (se puede apuntar a uno local, p. ej. el de prueba_carga.py)
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL", "https://api.telegram.org").rstrip("/")
+
+# Modo de recepción de updates: "polling" (por defecto) o "webhook"
+MODO_CONEXION = os.getenv("MODO_CONEXION", "polling").lower()
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")
+WEBHOOK_LISTEN = os.getenv("WEBHOOK_LISTEN", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8443"))
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "telegram")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "") or None
+
+# Número máximo de updates en proceso a la vez (los de un mismo usuario siempre van en orden)
+CONCURRENCIA_UPDATES = int(os.getenv("CONCURRENCIA_UPDATES", "16"))
+
+# Procesos worker entre los que se reparten los usuarios (1 = un solo proceso)
+NUM_WORKERS = int(os.getenv("NUM_WORKERS", "1"))
 
 
 async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Maneja los callbacks de los botones inline."""
+    """Maneja los callbacks de los botones inline (cada módulo registra sus rutas en rutas.py)."""
     if not await control_acceso(update):
         return
     query = update.callback_query
     await query.answer()
 
-    # Botón de estadísticas
-    if query.data == "btn_stats":
-        registrar("comandos_stats", update)
-        msg = formatear_estadisticas()
-        from acceso import obtener_usuarios_baneados
-        msg += f"🚫 Usuarios baneados: {len(obtener_usuarios_baneados())}\n"
-        await query.edit_message_text(msg, parse_mode="Markdown", reply_markup=get_main_keyboard())
-
-    # Botón de búsqueda de banda
-    elif query.data == "btn_banda":
-        context.user_data["esperando_banda"] = True
-        await query.edit_message_text(
-            "🎵 Escribe el nombre del grupo que quieres buscar:",
-            reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("❌ Cancelar", callback_data="btn_cancelar")]]),
-        )
-
-    # Botón de consulta del tiempo
-    elif query.data == "btn_tiempo":
-        context.user_data["esperando_ciudad"] = True
-        await query.edit_message_text(
-            "🌤 Escribe el nombre de la ciudad o envía tu ubicación 📍:",
-            reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("❌ Cancelar", callback_data="btn_cancelar")]]),
-        )
-
-    # Botón de calendario
-    elif query.data == "btn_calendario":
-        registrar("calendario", update)
-        await query.edit_message_text(
-            "📅 *Calendario laboral*\n\n"
-            "Gestiona tus turnos de entrada y salida.\n"
-            "Recibirás una notificación 10 minutos antes.",
-            parse_mode="Markdown",
-            reply_markup=get_calendario_keyboard(),
-        )
-
-    # Botón volver
-    elif query.data == "btn_volver":
-        await query.edit_message_text(
-            "Elige una opción:",
-            reply_markup=get_main_keyboard(),
-        )
-
-    # Botón cancelar
-    elif query.data == "btn_cancelar":
-        context.user_data["esperando_banda"] = False
-        context.user_data["esperando_ciudad"] = False
-        context.user_data["cal_paso"] = None
-        await query.edit_message_text(
-            "👌 Cancelado. Usa los botones o escribe un comando.",
+    if not await despachar(update, context):
+        await query.message.reply_text(
+            "⌛ Este botón ya no está disponible. Usa /start para ver el menú.",
             reply_markup=get_main_keyboard(),
         )
 
-    # --- Callbacks del calendario ---
-    elif query.data == "cal_ver":
-        await calendario_ver_callback(query, get_calendario_keyboard)
-
-    elif query.data == "cal_add":
-        context.user_data["cal_paso"] = "dia"
-        await calendario_add_callback(query)
-
-    elif query.data.startswith("caldia_"):
-        dia = query.data.replace("caldia_", "")
-        await calendario_dia_callback(query, dia, context)
-
-    elif query.data.startswith("caltipo_"):
-        tipo = query.data.replace("caltipo_", "")
-        await calendario_tipo_callback(query, tipo, context, get_calendario_keyboard)
-
-    elif query.data == "cal_del":
-        await calendario_del_callback(query, get_calendario_keyboard)
-
-    elif query.data.startswith("caldel_"):
-        idx = int(query.data.replace("caldel_", ""))
-        await calendario_del_idx_callback(query, idx, get_calendario_keyboard)
-
-    elif query.data == "cal_clear":
-        await calendario_clear_callback(query)
-
-    elif query.data == "cal_clear_si":
-        await calendario_clear_si_callback(query, get_calendario_keyboard)
-
 
 async def responder_mensaje_texto(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Maneja mensajes de texto generales, incluyendo flujos de conversación."""
     if not await control_acceso(update):
         return
 
+    # Los flujos solo se abren desde botones de funciones activas, cuyos módulos ya están cargados
     # Si estamos esperando hora para el calendario
     if context.user_data.get("cal_paso") == "hora":
+        from calendario_cmd import procesar_hora_texto
         await procesar_hora_texto(update, context, update.message.text)
         return
 
     # Si estamos esperando un día escrito (fecha específica)
     if context.user_data.get("cal_paso") == "dia":
+        from calendario_cmd import procesar_dia_texto
         await procesar_dia_texto(update, context, update.message.text)
         return
 
+    # Si estamos esperando las fechas de una ausencia (vacaciones, festivo)
+    if context.user_data.get("cal_paso") == "ausencia":
+        from calendario_cmd import procesar_ausencia_texto
+        await procesar_ausencia_texto(update, context, update.message.text)
+        return
+
+    # Si estamos esperando la ciudad del tiempo en los recordatorios
+    if context.user_data.get("cal_paso") == "tiempo":
+        from calendario_cmd import procesar_tiempo_texto
+        await procesar_tiempo_texto(update, context, update.message.text)
+        return
+
     # Si estamos esperando una ciudad desde el botón de tiempo
     if context.user_data.get("esperando_ciudad"):
+        from tiempo import enviar_tiempo, geocodificar
         context.user_data["esperando_ciudad"] = False
         registrar("tiempo", update)
         ciudad = update.message.text.strip()
@@ -151,6 +111,7 @@ async def responder_mensaje_texto(update: Update, context: ContextTypes.DEFAULT_
 
     # Si estamos esperando un nombre de banda desde el botón
     if context.user_data.get("esperando_banda"):
+        from bandas import procesar_busqueda_banda_boton
         context.user_data["esperando_banda"] = False
         nombre = update.message.text.strip()
         await procesar_busqueda_banda_boton(update, context, nombre, get_main_keyboard)
@@ -160,37 +121,128 @@ async def responder_mensaje_texto(update: Update, context: ContextTypes.DEFAULT_
     await procesar_saludo(update, context)
 
 
-def main():
-    """Función principal que inicia el bot."""
-    if not TOKEN:
-        print("❌ Error: Define la variable de entorno TELEGRAM_BOT_TOKEN con el token de tu bot.")
-        return
-
-    app = ApplicationBuilder().token(TOKEN).build()
-
+def registrar_handlers(app):
+    """Registra los handlers de las funciones activas (ver configuracion.py)."""
     # Registrar handlers de comandos
     app.add_handler(CommandHandler("start", start_handler))
-    app.add_handler(CommandHandler("banda", banda_handler))
-    app.add_handler(CommandHandler("tiempo", tiempo_handler))
-    app.add_handler(CommandHandler("horario", horario_handler))
     app.add_handler(CommandHandler("stats", stats_handler))
     app.add_handler(CommandHandler("miid", miid_handler))
     app.add_handler(CommandHandler("admin", admin_handler))
 
+    if BANDAS_ACTIVO:
+        from bandas import banda_handler, inline_banda_handler
+        from cache_bandas import activar as activar_cache_bandas
+        app.add_handler(CommandHandler("banda", banda_handler))
+        app.add_handler(InlineQueryHandler(inline_banda_handler))
+        activar_cache_bandas(app)
+    if TIEMPO_ACTIVO:
+        from tiempo import tiempo_handler, ubicacion_handler
+        app.add_handler(CommandHandler("tiempo", tiempo_handler))
+        app.add_handler(MessageHandler(filters.LOCATION, ubicacion_handler))
+    if CALENDARIO_ACTIVO:
+        from calendario_cmd import (
+            horario_handler, proximo_handler, importar_handler, comprobar_notificaciones,
+            compactar_calendario_job, INTERVALO_COMPACTACION,
+        )
+        app.add_handler(CommandHandler("horario", horario_handler))
+        app.add_handler(CommandHandler("proximo", proximo_handler))
+        app.add_handler(MessageHandler(
+            filters.Document.FileExtension("csv") | filters.Document.FileExtension("ics"), importar_handler,
+        ))
+
     # Handlers de interacción
     app.add_handler(CallbackQueryHandler(button_handler))
-    app.add_handler(MessageHandler(filters.LOCATION, ubicacion_handler))
     app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, responder_mensaje_texto))
 
-    # Programar comprobación de notificaciones cada 60 segundos
-    job_queue = app.job_queue
-    job_queue.run_repeating(comprobar_notificaciones, interval=60, first=10)
-    print("📅 Notificaciones de calendario activadas (cada 60s)")
-
-    print("🤖 Bot iniciado. Esperando mensajes...")
+    if CALENDARIO_ACTIVO:
+        # Programar comprobación de notificaciones cada 60 segundos
+        job_queue = app.job_queue
+        job_queue.run_repeating(comprobar_notificaciones, interval=60, first=10)
+        # Y una vez al día, eliminar los turnos de fechas ya pasadas
+        job_queue.run_repeating(compactar_calendario_job, interval=INTERVALO_COMPACTACION, first=300)
+        print("📅 Notificaciones de calendario activadas (cada 60s)")
+
+    desactivadas = [nombre for nombre, activo in (
+        ("bandas", BANDAS_ACTIVO), ("tiempo", TIEMPO_ACTIVO), ("calendario", CALENDARIO_ACTIVO),
+    ) if not activo]
+    if desactivadas:
+        print(f"⏸️ Funciones desactivadas: {', '.join(desactivadas)}")
+
+
+def nuevo_builder() -> ApplicationBuilder:
+    """ApplicationBuilder con el token y el servidor de la Bot API configurados."""
+    return (
+        ApplicationBuilder()
+        .token(TOKEN)
+        .base_url(f"{TELEGRAM_API_URL}/bot")
+        .base_file_url(f"{TELEGRAM_API_URL}/file/bot")
+        .get_updates_request(PeticionPoll())
+    )
+
+
+def construir_aplicacion(builder: ApplicationBuilder | None = None):
+    """Crea la aplicación con concurrencia por usuario, cola de envíos y persistencia, y registra los handlers."""
+    app = (
+        (builder or nuevo_builder())
+        .concurrent_updates(ProcesadorPorUsuario(CONCURRENCIA_UPDATES))
+        .rate_limiter(LimitadorEnvios())
+        .persistence(PersistenciaUsuarios())
+        .build()
+    )
+    registrar_handlers(app)
+    return app
+
+
+def ejecutar(app):
+    """Arranca la recepción de updates por polling o webhook según MODO_CONEXION."""
     loop = asyncio.new_event_loop()
     asyncio.set_event_loop(loop)
-    app.run_polling()
+    activar_vigilancia(app, requiere_poll=MODO_CONEXION != "webhook")
+
+    if MODO_CONEXION == "webhook":
+        # Servidor HTTP local: valida el secret token, encola el update y responde al momento
+        print(f"🌐 Webhook escuchando en {WEBHOOK_LISTEN}:{WEBHOOK_PORT}/{WEBHOOK_PATH} "
+              f"(concurrencia: {CONCURRENCIA_UPDATES})")
+        print("🤖 Bot iniciado. Esperando mensajes...")
+        app.run_webhook(
+            listen=WEBHOOK_LISTEN,
+            port=WEBHOOK_PORT,
+            url_path=WEBHOOK_PATH,
+            webhook_url=f"{WEBHOOK_URL.rstrip('/')}/{WEBHOOK_PATH}" if WEBHOOK_URL else None,
+            secret_token=WEBHOOK_SECRET,
+            drop_pending_updates=PENDIENTES_ARRANQUE == "descartar",
+        )
+    else:
+        # Los pendientes de la caída se compactan antes del primer poll (ver pendientes.py)
+        activar_pendientes(app)
+        print("🤖 Bot iniciado. Esperando mensajes...")
+        app.run_polling(drop_pending_updates=PENDIENTES_ARRANQUE == "descartar")
+
+
+def main():
+    """Función principal que inicia el bot."""
+    if not TOKEN:
+        print("❌ Error: Define la variable de entorno TELEGRAM_BOT_TOKEN con el token de tu bot.")
+        return
+
+    if MODO_CONEXION == "webhook" and importlib.util.find_spec("tornado") is None:
+        # tornado es opcional: en modo polling solo alarga el arranque
+        print('❌ Error: el modo webhook necesita pip install "python-telegram-bot[webhooks]==21.*"')
+        return
+
+    if NUM_WORKERS > 1:
+        from fragmentos import ejecutar_front
+        ejecutar_front(NUM_WORKERS)
+        return
+
+    # Si antes se ejecutó con varios workers, recuperar sus calendarios
+    if CALENDARIO_ACTIVO:
+        from calendario import consolidar_fragmentos
+        consolidar_fragmentos()
+    app = construir_aplicacion()
+    # Proceso único: la difusión que quedó a medias es suya
+    activar_difusion(app)
+    ejecutar(app)
 
 
 if __name__ == "__main__":
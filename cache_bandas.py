@@ -0,0 +1,264 @@
+"""
+Módulo de caché de respuestas de MusicBrainz.
+Dos niveles de claves: búsqueda normalizada → MBID del artista, y
+MBID → info del artista y páginas de su discografía. Se mantiene en memoria con
+expulsión LRU por presupuesto de bytes y se persiste en SQLite: las escrituras
+se acumulan y se vuelcan en lote desde un hilo cada CACHE_BANDAS_INTERVALO_GUARDADO.
+"""
+import os
+import json
+import time
+import asyncio
+import sqlite3
+import threading
+from collections import Counter, OrderedDict
+from pathlib import Path
+
+CACHE_BANDAS_FILE = Path(os.getenv("CACHE_BANDAS_FILE", str(Path(__file__).parent / "cache_bandas.db")))
+CACHE_BANDAS_TTL_HORAS = int(os.getenv("CACHE_BANDAS_TTL_HORAS", str(24 * 7)))
+CACHE_BANDAS_MAX_BYTES = int(os.getenv("CACHE_BANDAS_MAX_BYTES", str(5 * 1024 * 1024)))
+# Cada cuántos segundos se escriben en disco las entradas nuevas
+CACHE_BANDAS_INTERVALO_GUARDADO = int(os.getenv("CACHE_BANDAS_INTERVALO_GUARDADO", "10"))
+
+# Las búsquedas → MBID cambian poco; se guardan el triple que la info del artista
+TTL_ARTISTA = CACHE_BANDAS_TTL_HORAS * 3600
+TTL_CONSULTA = TTL_ARTISTA * 3
+
+# Tabla → (lectura, escritura)
+_SQL = {
+    "consultas": ("SELECT mbid, ts FROM consultas WHERE clave = ?", "INSERT OR REPLACE INTO consultas VALUES (?, ?, ?)"),
+    "artistas": ("SELECT datos, ts FROM artistas WHERE mbid = ?", "INSERT OR REPLACE INTO artistas VALUES (?, ?, ?)"),
+    "paginas": ("SELECT datos, ts FROM paginas WHERE clave = ?", "INSERT OR REPLACE INTO paginas VALUES (?, ?, ?)"),
+}
+
+# Nivel en memoria, un solo orden de uso para las tres tablas: (tabla, clave) → (timestamp, valor, bytes)
+_memoria: OrderedDict[tuple[str, str], tuple[float, object, int]] = OrderedDict()
+_en_memoria: Counter = Counter()
+_bytes_memoria = 0
+
+# Escrituras aún no volcadas (y las que se están volcando): tabla → clave → (texto, timestamp)
+_pendientes: dict[str, dict[str, tuple[str, float]]] = {tabla: {} for tabla in _SQL}
+_volcando: dict[str, dict[str, tuple[str, float]]] = {tabla: {} for tabla in _SQL}
+_volcado = asyncio.Lock()
+
+# La conexión se comparte entre el event loop (lecturas) y el hilo de volcado
+_conexion: sqlite3.Connection | None = None
+_bloqueo = threading.Lock()
+
+ESTADISTICAS_CACHE = {"aciertos": 0, "fallos": 0, "expulsiones": 0}
+
+
+def normalizar_consulta(nombre: str) -> str:
+    """Normaliza una búsqueda para usarla como clave."""
+    return " ".join(nombre.lower().split())
+
+
+def _db() -> sqlite3.Connection:
+    """Abre (una sola vez) la base de datos de la caché. Usar siempre con `_bloqueo`."""
+    global _conexion
+    if _conexion is None:
+        _conexion = sqlite3.connect(CACHE_BANDAS_FILE, check_same_thread=False)
+        _conexion.execute("PRAGMA journal_mode=WAL")
+        _conexion.execute(
+            "CREATE TABLE IF NOT EXISTS consultas (clave TEXT PRIMARY KEY, mbid TEXT NOT NULL, ts REAL NOT NULL)"
+        )
+        _conexion.execute(
+            "CREATE TABLE IF NOT EXISTS artistas (mbid TEXT PRIMARY KEY, datos TEXT NOT NULL, ts REAL NOT NULL)"
+        )
+        _conexion.execute(
+            "CREATE TABLE IF NOT EXISTS paginas (clave TEXT PRIMARY KEY, datos TEXT NOT NULL, ts REAL NOT NULL)"
+        )
+        _conexion.commit()
+    return _conexion
+
+
+def _guardar_en_memoria(tabla: str, clave: str, ts: float, valor, tam: int):
+    """Inserta en el nivel de memoria y expulsa lo menos usado (de cualquier tabla) si se supera el presupuesto."""
+    global _bytes_memoria
+    anterior = _memoria.pop((tabla, clave), None)
+    if anterior:
+        _bytes_memoria -= anterior[2]
+        _en_memoria[tabla] -= 1
+    if tam > CACHE_BANDAS_MAX_BYTES:
+        # No cabe ni sola: se sirve desde disco
+        return
+    _memoria[(tabla, clave)] = (ts, valor, tam)
+    _en_memoria[tabla] += 1
+    _bytes_memoria += tam
+
+    # La recién insertada es la más reciente y cabe: nunca es la expulsada
+    while _bytes_memoria > CACHE_BANDAS_MAX_BYTES:
+        (victima, _), (_, _, t) = _memoria.popitem(last=False)
+        _en_memoria[victima] -= 1
+        _bytes_memoria -= t
+        ESTADISTICAS_CACHE["expulsiones"] += 1
+
+
+def _leer(tabla: str, clave: str, ttl: int, decodificar):
+    """Busca en memoria, en lo pendiente de volcar y en disco. Devuelve None si no existe o caducó."""
+    ahora = time.time()
+    entrada = _memoria.get((tabla, clave))
+    if entrada and ahora - entrada[0] < ttl:
+        _memoria.move_to_end((tabla, clave))
+        ESTADISTICAS_CACHE["aciertos"] += 1
+        return entrada[1]
+
+    fila = _pendientes[tabla].get(clave) or _volcando[tabla].get(clave)
+    if fila is None:
+        with _bloqueo:
+            fila = _db().execute(_SQL[tabla][0], (clave,)).fetchone()
+    if fila and ahora - fila[1] < ttl:
+        valor = decodificar(fila[0])
+        _guardar_en_memoria(tabla, clave, fila[1], valor, len(fila[0]))
+        ESTADISTICAS_CACHE["aciertos"] += 1
+        return valor
+
+    ESTADISTICAS_CACHE["fallos"] += 1
+    return None
+
+
+def _guardar(tabla: str, clave: str, texto: str, valor):
+    """Guarda en memoria y deja la fila pendiente para el siguiente volcado."""
+    ahora = time.time()
+    _guardar_en_memoria(tabla, clave, ahora, valor, len(clave) + len(texto))
+    _pendientes[tabla][clave] = (texto, ahora)
+
+
+def obtener_mbid(nombre: str) -> str | None:
+    """Devuelve el MBID cacheado para una búsqueda."""
+    return _leer("consultas", normalizar_consulta(nombre), TTL_CONSULTA, lambda v: v)
+
+
+def obtener_artista(mbid: str) -> dict | None:
+    """Devuelve la info cacheada de un artista."""
+    return _leer("artistas", mbid, TTL_ARTISTA, json.loads)
+
+
+def obtener_pagina(mbid: str, pagina: int) -> dict | None:
+    """Devuelve una página cacheada de la discografía: {"albumes": [...], "total": n}."""
+    return _leer("paginas", f"{mbid}:{pagina}", TTL_ARTISTA, json.loads)
+
+
+def guardar_consulta(nombre: str, mbid: str):
+    """Guarda la relación búsqueda → MBID."""
+    _guardar("consultas", normalizar_consulta(nombre), mbid, mbid)
+
+
+def guardar_artista(mbid: str, info: dict):
+    """Guarda la info de un artista."""
+    datos = json.dumps(info, ensure_ascii=False)
+    _guardar("artistas", mbid, datos, json.loads(datos))
+
+
+def guardar_pagina(mbid: str, pagina: int, datos_pagina: dict):
+    """Guarda una página de la discografía de un artista."""
+    datos = json.dumps(datos_pagina, ensure_ascii=False)
+    _guardar("paginas", f"{mbid}:{pagina}", datos, json.loads(datos))
+
+
+def _escribir(lote: dict[str, dict[str, tuple[str, float]]]):
+    """Escribe un lote de filas en una sola transacción (se ejecuta en un hilo)."""
+    with _bloqueo:
+        db = _db()
+        with db:
+            for tabla, filas in lote.items():
+                db.executemany(_SQL[tabla][1], [(clave, texto, ts) for clave, (texto, ts) in filas.items()])
+
+
+async def volcar_cache() -> int:
+    """Escribe en disco, fuera del event loop, lo guardado desde el último volcado. Devuelve cuántas filas."""
+    global _pendientes, _volcando
+    async with _volcado:
+        total = sum(len(filas) for filas in _pendientes.values())
+        if not total:
+            return 0
+        # Lo que llegue mientras se escribe va a un lote nuevo; el actual sigue visible para _leer
+        _volcando, _pendientes = _pendientes, {tabla: {} for tabla in _SQL}
+        try:
+            await asyncio.to_thread(_escribir, _volcando)
+        finally:
+            _volcando = {tabla: {} for tabla in _SQL}
+        return total
+
+
+async def volcar_cache_job(context):
+    """Job periódico: vuelca las entradas nuevas de la caché."""
+    try:
+        await volcar_cache()
+    except sqlite3.Error as e:
+        print(f"⚠️ No se pudo guardar la caché de MusicBrainz: {e}")
+
+
+def activar(app):
+    """Programa el volcado periódico de la caché y un último volcado al parar el bot."""
+    app.job_queue.run_repeating(
+        volcar_cache_job, interval=CACHE_BANDAS_INTERVALO_GUARDADO, first=CACHE_BANDAS_INTERVALO_GUARDADO,
+    )
+    post_stop_previo = app.post_stop
+
+    async def post_stop(application):
+        await volcar_cache_job(None)
+        if post_stop_previo:
+            await post_stop_previo(application)
+
+    app.post_stop = post_stop
+
+
+def artistas_guardados():
+    """Itera sobre la info de todos los artistas vigentes guardados en disco."""
+    limite = time.time() - TTL_ARTISTA
+    with _bloqueo:
+        filas = _db().execute("SELECT datos FROM artistas WHERE ts > ?", (limite,)).fetchall()
+    for (datos,) in filas:
+        yield json.loads(datos)
+    # Los guardados desde el último volcado todavía no están en disco
+    for datos, _ in list(_pendientes["artistas"].values()):
+        yield json.loads(datos)
+
+
+def _borrar_todo() -> int:
+    """Borra las tres tablas de disco (se ejecuta en un hilo)."""
+    with _bloqueo:
+        db = _db()
+        with db:
+            eliminadas = db.execute("DELETE FROM consultas").rowcount
+            eliminadas += db.execute("DELETE FROM artistas").rowcount
+            eliminadas += db.execute("DELETE FROM paginas").rowcount
+    return eliminadas
+
+
+async def purgar_cache() -> int:
+    """Vacía la caché (memoria y disco). Devuelve el número de entradas eliminadas en disco."""
+    global _bytes_memoria
+    # Con el volcado parado: un lote a medio escribir no puede reaparecer tras el DELETE
+    async with _volcado:
+        _memoria.clear()
+        _en_memoria.clear()
+        _bytes_memoria = 0
+        for buffer in (_pendientes, _volcando):
+            for filas in buffer.values():
+                filas.clear()
+        return await asyncio.to_thread(_borrar_todo)
+
+
+def formatear_estado_cache() -> str:
+    """Resumen del estado de la caché para /admin."""
+    with _bloqueo:
+        db = _db()
+        n_consultas = db.execute("SELECT COUNT(*) FROM consultas").fetchone()[0]
+        n_artistas = db.execute("SELECT COUNT(*) FROM artistas").fetchone()[0]
+        n_paginas = db.execute("SELECT COUNT(*) FROM paginas").fetchone()[0]
+    tam_disco = CACHE_BANDAS_FILE.stat().st_size if CACHE_BANDAS_FILE.exists() else 0
+    total = ESTADISTICAS_CACHE["aciertos"] + ESTADISTICAS_CACHE["fallos"]
+    ratio = 100 * ESTADISTICAS_CACHE["aciertos"] / total if total else 0
+
+    return (
+        "🗄 *Caché de MusicBrainz*\n\n"
+        f"🧠 Memoria: {_en_memoria['consultas']} búsquedas, {_en_memoria['artistas']} artistas, "
+        f"{_en_memoria['paginas']} páginas "
+        f"({_bytes_memoria / 1024:.0f}/{CACHE_BANDAS_MAX_BYTES / 1024:.0f} KB)\n"
+        f"💾 Disco: {n_consultas} búsquedas, {n_artistas} artistas, {n_paginas} páginas ({tam_disco / 1024:.0f} KB)\n"
+        f"🎯 Aciertos: {ESTADISTICAS_CACHE['aciertos']} / {total} ({ratio:.0f}%)\n"
+        f"♻️ Expulsiones LRU: {ESTADISTICAS_CACHE['expulsiones']}\n"
+        f"⏳ TTL: {CACHE_BANDAS_TTL_HORAS} h"
+    )
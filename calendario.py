@@ -1,14 +1,47 @@
 """
 Módulo de calendario laboral con notificaciones.
 Almacena horarios de entrada/salida y notifica 10 minutos antes.
+
+El "dia" de un turno puede ser un día de la semana ("lunes"), una fecha
+("2026-03-20") o una rotación guardada como una sola regla
+("rotacion:2026-01-05:11110000": desde esa fecha, ciclo de 8 días en el que
+se trabajan los 4 primeros). Las ocurrencias de cada turno se generan bajo
+demanda solo para el intervalo que se consulta, sin materializarlas nunca.
+
+Las ausencias (vacaciones, festivos, días sueltos) se guardan en la misma lista
+con tipo "ausencia" y "dia" = "inicio/fin" ("2026-12-24/2027-01-06"). Esos días
+no se avisa de los turnos semanales ni de las rotaciones; las fechas concretas
+se avisan siempre. Además el operador puede definir festivos para todos en
+FESTIVOS_FILE. Para no recorrer todas las ausencias en cada recordatorio se
+funden en intervalos ordenados y disjuntos y se busca con bisect.
+
+Los ajustes de cada usuario van aparte de sus turnos, bajo la clave "ajustes"
+({"ajustes": {"<user_id>": {"tiempo": {"lugar", "lat", "lon"}}}}): por ahora
+solo la ciudad cuya previsión se adjunta a los recordatorios.
 """
 
 import json
 import os
-from datetime import datetime, timedelta
+import re
+import heapq
+import threading
+from bisect import bisect_right
+from datetime import date, datetime, timedelta
+from itertools import islice, repeat
 from pathlib import Path
+from typing import Iterator
+
+from telegram.helpers import escape_markdown
+
+CALENDARIO_FILE = Path(os.getenv("CALENDARIO_FILE", str(Path(__file__).parent / "calendario.json")))
+CALENDARIO_PRINCIPAL = CALENDARIO_FILE
+# Días que se conservan las fechas concretas y ausencias ya pasadas antes de compactarlas
+CALENDARIO_RETENCION_DIAS = int(os.getenv("CALENDARIO_RETENCION_DIAS", "7"))
+# Festivos comunes a todos los usuarios (opcional): una fecha o intervalo por línea
+FESTIVOS_FILE = os.getenv("FESTIVOS_FILE", "")
 
-CALENDARIO_FILE = Path(__file__).parent / "calendario.json"
+# Con varios workers cada uno usa su propio fichero: calendario.fragmento-<k>-de-<n>.json
+_PATRON_FRAGMENTO = re.compile(r"calendario\.fragmento-(\d+)-de-(\d+)\.json")
 
 # Días de la semana en español
 DIAS_SEMANA = {
@@ -23,6 +56,27 @@ DIAS_SEMANA = {
     "domingo": 6,
 }
 
+# Rotaciones: "rotacion:<inicio>:<patrón>", con un 1 por cada día trabajado del ciclo
+PREFIJO_ROTACION = "rotacion"
+MAX_CICLO_ROTACION = 366
+
+# Clave de los ajustes por usuario, junto a las de los usuarios (que son siempre números)
+CLAVE_AJUSTES = "ajustes"
+
+# Ausencias: tipo de las entradas y duración máxima de cada una
+TIPO_AUSENCIA = "ausencia"
+MAX_DIAS_AUSENCIA = 366
+_FECHA = r"\d{4}-\d{1,2}-\d{1,2}|\d{1,2}/\d{1,2}/\d{4}"
+# "24/12/2026", "24/12/2026 - 06/01/2027", "2026-12-24/2027-01-06", "24/12/2026 al 06/01/2027"
+_PATRON_AUSENCIA = re.compile(rf"(?:del\s+)?({_FECHA})(?:\s*(?:-|–|/|a|al|hasta)\s*({_FECHA}))?")
+
+# Las modificaciones (leer, cambiar, guardar) no se mezclan con la compactación,
+# que corre en otro hilo
+_escritura = threading.Lock()
+
+# Días por delante que se precalculan para /proximo
+HORIZONTE_PROXIMOS = 56
+
 DIAS_SEMANA_NOMBRE = {
     0: "Lunes",
     1: "Martes",
@@ -46,9 +100,94 @@ def cargar_calendario() -> dict:
 
 
 def guardar_calendario(data: dict):
-    """Guarda el calendario en el archivo JSON."""
-    with open(CALENDARIO_FILE, "w", encoding="utf-8") as f:
+    """Guarda el calendario en el archivo JSON.
+
+    Se escribe en un temporal que luego lo sustituye, así quien lo lea a la vez
+    (p. ej. el hilo de compactación) nunca ve un fichero a medias.
+    """
+    temporal = CALENDARIO_FILE.with_name(CALENDARIO_FILE.name + ".tmp")
+    with open(temporal, "w", encoding="utf-8") as f:
         json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(temporal, CALENDARIO_FILE)
+
+
+def _usuarios(cal: dict) -> Iterator[tuple[str, list[dict]]]:
+    """(user_id, turnos) de cada usuario del calendario, sin los ajustes."""
+    return ((uid, turnos) for uid, turnos in cal.items() if uid != CLAVE_AJUSTES)
+
+
+def _filtrar(cal: dict, condicion) -> dict:
+    """Turnos y ajustes de los usuarios que cumplen `condicion(user_id)`."""
+    parte = {uid: turnos for uid, turnos in _usuarios(cal) if condicion(uid)}
+    ajustes = {uid: a for uid, a in cal.get(CLAVE_AJUSTES, {}).items() if condicion(uid)}
+    if ajustes:
+        parte[CLAVE_AJUSTES] = ajustes
+    return parte
+
+
+def _ruta_fragmento(k: int, n: int) -> Path:
+    """Fichero del calendario del worker k de n."""
+    return CALENDARIO_PRINCIPAL.parent / f"calendario.fragmento-{k}-de-{n}.json"
+
+
+def consolidar_fragmentos() -> int:
+    """Vuelca en calendario.json los ficheros de fragmento existentes y los borra.
+    Devuelve cuántos fragmentos se consolidaron."""
+    archivos = [a for a in CALENDARIO_PRINCIPAL.parent.glob("calendario.fragmento-*.json")
+                if _PATRON_FRAGMENTO.fullmatch(a.name)]
+    if not archivos:
+        return 0
+
+    cal = cargar_calendario()
+    for archivo in archivos:
+        k, n = map(int, _PATRON_FRAGMENTO.fullmatch(archivo.name).groups())
+        # El fragmento manda sobre sus usuarios (incluidos los que borraron todo)
+        cal = _filtrar(cal, lambda uid: int(uid) % n != k)
+        with open(archivo, "r", encoding="utf-8") as f:
+            parte = json.load(f)
+        ajustes = {**cal.pop(CLAVE_AJUSTES, {}), **parte.pop(CLAVE_AJUSTES, {})}
+        cal.update(parte)
+        if ajustes:
+            cal[CLAVE_AJUSTES] = ajustes
+
+    guardar_calendario(cal)
+    for archivo in archivos:
+        archivo.unlink()
+    return len(archivos)
+
+
+def repartir_en_fragmentos(n: int):
+    """Reparte calendario.json en n ficheros, uno por worker (user_id % n)."""
+    consolidar_fragmentos()
+    cal = cargar_calendario()
+    for k in range(n):
+        parte = _filtrar(cal, lambda uid: int(uid) % n == k)
+        with open(_ruta_fragmento(k, n), "w", encoding="utf-8") as f:
+            json.dump(parte, f, ensure_ascii=False, indent=2)
+
+
+def usuarios_calendario() -> set[int]:
+    """Usuarios con turnos o ajustes guardados (en modo multiproceso, de todos los fragmentos)."""
+    fragmentos = [a for a in CALENDARIO_PRINCIPAL.parent.glob("calendario.fragmento-*.json")
+                  if _PATRON_FRAGMENTO.fullmatch(a.name)]
+    # Mientras hay fragmentos, calendario.json es la copia de antes del reparto y no se actualiza
+    archivos = fragmentos or [CALENDARIO_PRINCIPAL]
+    usuarios = set()
+    for archivo in archivos:
+        try:
+            with open(archivo, "r", encoding="utf-8") as f:
+                cal = json.load(f)
+            usuarios.update(int(uid) for uid, _ in _usuarios(cal))
+            usuarios.update(map(int, cal.get(CLAVE_AJUSTES, {})))
+        except (FileNotFoundError, json.JSONDecodeError):
+            continue
+    return usuarios
+
+
+def usar_fragmento(k: int, n: int):
+    """Hace que este proceso lea y escriba solo el calendario del worker k de n."""
+    global CALENDARIO_FILE
+    CALENDARIO_FILE = _ruta_fragmento(k, n)
 
 
 def obtener_turnos_usuario(user_id: int) -> list[dict]:
@@ -59,135 +198,527 @@ def obtener_turnos_usuario(user_id: int) -> list[dict]:
 
 def agregar_turno(user_id: int, dia: str, hora: str, tipo: str) -> bool:
     """Agrega un turno al calendario del usuario.
-    dia: nombre del día (lunes-domingo) o fecha (YYYY-MM-DD)
+    dia: nombre del día (lunes-domingo), fecha (YYYY-MM-DD) o rotación
     hora: HH:MM
     tipo: 'entrada' o 'salida'
     """
-    cal = cargar_calendario()
-    uid = str(user_id)
+    with _escritura:
+        cal = cargar_calendario()
+        uid = str(user_id)
+
+        if uid not in cal:
+            cal[uid] = []
+
+        # Verificar que no existe ya un turno idéntico
+        for turno in cal[uid]:
+            if turno["dia"] == dia and turno["hora"] == hora and turno["tipo"] == tipo:
+                return False  # Ya existe
+
+        cal[uid].append({
+            "dia": dia,
+            "hora": hora,
+            "tipo": tipo,
+        })
+
+        # Ordenar por día y hora
+        cal[uid].sort(key=lambda t: (
+            _orden_dia(t["dia"]),
+            t["hora"],
+        ))
+
+        guardar_calendario(cal)
+        return True
+
+
+def agregar_turnos(user_id: int, nuevos: list[dict]) -> int:
+    """Agrega de una vez varios turnos (o ausencias): una sola lectura, ordenación y escritura.
+    Se saltan los que ya existen. Devuelve cuántos se añadieron."""
+    with _escritura:
+        cal = cargar_calendario()
+        uid = str(user_id)
+        turnos = cal.setdefault(uid, [])
+        existentes = {(t["dia"], t["hora"], t["tipo"]) for t in turnos}
+
+        agregados = 0
+        for turno in nuevos:
+            clave = (turno["dia"], turno["hora"], turno["tipo"])
+            if clave not in existentes:
+                existentes.add(clave)
+                turnos.append({"dia": turno["dia"], "hora": turno["hora"], "tipo": turno["tipo"]})
+                agregados += 1
+        if not agregados:
+            if not turnos:
+                del cal[uid]
+            return 0
+
+        turnos.sort(key=lambda t: (_orden_dia(t["dia"]), t["hora"]))
+        guardar_calendario(cal)
+        return agregados
+
+
+def agregar_ausencia(user_id: int, ausencia: str) -> bool:
+    """Agrega una ausencia ("inicio/fin", ver validar_ausencia). False si ya existía."""
+    return agregar_turno(user_id, ausencia, "", TIPO_AUSENCIA)
+
+
+def lugar_tiempo(user_id: int) -> dict | None:
+    """Ciudad elegida para el tiempo en los recordatorios: {"lugar", "lat", "lon"}, o None."""
+    return cargar_calendario().get(CLAVE_AJUSTES, {}).get(str(user_id), {}).get("tiempo")
+
+
+def guardar_lugar_tiempo(user_id: int, lat: float, lon: float, lugar: str):
+    """Activa (o cambia) la ciudad del tiempo en los recordatorios."""
+    with _escritura:
+        cal = cargar_calendario()
+        ajustes = cal.setdefault(CLAVE_AJUSTES, {}).setdefault(str(user_id), {})
+        ajustes["tiempo"] = {"lugar": lugar, "lat": lat, "lon": lon}
+        guardar_calendario(cal)
+
+
+def quitar_lugar_tiempo(user_id: int) -> bool:
+    """Desactiva el tiempo en los recordatorios. False si no estaba activo."""
+    with _escritura:
+        cal = cargar_calendario()
+        todos = cal.get(CLAVE_AJUSTES, {})
+        ajustes = todos.get(str(user_id), {})
+        if ajustes.pop("tiempo", None) is None:
+            return False
+        if not ajustes:
+            del todos[str(user_id)]
+        if not todos:
+            del cal[CLAVE_AJUSTES]
+        guardar_calendario(cal)
+        return True
 
-    if uid not in cal:
-        cal[uid] = []
 
-    # Verificar que no existe ya un turno idéntico
-    for turno in cal[uid]:
-        if turno["dia"] == dia and turno["hora"] == hora and turno["tipo"] == tipo:
-            return False  # Ya existe
+def eliminar_turno(user_id: int, indice: int) -> dict | None:
+    """Elimina un turno por índice (0-based). Devuelve el turno eliminado."""
+    with _escritura:
+        cal = cargar_calendario()
+        uid = str(user_id)
 
-    cal[uid].append({
-        "dia": dia,
-        "hora": hora,
-        "tipo": tipo,
-    })
+        if uid not in cal or indice < 0 or indice >= len(cal[uid]):
+            return None
 
-    # Ordenar por día y hora
-    orden_dias = {v: k for k, v in DIAS_SEMANA_NOMBRE.items()}
-    cal[uid].sort(key=lambda t: (
-        _orden_dia(t["dia"]),
-        t["hora"],
-    ))
+        turno = cal[uid].pop(indice)
 
-    guardar_calendario(cal)
-    return True
+        if not cal[uid]:
+            del cal[uid]
 
+        guardar_calendario(cal)
+        return turno
 
-def eliminar_turno(user_id: int, indice: int) -> dict | None:
-    """Elimina un turno por índice (0-based). Devuelve el turno eliminado."""
-    cal = cargar_calendario()
-    uid = str(user_id)
 
-    if uid not in cal or indice < 0 or indice >= len(cal[uid]):
-        return None
+def eliminar_todos_turnos(user_id: int) -> int:
+    """Elimina todos los turnos de un usuario. Devuelve cantidad eliminada."""
+    with _escritura:
+        cal = cargar_calendario()
+        uid = str(user_id)
 
-    turno = cal[uid].pop(indice)
+        if uid not in cal:
+            return 0
 
-    if not cal[uid]:
+        cantidad = len(cal[uid])
         del cal[uid]
+        guardar_calendario(cal)
+        return cantidad
 
-    guardar_calendario(cal)
-    return turno
+
+def _caducado(turno: dict, limite: date) -> bool:
+    """Fecha concreta o ausencia que terminó antes de `limite` (los semanales y rotaciones no caducan)."""
+    rango = rango_ausencia(turno["dia"])
+    if rango:
+        return rango[1] < limite
+    try:
+        return date.fromisoformat(turno["dia"]) < limite
+    except ValueError:
+        return False
 
 
-def eliminar_todos_turnos(user_id: int) -> int:
-    """Elimina todos los turnos de un usuario. Devuelve cantidad eliminada."""
+def compactar_calendario(retencion_dias: int = CALENDARIO_RETENCION_DIAS, hoy: date | None = None) -> dict | None:
+    """Elimina las fechas concretas y ausencias que pasaron hace más de `retencion_dias` días.
+
+    Pensada para un hilo aparte: lee y filtra sin bloquear a nadie y solo toma
+    el cerrojo para guardar. Si mientras tanto alguien cambió el calendario no
+    guarda nada y devuelve None (se reintentará en la siguiente pasada).
+
+    Returns:
+        {"turnos", "usuarios", "bytes"} eliminados, o None
+    """
+    limite = (hoy or date.today()) - timedelta(days=retencion_dias)
+    clave = _clave_fichero(CALENDARIO_FILE)
     cal = cargar_calendario()
+
+    # Los ajustes no caducan
+    compactado = {CLAVE_AJUSTES: cal[CLAVE_AJUSTES]} if CLAVE_AJUSTES in cal else {}
+    turnos = usuarios = 0
+    for uid, lista in _usuarios(cal):
+        # Filtrar conserva el orden de la lista
+        vigentes = [t for t in lista if not _caducado(t, limite)]
+        turnos += len(lista) - len(vigentes)
+        if vigentes:
+            compactado[uid] = vigentes
+        else:
+            usuarios += 1
+    if not turnos:
+        return {"turnos": 0, "usuarios": 0, "bytes": 0}
+
+    with _escritura:
+        if _clave_fichero(CALENDARIO_FILE) != clave:
+            return None
+        guardar_calendario(compactado)
+    return {"turnos": turnos, "usuarios": usuarios, "bytes": clave[2] - CALENDARIO_FILE.stat().st_size}
+
+
+def formatear_compactacion(resultado: dict | None) -> str:
+    """Resumen de una compactación para el log o para /admin."""
+    if resultado is None:
+        return "🧹 El calendario cambió durante la compactación; se reintentará en la siguiente pasada"
+    if not resultado["turnos"]:
+        return f"🧹 Calendario sin turnos caducados (retención {CALENDARIO_RETENCION_DIAS} días)"
+    return (f"🧹 Calendario compactado: {resultado['turnos']} turnos caducados eliminados "
+            f"({resultado['usuarios']} usuarios sin turnos), {resultado['bytes'] / 1024:.1f} KB liberados")
+
+
+def regla_rotacion(dia: str) -> tuple[date, str] | None:
+    """(inicio, patrón) si `dia` es una rotación."""
+    if not dia.startswith(PREFIJO_ROTACION + ":"):
+        return None
+    _, inicio, patron = dia.split(":")
+    return date.fromisoformat(inicio), patron
+
+
+def ocurrencias(turno: dict, desde: date, hasta: date | None = None) -> Iterator[datetime]:
+    """Fechas y horas en que ocurre `turno` entre `desde` y `hasta` (incluidos), en orden.
+
+    Es un generador: sin `hasta` no termina nunca con los turnos semanales y las
+    rotaciones, así que se consume solo lo que hace falta (p. ej. con islice).
+    """
+    if turno["tipo"] == TIPO_AUSENCIA:
+        return
+    h, m = map(int, turno["hora"].split(":"))
+    hora = timedelta(hours=h, minutes=m)
+    dia = turno["dia"].lower()
+
+    if dia in DIAS_SEMANA:
+        fecha = desde + timedelta(days=(DIAS_SEMANA[dia] - desde.weekday()) % 7)
+        while hasta is None or fecha <= hasta:
+            yield datetime(fecha.year, fecha.month, fecha.day) + hora
+            fecha += timedelta(days=7)
+        return
+
+    regla = regla_rotacion(dia)
+    if regla is None:
+        # Fecha concreta
+        try:
+            fecha = date.fromisoformat(dia)
+        except ValueError:
+            return
+        if desde <= fecha and (hasta is None or fecha <= hasta):
+            yield datetime(fecha.year, fecha.month, fecha.day) + hora
+        return
+
+    inicio, patron = regla
+    ciclo = len(patron)
+    trabajados = [i for i, c in enumerate(patron) if c == "1"]
+    desde = max(desde, inicio)
+    # Primer día del ciclo en el que cae `desde`
+    base = desde - timedelta(days=(desde - inicio).days % ciclo)
+    while True:
+        for i in trabajados:
+            fecha = base + timedelta(days=i)
+            if fecha < desde:
+                continue
+            if hasta is not None and fecha > hasta:
+                return
+            yield datetime(fecha.year, fecha.month, fecha.day) + hora
+        base += timedelta(days=ciclo)
+
+
+def ocurrencias_turnos(turnos: list[dict], desde: date, hasta: date | None = None) -> Iterator[tuple[datetime, dict]]:
+    """Ocurrencias de varios turnos mezcladas en orden cronológico: (fecha y hora, turno)."""
+    # zip con repeat fija i y turno de cada generador (una expresión generadora los leería al final)
+    generadores = [zip(ocurrencias(turno, desde, hasta), repeat(i), repeat(turno))
+                   for i, turno in enumerate(turnos)]
+    for momento, _, turno in heapq.merge(*generadores):
+        yield momento, turno
+
+
+def rango_ausencia(dia: str) -> tuple[date, date] | None:
+    """(inicio, fin) si `dia` es una ausencia "YYYY-MM-DD/YYYY-MM-DD"."""
+    inicio, _, fin = dia.partition("/")
+    try:
+        return date.fromisoformat(inicio), date.fromisoformat(fin)
+    except ValueError:
+        return None
+
+
+def _intervalos(rangos) -> tuple[list[int], list[int]]:
+    """Funde intervalos (inicio, fin) de ordinales en listas de inicios y fines ordenadas y disjuntas."""
+    inicios: list[int] = []
+    fines: list[int] = []
+    for inicio, fin in sorted(rangos):
+        # Solapado o contiguo con el anterior: se alarga
+        if fines and inicio <= fines[-1] + 1:
+            fines[-1] = max(fines[-1], fin)
+        else:
+            inicios.append(inicio)
+            fines.append(fin)
+    return inicios, fines
+
+
+def _dentro(indice: tuple[list[int], list[int]], dia: int) -> bool:
+    """Si el ordinal `dia` cae en algún intervalo del índice: una búsqueda binaria."""
+    inicios, fines = indice
+    i = bisect_right(inicios, dia) - 1
+    return i >= 0 and dia <= fines[i]
+
+
+def _clave_fichero(ruta: Path) -> tuple:
+    """Cambia cada vez que se reescribe el fichero (o desaparece)."""
+    try:
+        st = ruta.stat()
+    except OSError:
+        return str(ruta), None
+    return str(ruta), st.st_mtime_ns, st.st_size
+
+
+# Índices ya construidos: (clave del fichero del que salen, índice)
+_indice_ausencias: tuple | None = None
+_indice_festivos: tuple | None = None
+
+
+def _ausencias() -> dict[str, tuple[list[int], list[int]]]:
+    """Índice de ausencias por usuario; se reconstruye solo si cambió el calendario."""
+    global _indice_ausencias
+    clave = _clave_fichero(CALENDARIO_FILE)
+    if _indice_ausencias is None or _indice_ausencias[0] != clave:
+        indice = {}
+        for uid, turnos in _usuarios(cargar_calendario()):
+            rangos = [rango_ausencia(t["dia"]) for t in turnos if t["tipo"] == TIPO_AUSENCIA]
+            rangos = [(a.toordinal(), b.toordinal()) for a, b in filter(None, rangos)]
+            if rangos:
+                indice[uid] = _intervalos(rangos)
+        _indice_ausencias = (clave, indice)
+    return _indice_ausencias[1]
+
+
+def _festivos() -> tuple[list[int], list[int]]:
+    """Índice de los festivos de FESTIVOS_FILE; se relee solo si cambió el fichero.
+
+    Formato: una fecha o intervalo por línea, con un nombre opcional detrás
+    ("2026-12-25 Navidad", "01/08/2026 - 31/08/2026 Cierre de agosto").
+    Las líneas vacías y las que empiezan por # se ignoran.
+    """
+    global _indice_festivos
+    if not FESTIVOS_FILE:
+        return [], []
+    ruta = Path(FESTIVOS_FILE)
+    clave = _clave_fichero(ruta)
+    if _indice_festivos is None or _indice_festivos[0] != clave:
+        rangos = []
+        try:
+            lineas = ruta.read_text(encoding="utf-8").splitlines()
+        except OSError as e:
+            print(f"⚠️ No se pudo leer FESTIVOS_FILE: {e}")
+            lineas = []
+        for n, linea in enumerate(lineas, 1):
+            linea = linea.strip()
+            if not linea or linea.startswith("#"):
+                continue
+            m = _PATRON_AUSENCIA.match(linea.lower())
+            rango = rango_ausencia(_ausencia(m) or "") if m else None
+            if rango is None:
+                print(f"⚠️ Festivo no válido en {ruta.name}:{n}: {linea}")
+                continue
+            rangos.append((rango[0].toordinal(), rango[1].toordinal()))
+        _indice_festivos = (clave, _intervalos(rangos))
+    return _indice_festivos[1]
+
+
+def en_ausencia(user_id: int, fecha: date) -> bool:
+    """Si `fecha` es festivo o cae en una ausencia del usuario (O(log n), sin recorrerlas)."""
+    dia = fecha.toordinal()
+    if _dentro(_festivos(), dia):
+        return True
+    indice = _ausencias().get(str(user_id))
+    return indice is not None and _dentro(indice, dia)
+
+
+def es_recurrente(turno: dict) -> bool:
+    """Turnos semanales y rotaciones: los que se saltan en las ausencias."""
+    dia = turno["dia"].lower()
+    return dia in DIAS_SEMANA or regla_rotacion(dia) is not None
+
+
+def _sin_ausencias(user_id: int, momentos: Iterator[tuple[datetime, dict]]) -> Iterator[tuple[datetime, dict]]:
+    """Quita las ocurrencias de turnos recurrentes que caen en ausencias o festivos."""
+    for momento, turno in momentos:
+        if not (es_recurrente(turno) and en_ausencia(user_id, momento.date())):
+            yield momento, turno
+
+
+# Agenda de cada usuario para /proximo: uid → (momentos ordenados, turno de cada momento).
+# Vale mientras no cambien el calendario, los festivos ni el día
+_agendas: dict[str, tuple[list[datetime], list[dict]]] = {}
+_clave_agendas: tuple | None = None
+
+
+def _agenda(user_id: int, hoy: date) -> tuple[list[datetime], list[dict]]:
+    """Ocurrencias del usuario de hoy a HORIZONTE_PROXIMOS días, ordenadas (se calculan una vez)."""
+    global _clave_agendas
+    clave = (_clave_fichero(CALENDARIO_FILE), FESTIVOS_FILE and _clave_fichero(Path(FESTIVOS_FILE)), hoy)
+    if clave != _clave_agendas:
+        _agendas.clear()
+        _clave_agendas = clave
     uid = str(user_id)
+    if uid not in _agendas:
+        hasta = hoy + timedelta(days=HORIZONTE_PROXIMOS)
+        momentos, turnos = [], []
+        for momento, turno in _sin_ausencias(user_id, ocurrencias_turnos(obtener_turnos_usuario(user_id), hoy, hasta)):
+            momentos.append(momento)
+            turnos.append(turno)
+        _agendas[uid] = (momentos, turnos)
+    return _agendas[uid]
 
-    if uid not in cal:
-        return 0
 
-    cantidad = len(cal[uid])
-    del cal[uid]
-    guardar_calendario(cal)
-    return cantidad
+def proximos_turnos(user_id: int, n: int = 5, ahora: datetime | None = None) -> list[tuple[datetime, dict]]:
+    """Las `n` próximas ocurrencias de los turnos del usuario: (fecha y hora, turno).
+
+    Sobre la agenda ya ordenada basta una búsqueda binaria del momento actual;
+    solo si no llega con el horizonte se siguen generando más allá.
+    """
+    ahora = ahora or datetime.now()
+    momentos, turnos = _agenda(user_id, ahora.date())
+    i = bisect_right(momentos, ahora)
+    resultado = list(zip(momentos[i:i + n], turnos[i:i + n]))
+    if len(resultado) < n:
+        desde = ahora.date() + timedelta(days=HORIZONTE_PROXIMOS + 1)
+        resto = _sin_ausencias(user_id, ocurrencias_turnos(obtener_turnos_usuario(user_id), desde))
+        resultado.extend(islice(resto, n - len(resultado)))
+    return resultado
+
+
+def _falta(desde: datetime, hasta: datetime) -> str:
+    """Tiempo restante legible: "45 min", "2 h 15 min", "3 días"."""
+    minutos = int((hasta - desde).total_seconds() // 60)
+    if minutos >= 48 * 60:
+        return f"{minutos // (24 * 60)} días"
+    if minutos >= 60:
+        return f"{minutos // 60} h {minutos % 60} min"
+    return f"{minutos} min"
+
+
+def formatear_proximos(user_id: int, n: int = 5) -> str:
+    """Formatea las próximas ocurrencias de los turnos del usuario para Telegram."""
+    ahora = datetime.now()
+    proximos = proximos_turnos(user_id, n, ahora)
+    if not proximos:
+        return "⏭ No tienes turnos próximos.\n\nUsa /horario para añadir uno."
+
+    lineas = ["⏭ *Tus próximos turnos:*\n"]
+    for i, (momento, turno) in enumerate(proximos):
+        emoji = "🟢" if turno["tipo"] == "entrada" else "🔴"
+        dias = (momento.date() - ahora.date()).days
+        if dias == 0:
+            cuando = "Hoy"
+        elif dias == 1:
+            cuando = "Mañana"
+        else:
+            cuando = f"{DIAS_SEMANA_NOMBRE[momento.weekday()]} {momento.strftime('%d/%m')}"
+        linea = f"{emoji} {cuando} {momento.strftime('%H:%M')} — {turno['tipo'].capitalize()}"
+        if i == 0:
+            linea = f"*{linea}*  _(en {_falta(ahora, momento)})_"
+        lineas.append(linea)
+    return "\n".join(lineas)
 
 
 def obtener_turnos_proximos(minutos_antes: int = 10) -> list[dict]:
-    """Devuelve turnos que ocurren exactamente en `minutos_antes` minutos.
-    Cada resultado incluye: user_id, dia, hora, tipo.
+    """Devuelve turnos que ocurren exactamente en `minutos_antes` minutos (salvo ausencias).
+    Cada resultado incluye: user_id, dia, fecha, hora, tipo y tiempo (la ciudad, o None).
     """
-    ahora = datetime.now()
-    objetivo = ahora + timedelta(minutes=minutos_antes)
+    return obtener_turnos_ventanas(minutos_antes)[0]
 
-    dia_semana_actual = ahora.weekday()
-    hora_objetivo = objetivo.strftime("%H:%M")
-    fecha_hoy = ahora.strftime("%Y-%m-%d")
+
+def obtener_turnos_ventanas(*minutos_antes: int, ahora: datetime | None = None) -> list[list[dict]]:
+    """Como `obtener_turnos_proximos` para varios minutos a la vez, leyendo el calendario una sola vez.
+    Devuelve una lista de resultados por cada valor de `minutos_antes`, en el mismo orden.
+    """
+    ahora = ahora or datetime.now()
+    objetivos = []
+    for minutos in minutos_antes:
+        objetivo = ahora + timedelta(minutes=minutos)
+        objetivos.append((objetivo.strftime("%H:%M"), objetivo.date()))
 
     cal = cargar_calendario()
-    resultado = []
+    ajustes = cal.get(CLAVE_AJUSTES, {})
+    resultados: list[list[dict]] = [[] for _ in objetivos]
 
-    for uid, turnos in cal.items():
+    for uid, turnos in _usuarios(cal):
         for turno in turnos:
-            dia = turno["dia"]
-            hora = turno["hora"]
-
-            # Comprobar si el turno coincide
-            coincide = False
-
-            # ¿Es un día de la semana recurrente?
-            dia_lower = dia.lower()
-            if dia_lower in DIAS_SEMANA:
-                if DIAS_SEMANA[dia_lower] == dia_semana_actual and hora == hora_objetivo:
-                    coincide = True
-            # ¿Es una fecha específica?
-            elif dia == fecha_hoy and hora == hora_objetivo:
-                coincide = True
-
-            if coincide:
+            for (hora_objetivo, fecha_objetivo), resultado in zip(objetivos, resultados):
+                # La hora descarta casi todos; solo se expande el día objetivo de los que quedan
+                if turno["hora"] != hora_objetivo:
+                    continue
+                if next(ocurrencias(turno, fecha_objetivo, fecha_objetivo), None) is None:
+                    continue
+                if es_recurrente(turno) and en_ausencia(int(uid), fecha_objetivo):
+                    continue
                 resultado.append({
                     "user_id": int(uid),
-                    "dia": dia,
-                    "hora": hora,
+                    "dia": turno["dia"],
+                    "fecha": fecha_objetivo.isoformat(),
+                    "hora": turno["hora"],
                     "tipo": turno["tipo"],
+                    "tiempo": ajustes.get(uid, {}).get("tiempo"),
                 })
 
-    return resultado
+    return resultados
 
 
 def formatear_calendario(user_id: int) -> str:
     """Formatea el calendario de un usuario para mostrar en Telegram."""
-    turnos = obtener_turnos_usuario(user_id)
+    todos = list(enumerate(obtener_turnos_usuario(user_id)))
+    turnos = [(i, t) for i, t in todos if t["tipo"] != TIPO_AUSENCIA]
+    ausencias = [(i, t) for i, t in todos if t["tipo"] == TIPO_AUSENCIA]
 
-    if not turnos:
+    if not todos:
         return "📅 No tienes turnos configurados.\n\nUsa /horario para añadir uno."
 
     lineas = ["📅 *Tu calendario laboral:*\n"]
+    hoy = date.today()
 
     dia_actual = None
-    for i, turno in enumerate(turnos):
+    for i, turno in turnos:
         dia = turno["dia"]
         hora = turno["hora"]
         tipo = turno["tipo"]
         emoji = "🟢" if tipo == "entrada" else "🔴"
 
         # Nombre bonito del día
-        dia_nombre = _nombre_dia(dia)
+        dia_nombre = nombre_dia(dia)
 
         if dia_nombre != dia_actual:
             dia_actual = dia_nombre
             lineas.append(f"\n📆 *{dia_nombre}*")
 
         lineas.append(f"  {emoji} {hora} — {tipo.capitalize()}  (#{i + 1})")
+        if regla_rotacion(dia):
+            # Solo se generan las próximas ocurrencias que se muestran
+            libres = (m for m in ocurrencias(turno, hoy) if not en_ausencia(user_id, m.date()))
+            proximas = [m.strftime("%d/%m") for m, _ in zip(libres, range(4))]
+            lineas.append(f"     _Próximos: {', '.join(proximas)}_")
+
+    if ausencias:
+        lineas.append("\n🏖 *Ausencias* _(sin avisos de turnos semanales ni rotaciones)_")
+        for i, ausencia in ausencias:
+            lineas.append(f"  {nombre_dia(ausencia['dia'])}  (#{i + 1})")
+    if _festivos()[0]:
+        lineas.append("_Los festivos generales también cuentan como ausencia_")
+    tiempo = lugar_tiempo(user_id)
+    if tiempo:
+        # Fuera de las negritas: dentro de una entidad Markdown no valen los escapes
+        lineas.append(f"\n🌤 *Tiempo en los recordatorios:* {escape_markdown(nombre_lugar(tiempo))}")
 
     lineas.append(f"\n_Total: {len(turnos)} turnos configurados_")
     lineas.append("_Recibirás notificación 10 min antes de cada turno_")
@@ -195,23 +726,54 @@ def formatear_calendario(user_id: int) -> str:
     return "\n".join(lineas)
 
 
+def nombre_lugar(tiempo: dict) -> str:
+    """Nombre corto de la ciudad del tiempo ("Madrid, España" → "Madrid")."""
+    return tiempo["lugar"].split(",")[0]
+
+
 def _orden_dia(dia: str) -> int:
     """Devuelve un número para ordenar días."""
     dia_lower = dia.lower()
     if dia_lower in DIAS_SEMANA:
         return DIAS_SEMANA[dia_lower]
-    # Fechas específicas van al final, ordenadas
+    # Las rotaciones van tras los días de la semana, por fecha de inicio
+    regla = regla_rotacion(dia_lower)
+    if regla:
+        return 10 + regla[0].toordinal()
+    # Las ausencias, al final de todo por fecha de inicio
+    rango = rango_ausencia(dia)
+    if rango:
+        return 100_000_000 + rango[0].toordinal()
+    # Fechas específicas van tras las rotaciones, ordenadas
     try:
-        return 100 + int(dia.replace("-", ""))
+        return 10_000_000 + int(dia.replace("-", ""))
     except ValueError:
-        return 999
+        return 999_999_999
 
 
-def _nombre_dia(dia: str) -> str:
+def describir_patron(patron: str) -> str:
+    """"11110000" → "4x4": días seguidos trabajados, libres, trabajados..."""
+    tramos = [len(m.group()) for m in re.finditer(r"1+|0+", patron)]
+    if patron.startswith("0"):
+        tramos.insert(0, 0)
+    return "x".join(map(str, tramos))
+
+
+def nombre_dia(dia: str) -> str:
     """Convierte un día a nombre bonito."""
     dia_lower = dia.lower()
     if dia_lower in DIAS_SEMANA:
         return DIAS_SEMANA_NOMBRE[DIAS_SEMANA[dia_lower]]
+    regla = regla_rotacion(dia_lower)
+    if regla:
+        inicio, patron = regla
+        return f"🔁 Rotación {describir_patron(patron)} desde {inicio.strftime('%d/%m/%Y')}"
+    rango = rango_ausencia(dia)
+    if rango:
+        inicio, fin = rango
+        if inicio == fin:
+            return f"🏖 {DIAS_SEMANA_NOMBRE[inicio.weekday()]} {inicio.strftime('%d/%m/%Y')}"
+        return f"🏖 {inicio.strftime('%d/%m/%Y')} – {fin.strftime('%d/%m/%Y')} ({(fin - inicio).days + 1} días)"
     # Es una fecha
     try:
         fecha = datetime.strptime(dia, "%Y-%m-%d")
@@ -235,26 +797,69 @@ def validar_hora(hora_str: str) -> str | None:
     return None
 
 
+def _validar_fecha(texto: str) -> str | None:
+    """Fecha YYYY-MM-DD o DD/MM/YYYY → YYYY-MM-DD, o None."""
+    for formato in ("%Y-%m-%d", "%d/%m/%Y"):
+        try:
+            return datetime.strptime(texto, formato).strftime("%Y-%m-%d")
+        except ValueError:
+            pass
+    return None
+
+
+def validar_patron(texto: str) -> str | None:
+    """Patrón de rotación → cadena de 0/1 (un carácter por día del ciclo), o None.
+
+    Acepta tramos alternos trabajados/libres ("4x4", "5x2", "2x2x3x2x2x3")
+    o los días del ciclo uno a uno ("11110000").
+    """
+    texto = texto.strip().lower()
+    if re.fullmatch(r"[01]+", texto):
+        patron = texto
+    elif re.fullmatch(r"\d+(x\d+)+", texto):
+        patron = "".join(("1" if i % 2 == 0 else "0") * int(n) for i, n in enumerate(texto.split("x")))
+    else:
+        return None
+    if "1" not in patron or len(patron) > MAX_CICLO_ROTACION:
+        return None
+    return patron
+
+
+def _ausencia(m: re.Match) -> str | None:
+    """Fechas capturadas por _PATRON_AUSENCIA → "inicio/fin", o None si no son válidas."""
+    inicio = _validar_fecha(m.group(1))
+    fin = _validar_fecha(m.group(2) or m.group(1))
+    if not inicio or not fin or fin < inicio:
+        return None
+    if (date.fromisoformat(fin) - date.fromisoformat(inicio)).days >= MAX_DIAS_AUSENCIA:
+        return None
+    return f"{inicio}/{fin}"
+
+
+def validar_ausencia(texto: str) -> str | None:
+    """Día ("24/12/2026") o intervalo ("24/12/2026 - 06/01/2027") → "2026-12-24/2027-01-06", o None."""
+    m = _PATRON_AUSENCIA.fullmatch(texto.strip().lower())
+    return _ausencia(m) if m else None
+
+
 def validar_dia(dia_str: str) -> str | None:
-    """Valida un día (nombre o fecha YYYY-MM-DD). Devuelve normalizado o None."""
+    """Valida un día (nombre, fecha YYYY-MM-DD / DD/MM/YYYY o rotación). Devuelve normalizado o None.
+
+    Rotación: "rotación <fecha de inicio> <patrón>", p. ej. "rotación 05/01/2026 4x4".
+    """
     dia = dia_str.strip().lower()
 
     # Día de la semana
     if dia in DIAS_SEMANA:
         return dia
 
-    # Fecha específica
-    try:
-        datetime.strptime(dia, "%Y-%m-%d")
-        return dia
-    except ValueError:
-        pass
-
-    # Intentar DD/MM/YYYY
-    try:
-        fecha = datetime.strptime(dia, "%d/%m/%Y")
-        return fecha.strftime("%Y-%m-%d")
-    except ValueError:
-        pass
+    # Rotación
+    partes = dia.split()
+    if len(partes) == 3 and partes[0] in ("rotación", "rotacion"):
+        inicio, patron = _validar_fecha(partes[1]), validar_patron(partes[2])
+        if inicio and patron:
+            return f"{PREFIJO_ROTACION}:{inicio}:{patron}"
+        return None
 
-    return None
+    # Fecha específica
+    return _validar_fecha(dia)
@@ -0,0 +1,277 @@
+"""
+Importación y exportación del calendario laboral.
+
+Importar: el usuario envía un fichero .csv o .ics y se añaden todos sus turnos
+de una vez. El fichero se recorre línea a línea (las filas y eventos se validan
+según se leen, sin cargar el documento entero en estructuras intermedias) y lo
+válido se guarda con una sola escritura del calendario.
+
+    CSV   una fila por turno: día;hora;tipo  (separador , o ;, cabecera opcional)
+          lunes;08:00;entrada
+          20/03/2026;07:30;entrada
+          rotación 05/01/2026 4x4;19:00;salida
+          24/12/2026 - 06/01/2027;;ausencia
+    ICS   cada VEVENT con hora es una entrada en DTSTART y, si tiene DTEND, una
+          salida; RRULE semanal (BYDAY) → turnos semanales, diaria (INTERVAL=n)
+          → rotación de n días; los eventos de día completo son ausencias
+
+Exportar: /horario export genera un .ics con los turnos (los semanales y las
+rotaciones como eventos repetidos) que se puede abrir en cualquier calendario y
+volver a importar sin pérdidas.
+"""
+import io
+import csv
+from datetime import date, datetime, timedelta, timezone
+from itertools import chain
+from typing import Iterable, Iterator
+
+from calendario import (
+    obtener_turnos_usuario,
+    ocurrencias,
+    validar_dia,
+    validar_hora,
+    validar_ausencia,
+    regla_rotacion,
+    rango_ausencia,
+    DIAS_SEMANA,
+    TIPO_AUSENCIA,
+)
+
+# Tamaño máximo del fichero y de turnos por importación
+IMPORTAR_MAX_BYTES = 512 * 1024
+IMPORTAR_MAX_TURNOS = 500
+# Errores que se detallan al usuario (el resto solo se cuentan)
+MAX_ERRORES_MOSTRADOS = 5
+
+TIPOS = ("entrada", "salida", TIPO_AUSENCIA)
+# Días de la semana en iCalendar (BYDAY), de lunes a domingo
+DIAS_ICS = ("MO", "TU", "WE", "TH", "FR", "SA", "SU")
+NOMBRES_DIA = ("lunes", "martes", "miércoles", "jueves", "viernes", "sábado", "domingo")
+
+
+# --- Importar ---
+
+def _turno(dia: str, hora: str, tipo: str) -> dict:
+    """Valida un turno leído del fichero. Lanza ValueError con el motivo."""
+    tipo = (tipo.strip().lower() or "entrada")
+    if tipo not in TIPOS:
+        raise ValueError(f"tipo '{tipo}' no válido (entrada, salida o ausencia)")
+    if tipo == TIPO_AUSENCIA:
+        ausencia = validar_ausencia(dia)
+        if not ausencia:
+            raise ValueError(f"ausencia '{dia}' no válida")
+        return {"dia": ausencia, "hora": "", "tipo": tipo}
+    dia_valido = validar_dia(dia)
+    if not dia_valido:
+        raise ValueError(f"día '{dia}' no válido")
+    hora_valida = validar_hora(hora)
+    if not hora_valida:
+        raise ValueError(f"hora '{hora}' no válida")
+    return {"dia": dia_valido, "hora": hora_valida, "tipo": tipo}
+
+
+def _filas_csv(lineas: Iterator[str]) -> Iterator[tuple[int, dict | str]]:
+    """(número de línea, turno o motivo del error) de cada fila de un CSV.
+
+    Una fila con un campo entre comillas puede ocupar varias líneas: se numera por la primera.
+    """
+    primera = next(lineas, "")
+    separador = ";" if primera.count(";") > primera.count(",") else ","
+    lector = csv.reader(chain([primera], lineas), delimiter=separador)
+    while True:
+        n = lector.line_num + 1
+        try:
+            fila = next(lector, None)
+        except csv.Error as e:
+            # Comillas sin cerrar, campo enorme...: el resto del fichero no se puede leer con fiabilidad
+            yield n, f"CSV no válido ({e}), se deja de leer aquí"
+            return
+        if fila is None:
+            return
+        if not any(c.strip() for c in fila) or fila[0].lstrip().startswith("#"):
+            continue
+        if n == 1 and fila[0].strip().lower() in ("dia", "día"):
+            continue  # cabecera
+        campos = [c.strip() for c in fila] + ["", ""]
+        try:
+            yield n, _turno(campos[0], campos[1], campos[2])
+        except ValueError as e:
+            yield n, str(e)
+
+
+def _lineas_ics(lineas: Iterable[str]) -> Iterator[tuple[int, str]]:
+    """Deshace el plegado de líneas de iCalendar (las que empiezan por espacio continúan la anterior)."""
+    actual, inicio = None, 0
+    for n, linea in enumerate(lineas, 1):
+        linea = linea.rstrip("\r\n")
+        if linea[:1] in (" ", "\t") and actual is not None:
+            actual += linea[1:]
+            continue
+        if actual is not None:
+            yield inicio, actual
+        actual, inicio = linea, n
+    if actual is not None:
+        yield inicio, actual
+
+
+def _eventos_ics(lineas: Iterable[str]) -> Iterator[tuple[int, dict]]:
+    """(línea de BEGIN, {propiedad: (parámetros, valor)}) de cada VEVENT."""
+    evento = None
+    for n, linea in _lineas_ics(lineas):
+        nombre, _, valor = linea.partition(":")
+        nombre, *parametros = nombre.split(";")
+        nombre = nombre.upper()
+        if nombre == "BEGIN" and valor.upper() == "VEVENT":
+            evento, inicio = {}, n
+        elif nombre == "END" and valor.upper() == "VEVENT" and evento is not None:
+            yield inicio, evento
+            evento = None
+        elif evento is not None:
+            evento[nombre] = ([p.upper() for p in parametros], valor.strip())
+
+
+def _fecha_ics(parametros: list[str], valor: str) -> tuple[datetime, bool]:
+    """(fecha y hora local, es de día completo) de DTSTART/DTEND."""
+    if "VALUE=DATE" in parametros or len(valor) == 8:
+        return datetime.strptime(valor[:8], "%Y%m%d"), True
+    momento = datetime.strptime(valor[:15], "%Y%m%dT%H%M%S")
+    if valor.endswith("Z"):
+        # En UTC: a la hora local del bot
+        momento = momento.replace(tzinfo=timezone.utc).astimezone().replace(tzinfo=None)
+    # Con TZID o flotante se toma la hora tal cual
+    return momento, False
+
+
+def _turnos_evento(evento: dict) -> list[dict]:
+    """Turnos de un VEVENT. Lanza ValueError con el motivo."""
+    if "DTSTART" not in evento:
+        raise ValueError("evento sin DTSTART")
+    inicio, dia_completo = _fecha_ics(*evento["DTSTART"])
+    fin = _fecha_ics(*evento["DTEND"])[0] if "DTEND" in evento else None
+    tipo = evento.get("X-TURNO-TIPO", ([], ""))[1].lower()
+
+    if dia_completo or tipo == TIPO_AUSENCIA:
+        # DTEND de un evento de día completo es el día siguiente al último
+        ultimo = fin - timedelta(days=1) if fin and fin.date() > inicio.date() else inicio
+        return [_turno(f"{inicio:%Y-%m-%d}/{ultimo:%Y-%m-%d}", "", TIPO_AUSENCIA)]
+
+    if "X-TURNO-DIA" in evento:
+        # Exportado por este bot: el día original, sin reconstruirlo desde la RRULE
+        dia = evento["X-TURNO-DIA"][1]
+        regla = regla_rotacion(dia)
+        if regla:
+            dia = f"rotación {regla[0].isoformat()} {regla[1]}"
+        return [_turno(dia, f"{inicio:%H:%M}", tipo)]
+
+    regla = dict(p.partition("=")[::2] for p in evento.get("RRULE", ([], ""))[1].upper().split(";") if p)
+    frecuencia = regla.get("FREQ")
+    intervalo = int(regla.get("INTERVAL", "1"))
+
+    def dias(desplazamiento: int) -> list[str]:
+        """Días del turno, desplazados (para una salida al día siguiente de la entrada)."""
+        fecha = inicio.date() + timedelta(days=desplazamiento)
+        if frecuencia is None:
+            return [fecha.isoformat()]
+        if frecuencia == "WEEKLY" and intervalo == 1:
+            semana = [DIAS_ICS.index(d[-2:]) for d in regla.get("BYDAY", DIAS_ICS[inicio.weekday()]).split(",")
+                      if d[-2:] in DIAS_ICS]
+            return [NOMBRES_DIA[(d + desplazamiento) % 7] for d in semana]
+        if frecuencia == "DAILY":
+            return [f"rotación {fecha.isoformat()} {'1' + '0' * (intervalo - 1)}"]
+        raise ValueError(f"repetición {frecuencia} no soportada")
+
+    turnos = [_turno(d, f"{inicio:%H:%M}", tipo or "entrada") for d in dias(0)]
+    if fin and fin != inicio and not tipo:
+        turnos += [_turno(d, f"{fin:%H:%M}", "salida") for d in dias((fin.date() - inicio.date()).days)]
+    return turnos
+
+
+def _filas_ics(lineas: Iterator[str]) -> Iterator[tuple[int, dict | str]]:
+    """(número de línea, turno o motivo del error) de cada evento de un iCalendar."""
+    for n, evento in _eventos_ics(lineas):
+        try:
+            for turno in _turnos_evento(evento):
+                yield n, turno
+        except ValueError as e:
+            yield n, str(e)
+
+
+def leer_fichero(nombre: str, contenido: io.BufferedIOBase) -> tuple[list[dict], list[str], int, int]:
+    """Lee los turnos de un .csv o .ics.
+
+    Returns:
+        (turnos válidos, primeros errores "línea N: motivo", total de errores,
+         turnos válidos que no se añaden por pasar de IMPORTAR_MAX_TURNOS)
+    """
+    texto = io.TextIOWrapper(contenido, encoding="utf-8-sig", errors="replace", newline="")
+    filas = _filas_ics(texto) if nombre.lower().endswith(".ics") else _filas_csv(texto)
+    turnos, errores, total_errores, sobrantes = [], [], 0, 0
+    for n, resultado in filas:
+        if isinstance(resultado, str):
+            total_errores += 1
+            if len(errores) < MAX_ERRORES_MOSTRADOS:
+                errores.append(f"línea {n}: {resultado}")
+        elif len(turnos) >= IMPORTAR_MAX_TURNOS:
+            # Se sigue leyendo (el tamaño ya está acotado) para decir cuántos se quedan fuera
+            sobrantes += 1
+        else:
+            turnos.append(resultado)
+    return turnos, errores, total_errores, sobrantes
+
+
+# --- Exportar ---
+
+def _plegar(linea: str) -> Iterator[str]:
+    """Parte una línea en trozos de 75 bytes como máximo (RFC 5545 §3.1)."""
+    datos = linea.encode()
+    while len(datos) > 75:
+        corte = 75
+        while datos[corte] & 0xC0 == 0x80:  # no partir un carácter UTF-8
+            corte -= 1
+        yield datos[:corte].decode() + "\r\n"
+        datos = b" " + datos[corte:]
+    yield datos.decode() + "\r\n"
+
+
+def _evento(uid: str, propiedades: list[str]) -> Iterator[str]:
+    sello = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    for linea in ["BEGIN:VEVENT", f"UID:{uid}", f"DTSTAMP:{sello}", *propiedades, "END:VEVENT"]:
+        yield from _plegar(linea)
+
+
+def exportar_ics(user_id: int, hoy: date | None = None) -> Iterator[str]:
+    """Líneas del .ics con los turnos del usuario, generadas una a una."""
+    hoy = hoy or date.today()
+    yield from _plegar("BEGIN:VCALENDAR")
+    yield from _plegar("VERSION:2.0")
+    yield from _plegar("PRODID:-//bot-telegram//calendario laboral//ES")
+    yield from _plegar("CALSCALE:GREGORIAN")
+    for i, turno in enumerate(obtener_turnos_usuario(user_id)):
+        dia, tipo = turno["dia"], turno["tipo"]
+        uid = f"{user_id}-{i}@calendario-laboral"
+        if tipo == TIPO_AUSENCIA:
+            inicio, fin = rango_ausencia(dia)
+            yield from _evento(uid, [f"DTSTART;VALUE=DATE:{inicio:%Y%m%d}",
+                                     f"DTEND;VALUE=DATE:{fin + timedelta(days=1):%Y%m%d}",
+                                     "SUMMARY:Ausencia", f"X-TURNO-TIPO:{tipo}", "TRANSP:TRANSPARENT"])
+            continue
+
+        comunes = [f"SUMMARY:{tipo.capitalize()}", f"X-TURNO-DIA:{dia}", f"X-TURNO-TIPO:{tipo}"]
+        hora = turno["hora"].replace(":", "") + "00"
+        regla = regla_rotacion(dia)
+        if dia in DIAS_SEMANA:
+            primera = next(ocurrencias(turno, hoy))
+            yield from _evento(uid, [f"DTSTART:{primera:%Y%m%d}T{hora}",
+                                     f"RRULE:FREQ=WEEKLY;BYDAY={DIAS_ICS[DIAS_SEMANA[dia]]}", *comunes])
+        elif regla:
+            # Un evento por cada día trabajado del ciclo, que se repite cada `len(patrón)` días
+            inicio, patron = regla
+            for k, c in enumerate(patron):
+                if c == "1":
+                    yield from _evento(f"{user_id}-{i}-{k}@calendario-laboral", [
+                        f"DTSTART:{inicio + timedelta(days=k):%Y%m%d}T{hora}",
+                        f"RRULE:FREQ=DAILY;INTERVAL={len(patron)}", *comunes,
+                    ])
+        else:
+            yield from _evento(uid, [f"DTSTART:{date.fromisoformat(dia):%Y%m%d}T{hora}", *comunes])
+    yield from _plegar("END:VCALENDAR")
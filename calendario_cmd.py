@@ -1,47 +1,104 @@
 """
 Módulo de interacción del calendario laboral.
 """
+import io
+import asyncio
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.error import TelegramError
+from telegram.helpers import escape_markdown
 from telegram.ext import ContextTypes
 
 from acceso import control_acceso
 from estadisticas import registrar, incrementar_contador
+from cola_envios import PRIORIDAD_RECORDATORIO
+from rutas import ruta, datos, Entero, Opcion
+from configuracion import TIEMPO_ACTIVO
 from calendario import (
     obtener_turnos_usuario, 
     agregar_turno, 
+    agregar_ausencia,
     eliminar_turno,
     eliminar_todos_turnos, 
-    obtener_turnos_proximos, 
+    obtener_turnos_ventanas,
     formatear_calendario,
+    formatear_proximos,
+    agregar_turnos,
+    compactar_calendario,
+    formatear_compactacion,
+    nombre_dia,
     validar_hora, 
     validar_dia,
+    validar_ausencia,
+    lugar_tiempo,
+    guardar_lugar_tiempo,
+    quitar_lugar_tiempo,
+    nombre_lugar,
+    TIPO_AUSENCIA,
 )
 
+DIAS_SEMANA = ("lunes", "martes", "miércoles", "jueves", "viernes", "sábado", "domingo")
+TIPOS_TURNO = ("entrada", "salida")
+# Ocurrencias que muestra /proximo sin argumento y máximo que se puede pedir
+PROXIMOS_POR_DEFECTO = 5
+MAX_PROXIMOS = 20
+# Previsión en los recordatorios: decimales a los que se redondean las coordenadas
+# (0.1° ≈ 11 km: los usuarios de una misma ciudad comparten consulta) y segundos que
+# se espera como mucho a una previsión que no se pudo adelantar
+PREVISION_DECIMALES = 1
+PREVISION_ESPERA = 2
+# Cada cuánto se eliminan del calendario los turnos de fechas ya pasadas
+INTERVALO_COMPACTACION = 24 * 3600
+
+
+def _cancelar_keyboard():
+    """Botón de cancelar que vuelve al menú del calendario."""
+    return InlineKeyboardMarkup([[InlineKeyboardButton("❌ Cancelar", callback_data=datos("mc"))]])
+
+
+def _describir(turno: dict) -> str:
+    """Texto corto de un turno o una ausencia (botones de borrar y confirmaciones)."""
+    if turno["tipo"] == TIPO_AUSENCIA:
+        return nombre_dia(turno["dia"])
+    emoji = "🟢" if turno["tipo"] == "entrada" else "🔴"
+    return f"{emoji} {nombre_dia(turno['dia'])} {turno['hora']} - {turno['tipo']}"
+
 
 def get_calendario_keyboard():
     """Devuelve el teclado del calendario."""
     keyboard = [
         [
-            InlineKeyboardButton("➕ Añadir turno", callback_data="cal_add"),
-            InlineKeyboardButton("📄 Ver turnos", callback_data="cal_ver"),
+            InlineKeyboardButton("➕ Añadir turno", callback_data=datos("ca")),
+            InlineKeyboardButton("📄 Ver turnos", callback_data=datos("cv")),
+        ],
+        [
+            InlineKeyboardButton("❌ Eliminar turno", callback_data=datos("cb")),
+            InlineKeyboardButton("🗑 Borrar todo", callback_data=datos("cx")),
         ],
         [
-            InlineKeyboardButton("❌ Eliminar turno", callback_data="cal_del"),
-            InlineKeyboardButton("🗑 Borrar todo", callback_data="cal_clear"),
+            InlineKeyboardButton("⏭ Próximos turnos", callback_data=datos("cn")),
+            InlineKeyboardButton("🏖 Vacaciones y festivos", callback_data=datos("cf")),
         ],
         [
-            InlineKeyboardButton("◀️ Volver", callback_data="btn_volver"),
-        ]
+            InlineKeyboardButton("📥 Importar", callback_data=datos("ci")),
+            InlineKeyboardButton("📤 Exportar", callback_data=datos("co")),
+        ],
     ]
+    if TIEMPO_ACTIVO:
+        keyboard.append([InlineKeyboardButton("🌤 Tiempo antes del turno", callback_data=datos("cw"))])
+    keyboard.append([InlineKeyboardButton("◀️ Volver", callback_data=datos("mv"))])
     return InlineKeyboardMarkup(keyboard)
 
 
 async def horario_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Comando /horario — gestiona tu calendario laboral."""
+    """Comando /horario — gestiona tu calendario laboral (/horario export: descarga en .ics)."""
     if not await control_acceso(update):
         return
     registrar("calendario", update)
 
+    if context.args and context.args[0].lower() in ("export", "exportar"):
+        await enviar_exportacion(update.message, update.effective_user.id)
+        return
+
     await update.message.reply_text(
         "📅 *Calendario laboral*\n\n"
         "Gestiona tus turnos de entrada y salida.\n"
@@ -51,15 +108,147 @@ async def horario_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     )
 
 
+async def enviar_exportacion(mensaje, user_id: int):
+    """Envía los turnos del usuario como fichero .ics."""
+    from calendario_archivos import exportar_ics
+    if not obtener_turnos_usuario(user_id):
+        await mensaje.reply_text("📅 No tienes turnos que exportar.", reply_markup=get_calendario_keyboard())
+        return
+    fichero = io.BytesIO()
+    for linea in exportar_ics(user_id):
+        fichero.write(linea.encode())
+    await mensaje.reply_document(
+        document=fichero.getvalue(),
+        filename="turnos.ics",
+        caption="📤 Tus turnos en formato iCalendar: ábrelo en tu calendario o envíamelo para importarlo.",
+    )
+
+
+async def importar_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Fichero .csv o .ics con turnos: se leen y se añaden todos de una vez."""
+    from calendario_archivos import leer_fichero, IMPORTAR_MAX_BYTES, IMPORTAR_MAX_TURNOS
+    if not await control_acceso(update):
+        return
+    registrar("calendario", update)
+
+    demasiado_grande = f"❌ El fichero es demasiado grande (máximo {IMPORTAR_MAX_BYTES // 1024} KB)."
+    documento = update.message.document
+    # Telegram no siempre informa del tamaño; si lo hace, ni se pide el fichero
+    # (getFile falla con los de más de 20 MB)
+    if documento.file_size and documento.file_size > IMPORTAR_MAX_BYTES:
+        await update.message.reply_text(demasiado_grande)
+        return
+    contenido = io.BytesIO()
+    try:
+        archivo = await documento.get_file()
+        if archivo.file_size and archivo.file_size > IMPORTAR_MAX_BYTES:
+            await update.message.reply_text(demasiado_grande)
+            return
+        await archivo.download_to_memory(contenido)
+    except TelegramError as e:
+        await update.message.reply_text(f"❌ No se pudo descargar el fichero: {e}")
+        return
+    # Lo que cuenta es lo descargado
+    if contenido.tell() > IMPORTAR_MAX_BYTES:
+        await update.message.reply_text(demasiado_grande)
+        return
+    contenido.seek(0)
+
+    # La lectura va en un hilo; el guardado es una sola escritura del calendario
+    turnos, errores, total_errores, sobrantes = await asyncio.to_thread(
+        leer_fichero, documento.file_name or "", contenido,
+    )
+    agregados = agregar_turnos(update.effective_user.id, turnos) if turnos else 0
+
+    # Sin Markdown: el nombre del fichero y los errores citan texto del usuario
+    lineas = [f"📥 Importación de {documento.file_name}\n",
+              f"✅ {agregados} turnos añadidos"]
+    if len(turnos) > agregados:
+        lineas.append(f"↩️ {len(turnos) - agregados} ya estaban en tu calendario")
+    if sobrantes:
+        lineas.append(f"✂️ {sobrantes} más no se han añadido: máximo {IMPORTAR_MAX_TURNOS} por fichero")
+    if total_errores:
+        lineas.append(f"⚠️ {total_errores} con errores:")
+        lineas += [f"  • {e}" for e in errores]
+    await update.message.reply_text(
+        "\n".join(lineas),
+        reply_markup=get_calendario_keyboard(),
+    )
+
+
+async def proximo_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Comando /proximo [n] — tus próximos n turnos."""
+    if not await control_acceso(update):
+        return
+    registrar("calendario", update)
+
+    try:
+        n = int(context.args[0]) if context.args else PROXIMOS_POR_DEFECTO
+    except ValueError:
+        n = PROXIMOS_POR_DEFECTO
+    n = max(1, min(n, MAX_PROXIMOS))
+    await update.message.reply_text(
+        formatear_proximos(update.effective_user.id, n),
+        parse_mode="Markdown",
+        reply_markup=get_calendario_keyboard(),
+    )
+
+
+# Previsiones pedidas por adelantado para el siguiente minuto: lugar redondeado → tarea
+_previsiones: dict[tuple[float, float], asyncio.Task] = {}
+
+
+def _clave_lugar(turno: dict) -> tuple[float, float] | None:
+    """Lugar redondeado del tiempo de un recordatorio (None si el usuario no lo activó)."""
+    lugar = turno["tiempo"]
+    if lugar is None:
+        return None
+    return round(lugar["lat"], PREVISION_DECIMALES), round(lugar["lon"], PREVISION_DECIMALES)
+
+
+async def _prevision(lat: float, lon: float) -> dict | None:
+    from tiempo import obtener_tiempo
+    try:
+        return await obtener_tiempo(lat, lon)
+    except Exception as e:
+        print(f"⚠️ Error obteniendo la previsión para los recordatorios ({lat}, {lon}): {e}")
+        return None
+
+
+async def _previsiones_recordatorios(actuales: list[dict], siguientes: list[dict]) -> dict[tuple, dict | None]:
+    """Previsiones de los recordatorios de ahora, una consulta por lugar.
+
+    Deja pedidas las de los recordatorios del minuto siguiente, para que al
+    enviarlos ya estén y la latencia de Open-Meteo no retrase el aviso.
+    """
+    global _previsiones
+    ahora = {c for c in map(_clave_lugar, actuales) if c}
+    despues = {c for c in map(_clave_lugar, siguientes) if c}
+    bucle = asyncio.get_running_loop()
+    tareas = {c: _previsiones.get(c) or bucle.create_task(_prevision(*c)) for c in ahora | despues}
+    _previsiones = {c: t for c, t in tareas.items() if c in despues}
+
+    # Solo esperan (y poco) las que no se pudieron adelantar
+    pendientes = [tareas[c] for c in ahora if not tareas[c].done()]
+    if pendientes:
+        await asyncio.wait(pendientes, timeout=PREVISION_ESPERA)
+    return {c: tareas[c].result() if tareas[c].done() else None for c in ahora}
+
+
 async def comprobar_notificaciones(context: ContextTypes.DEFAULT_TYPE):
     """Job que se ejecuta cada minuto para enviar notificaciones."""
-    turnos = obtener_turnos_proximos(minutos_antes=10)
+    # Los del minuto siguiente salen del mismo recorrido del calendario, para adelantar su previsión
+    turnos, siguientes = obtener_turnos_ventanas(10, 11)
+    previsiones = {}
+    if TIEMPO_ACTIVO:
+        from tiempo import formatear_tiempo_breve
+        previsiones = await _previsiones_recordatorios(turnos, siguientes)
 
     for turno in turnos:
         user_id = turno["user_id"]
         tipo = turno["tipo"]
         hora = turno["hora"]
-        dia = turno["dia"].capitalize()
+        dia = nombre_dia(turno["fecha"])
 
         if tipo == "entrada":
             emoji = "🟢"
@@ -78,17 +267,30 @@ async def comprobar_notificaciones(context: ContextTypes.DEFAULT_TYPE):
                 f"⏰ ¡Faltan 10 minutos! Ve terminando."
             )
 
+        prevision = previsiones.get(_clave_lugar(turno))
+        if prevision:
+            # El nombre viene del geocodificador y puede llevar _ o *
+            msg += "\n\n" + formatear_tiempo_breve(prevision, escape_markdown(nombre_lugar(turno["tiempo"])))
+
         try:
             await context.bot.send_message(
                 chat_id=user_id,
                 text=msg,
                 parse_mode="Markdown",
+                rate_limit_args=PRIORIDAD_RECORDATORIO,
             )
             incrementar_contador("notificaciones_enviadas")
         except Exception as e:
             print(f"⚠️ Error enviando notificación a {user_id}: {e}")
 
 
+async def compactar_calendario_job(context: ContextTypes.DEFAULT_TYPE):
+    """Job diario que elimina los turnos caducados, en un hilo para no frenar el bucle."""
+    resultado = await asyncio.to_thread(compactar_calendario)
+    if resultado is None or resultado["turnos"]:
+        print(formatear_compactacion(resultado))
+
+
 # Funciones auxiliares para manejo de callbacks del calendario
 
 async def calendario_ver_callback(query, get_calendario_keyboard_func):
@@ -104,14 +306,16 @@ async def calendario_ver_callback(query, get_calendario_keyboard_func):
 async def calendario_add_callback(query):
     """Inicia el proceso de añadir un turno."""
     dias_btns = [
-        [InlineKeyboardButton(d.capitalize(), callback_data=f"caldia_{d}")]
-        for d in ["lunes", "martes", "miércoles", "jueves", "viernes", "sábado", "domingo"]
+        [InlineKeyboardButton(d.capitalize(), callback_data=datos("cd", d))]
+        for d in DIAS_SEMANA
     ]
-    dias_btns.append([InlineKeyboardButton("❌ Cancelar", callback_data="btn_calendario")])
+    dias_btns.append([InlineKeyboardButton("❌ Cancelar", callback_data=datos("mc"))])
     await query.edit_message_text(
         "➕ *Añadir turno*\n\n"
         "Selecciona el día de la semana:\n\n"
-        "_También puedes escribir una fecha específica (ej: 20/03/2026)_",
+        "_También puedes escribir una fecha específica (ej: 20/03/2026) "
+        "o una rotación: fecha de inicio y días seguidos de trabajo y de descanso "
+        "(ej: rotación 05/01/2026 4x4)_",
         parse_mode="Markdown",
         reply_markup=InlineKeyboardMarkup(dias_btns),
     )
@@ -128,12 +332,10 @@ async def calendario_del_callback(query, get_calendario_keyboard_func):
     else:
         btns = []
         for i, t in enumerate(turnos):
-            emoji = "🟢" if t["tipo"] == "entrada" else "🔴"
-            label = f"{emoji} {t['dia'].capitalize()} {t['hora']} - {t['tipo']}"
-            btns.append([InlineKeyboardButton(label, callback_data=f"caldel_{i}")])
-        btns.append([InlineKeyboardButton("◀️ Volver", callback_data="btn_calendario")])
+            btns.append([InlineKeyboardButton(_describir(t), callback_data=datos("ce", i))])
+        btns.append([InlineKeyboardButton("◀️ Volver", callback_data=datos("mc"))])
         await query.edit_message_text(
-            "❌ *Eliminar turno*\n\nSelecciona el turno a eliminar:",
+            "❌ *Eliminar turno*\n\nSelecciona el turno o la ausencia a eliminar:",
             parse_mode="Markdown",
             reply_markup=InlineKeyboardMarkup(btns),
         )
@@ -145,8 +347,8 @@ async def calendario_clear_callback(query):
         "⚠️ ¿Estás seguro de que quieres borrar TODOS tus turnos?",
         reply_markup=InlineKeyboardMarkup([
             [
-                InlineKeyboardButton("✅ Sí, borrar todo", callback_data="cal_clear_si"),
-                InlineKeyboardButton("❌ No", callback_data="btn_calendario"),
+                InlineKeyboardButton("✅ Sí, borrar todo", callback_data=datos("cy")),
+                InlineKeyboardButton("❌ No", callback_data=datos("mc")),
             ]
         ]),
     )
@@ -161,6 +363,19 @@ async def calendario_clear_si_callback(query, get_calendario_keyboard_func):
     )
 
 
+async def calendario_ausencia_callback(query):
+    """Pide el día o el intervalo de una ausencia."""
+    await query.edit_message_text(
+        "🏖 *Vacaciones y festivos*\n\n"
+        "Escribe un día o un intervalo en el que no quieras recordatorios:\n"
+        "Ejemplo: 24/12/2026 o 01/08/2026 - 16/08/2026\n\n"
+        "_Se saltan los turnos semanales y las rotaciones; "
+        "los turnos de fecha concreta se avisan igualmente._",
+        parse_mode="Markdown",
+        reply_markup=_cancelar_keyboard(),
+    )
+
+
 async def calendario_dia_callback(query, dia, context):
     """Procesa la selección de día."""
     context.user_data["cal_dia"] = dia
@@ -170,7 +385,7 @@ async def calendario_dia_callback(query, dia, context):
         "⏰ Escribe la hora (formato HH:MM):\n"
         "Ejemplo: 08:00, 14:30, 17:00",
         parse_mode="Markdown",
-        reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("❌ Cancelar", callback_data="btn_calendario")]]),
+        reply_markup=_cancelar_keyboard(),
     )
 
 
@@ -185,7 +400,7 @@ async def calendario_tipo_callback(query, tipo, context, get_calendario_keyboard
         emoji = "🟢" if tipo == "entrada" else "🔴"
         await query.edit_message_text(
             f"✅ Turno añadido:\n\n"
-            f"📆 Día: {dia.capitalize()}\n"
+            f"📆 Día: {nombre_dia(dia)}\n"
             f"⏰ Hora: {hora}\n"
             f"{emoji} Tipo: {tipo.capitalize()}\n\n"
             f"_Recibirás notificación a las {hora} (10 min antes)_",
@@ -204,7 +419,7 @@ async def calendario_del_idx_callback(query, idx, get_calendario_keyboard_func):
     turno = eliminar_turno(query.from_user.id, idx)
     if turno:
         await query.edit_message_text(
-            f"✅ Turno eliminado: {turno['dia'].capitalize()} {turno['hora']} ({turno['tipo']})",
+            f"✅ Eliminado: {_describir(turno)}",
             reply_markup=get_calendario_keyboard_func(),
         )
     else:
@@ -214,13 +429,116 @@ async def calendario_del_idx_callback(query, idx, get_calendario_keyboard_func):
         )
 
 
+# Rutas de los botones del calendario
+
+@ruta("cv", nombre="cal_ver")
+async def _ruta_ver(update, context):
+    await calendario_ver_callback(update.callback_query, get_calendario_keyboard)
+
+
+@ruta("cn", nombre="cal_proximo")
+async def _ruta_proximo(update, context):
+    await update.callback_query.edit_message_text(
+        formatear_proximos(update.callback_query.from_user.id, PROXIMOS_POR_DEFECTO),
+        parse_mode="Markdown",
+        reply_markup=get_calendario_keyboard(),
+    )
+
+
+@ruta("ca", nombre="cal_add")
+async def _ruta_add(update, context):
+    context.user_data["cal_paso"] = "dia"
+    await calendario_add_callback(update.callback_query)
+
+
+@ruta("cd", Opcion(DIAS_SEMANA), nombre="cal_dia")
+async def _ruta_dia(update, context, dia):
+    await calendario_dia_callback(update.callback_query, dia, context)
+
+
+@ruta("ct", Opcion(TIPOS_TURNO), nombre="cal_tipo")
+async def _ruta_tipo(update, context, tipo):
+    await calendario_tipo_callback(update.callback_query, tipo, context, get_calendario_keyboard)
+
+
+@ruta("cf", nombre="cal_ausencia")
+async def _ruta_ausencia(update, context):
+    context.user_data["cal_paso"] = "ausencia"
+    await calendario_ausencia_callback(update.callback_query)
+
+
+@ruta("ci", nombre="cal_importar")
+async def _ruta_importar(update, context):
+    await update.callback_query.edit_message_text(
+        "📥 *Importar turnos*\n\n"
+        "Envíame un fichero *.csv* con una fila por turno (día;hora;tipo):\n"
+        "`lunes;08:00;entrada`\n"
+        "`20/03/2026;07:30;salida`\n"
+        "`rotación 05/01/2026 4x4;19:00;entrada`\n"
+        "`24/12/2026 - 06/01/2027;;ausencia`\n\n"
+        "o un *.ics* exportado de tu calendario.",
+        parse_mode="Markdown",
+        reply_markup=_cancelar_keyboard(),
+    )
+
+
+@ruta("co", nombre="cal_exportar")
+async def _ruta_exportar(update, context):
+    await enviar_exportacion(update.callback_query.message, update.callback_query.from_user.id)
+
+
+@ruta("cw", nombre="cal_tiempo")
+async def _ruta_tiempo(update, context):
+    context.user_data["cal_paso"] = "tiempo"
+    actual = lugar_tiempo(update.callback_query.from_user.id)
+    btns = [[InlineKeyboardButton("🔕 Desactivar", callback_data=datos("cz"))]] if actual else []
+    btns.append([InlineKeyboardButton("❌ Cancelar", callback_data=datos("mc"))])
+    await update.callback_query.edit_message_text(
+        "🌤 *Tiempo antes del turno*\n\n"
+        "Escribe tu ciudad y cada recordatorio incluirá la previsión de las próximas horas."
+        + (f"\n\n_Ahora:_ {escape_markdown(actual['lugar'])}" if actual else ""),
+        parse_mode="Markdown",
+        reply_markup=InlineKeyboardMarkup(btns),
+    )
+
+
+@ruta("cz", nombre="cal_tiempo_quitar")
+async def _ruta_tiempo_quitar(update, context):
+    context.user_data["cal_paso"] = None
+    quitar_lugar_tiempo(update.callback_query.from_user.id)
+    await update.callback_query.edit_message_text(
+        "🔕 Los recordatorios ya no incluirán el tiempo.",
+        reply_markup=get_calendario_keyboard(),
+    )
+
+
+@ruta("cb", nombre="cal_del")
+async def _ruta_del(update, context):
+    await calendario_del_callback(update.callback_query, get_calendario_keyboard)
+
+
+@ruta("ce", Entero(), nombre="cal_del_idx")
+async def _ruta_del_idx(update, context, idx):
+    await calendario_del_idx_callback(update.callback_query, idx, get_calendario_keyboard)
+
+
+@ruta("cx", nombre="cal_clear")
+async def _ruta_clear(update, context):
+    await calendario_clear_callback(update.callback_query)
+
+
+@ruta("cy", nombre="cal_clear_si")
+async def _ruta_clear_si(update, context):
+    await calendario_clear_si_callback(update.callback_query, get_calendario_keyboard)
+
+
 async def procesar_hora_texto(update, context, text):
     """Procesa la hora ingresada como texto."""
     hora = validar_hora(text.strip())
     if not hora:
         await update.message.reply_text(
             "❌ Formato inválido. Escribe la hora como HH:MM (ej: 08:00, 14:30)",
-            reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("❌ Cancelar", callback_data="btn_calendario")]]),
+            reply_markup=_cancelar_keyboard(),
         )
         return False
 
@@ -228,15 +546,15 @@ async def procesar_hora_texto(update, context, text):
     context.user_data["cal_paso"] = "tipo"
     dia = context.user_data.get("cal_dia", "")
     await update.message.reply_text(
-        f"➕ Día: *{dia.capitalize()}* | Hora: *{hora}*\n\n"
+        f"➕ Día: *{nombre_dia(dia)}* | Hora: *{hora}*\n\n"
         "¿Es una *entrada* o una *salida*?",
         parse_mode="Markdown",
         reply_markup=InlineKeyboardMarkup([
             [
-                InlineKeyboardButton("🟢 Entrada", callback_data="caltipo_entrada"),
-                InlineKeyboardButton("🔴 Salida", callback_data="caltipo_salida"),
+                InlineKeyboardButton("🟢 Entrada", callback_data=datos("ct", "entrada")),
+                InlineKeyboardButton("🔴 Salida", callback_data=datos("ct", "salida")),
             ],
-            [InlineKeyboardButton("❌ Cancelar", callback_data="btn_calendario")],
+            [InlineKeyboardButton("❌ Cancelar", callback_data=datos("mc"))],
         ]),
     )
     return True
@@ -247,16 +565,68 @@ async def procesar_dia_texto(update, context, text):
     dia = validar_dia(text.strip())
     if not dia:
         await update.message.reply_text(
-            "❌ Día no válido. Usa un día de la semana o una fecha (DD/MM/YYYY)",
+            "❌ Día no válido. Usa un día de la semana, una fecha (DD/MM/YYYY) "
+            "o una rotación (rotación DD/MM/YYYY 4x4)",
         )
         return False
 
     context.user_data["cal_dia"] = dia
     context.user_data["cal_paso"] = "hora"
     await update.message.reply_text(
-        f"➕ Día: *{dia.capitalize()}*\n\n"
+        f"➕ Día: *{nombre_dia(dia)}*\n\n"
         "⏰ Escribe la hora (formato HH:MM):",
         parse_mode="Markdown",
-        reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("❌ Cancelar", callback_data="btn_calendario")]]),
+        reply_markup=_cancelar_keyboard(),
+    )
+    return True
+
+
+async def procesar_ausencia_texto(update, context, text):
+    """Procesa el día o intervalo de una ausencia ingresado como texto."""
+    ausencia = validar_ausencia(text)
+    if not ausencia:
+        await update.message.reply_text(
+            "❌ Fecha no válida. Escribe un día (DD/MM/YYYY) o un intervalo "
+            "(DD/MM/YYYY - DD/MM/YYYY) de como mucho un año",
+            reply_markup=_cancelar_keyboard(),
+        )
+        return False
+
+    context.user_data["cal_paso"] = None
+    if agregar_ausencia(update.effective_user.id, ausencia):
+        texto = (f"✅ Ausencia añadida: {nombre_dia(ausencia)}\n\n"
+                 "_Esos días no recibirás avisos de tus turnos semanales ni rotaciones_")
+    else:
+        texto = "⚠️ Esa ausencia ya está en tu calendario."
+    await update.message.reply_text(
+        texto,
+        parse_mode="Markdown",
+        reply_markup=get_calendario_keyboard(),
+    )
+    return True
+
+
+async def procesar_tiempo_texto(update, context, text):
+    """Procesa la ciudad del tiempo en los recordatorios."""
+    from tiempo import geocodificar
+    try:
+        resultado = await geocodificar(text.strip())
+    except Exception as e:
+        await update.message.reply_text(f"❌ Error buscando la ciudad: {e}", reply_markup=_cancelar_keyboard())
+        return False
+    if not resultado:
+        await update.message.reply_text(
+            f"❌ No encontré la ciudad '{text.strip()}'. Prueba con otro nombre.",
+            reply_markup=_cancelar_keyboard(),
+        )
+        return False
+
+    lat, lon, nombre = resultado
+    context.user_data["cal_paso"] = None
+    guardar_lugar_tiempo(update.effective_user.id, lat, lon, nombre)
+    await update.message.reply_text(
+        f"✅ Tus recordatorios incluirán el tiempo en {escape_markdown(nombre)}.",
+        parse_mode="Markdown",
+        reply_markup=get_calendario_keyboard(),
     )
     return True
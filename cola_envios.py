@@ -0,0 +1,249 @@
+"""
+Módulo de cola global de envíos a Telegram.
+Todas las llamadas del bot que escriben en un chat (sendMessage, editMessageText,
+sendDocument...) pasan por un planificador con prioridad que respeta un límite
+global y otro por chat, y que reintenta tras los RetryAfter de Telegram.
+Se engancha a la aplicación como rate limiter de python-telegram-bot, así que
+los handlers siguen usando reply_text/edit_message_text sin cambios.
+"""
+import os
+import time
+import heapq
+import asyncio
+import itertools
+from collections import deque
+from telegram.error import RetryAfter
+from telegram.ext import BaseRateLimiter
+
+# Límites de Telegram: ~30 mensajes/s en total, ~1/s por chat privado y 20/min por grupo
+ENVIOS_POR_SEGUNDO = float(os.getenv("ENVIOS_POR_SEGUNDO", "25"))
+ENVIOS_POR_SEGUNDO_CHAT = float(os.getenv("ENVIOS_POR_SEGUNDO_CHAT", "1"))
+ENVIOS_POR_MINUTO_GRUPO = float(os.getenv("ENVIOS_POR_MINUTO_GRUPO", "20"))
+# Mensajes seguidos que se permiten a un mismo chat antes de espaciarlos
+ENVIOS_RAFAGA_CHAT = 3
+ENVIOS_MAX_REINTENTOS = 3
+
+# Prioridades (menor = antes)
+PRIORIDAD_INTERACTIVA = 0
+PRIORIDAD_RECORDATORIO = 1
+PRIORIDAD_DIFUSION = 2
+NOMBRES_PRIORIDAD = {PRIORIDAD_INTERACTIVA: "interactivas", PRIORIDAD_RECORDATORIO: "recordatorios",
+                     PRIORIDAD_DIFUSION: "difusión"}
+
+# Esperas recientes que se guardan para las métricas
+MUESTRAS_ESPERA = 1000
+
+
+class _Cubo:
+    """Token bucket: `capacidad` envíos seguidos y `ritmo` envíos/s sostenidos."""
+
+    __slots__ = ("ritmo", "capacidad", "fichas", "t")
+
+    def __init__(self, ritmo: float, capacidad: float):
+        self.ritmo = ritmo
+        self.capacidad = capacidad
+        self.fichas = capacidad
+        self.t = time.monotonic()
+
+    def _rellenar(self, ahora: float):
+        self.fichas = min(self.capacidad, self.fichas + (ahora - self.t) * self.ritmo)
+        self.t = ahora
+
+    def listo_en(self, ahora: float) -> float:
+        """Instante a partir del cual hay una ficha disponible."""
+        self._rellenar(ahora)
+        return ahora if self.fichas >= 1 else ahora + (1 - self.fichas) / self.ritmo
+
+    def consumir(self, ahora: float):
+        self._rellenar(ahora)
+        self.fichas -= 1
+
+    def lleno(self, ahora: float) -> bool:
+        self._rellenar(ahora)
+        return self.fichas >= self.capacidad
+
+
+class LimitadorEnvios(BaseRateLimiter):
+    """Planificador de envíos: límite global y por chat, prioridades y reintento tras RetryAfter.
+
+    La prioridad se indica con `rate_limit_args` en la llamada, por ejemplo
+    `bot.send_message(..., rate_limit_args=PRIORIDAD_RECORDATORIO)`; por defecto es interactiva.
+    Dentro de un mismo chat los envíos salen en orden de llegada.
+    """
+
+    def __init__(self):
+        self._global = _Cubo(ENVIOS_POR_SEGUNDO, max(1.0, ENVIOS_POR_SEGUNDO))
+        self._cubos: dict[int, _Cubo] = {}
+        # chat_id → instante hasta el que Telegram pidió esperar (RetryAfter)
+        self._bloqueos: dict[int, float] = {}
+        # chat_id → envíos pendientes (prioridad, secuencia, futuro, instante de llegada)
+        self._colas: dict[int, deque] = {}
+        # Chats cuyo primer envío puede salir ya: (prioridad, secuencia, chat_id)
+        self._listos: list = []
+        # Chats con envíos que esperan a su límite por chat: (instante, chat_id)
+        self._en_espera: list = []
+        self._secuencia = itertools.count()
+        self._aviso: asyncio.Event | None = None
+        self._trabajador: asyncio.Task | None = None
+
+        self.pendientes = {p: 0 for p in NOMBRES_PRIORIDAD}
+        self.esperas: deque[float] = deque(maxlen=MUESTRAS_ESPERA)
+        self.enviados = 0
+        self.reintentos = 0
+        self.pico_cola = 0
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        if self._trabajador:
+            self._trabajador.cancel()
+            self._trabajador = None
+
+    # --- Planificación ---
+
+    def _cubo(self, chat_id: int) -> _Cubo:
+        cubo = self._cubos.get(chat_id)
+        if cubo is None:
+            if len(self._cubos) > 10000:
+                # Los cubos llenos equivalen a no tener cubo
+                ahora = time.monotonic()
+                self._cubos = {c: b for c, b in self._cubos.items() if not b.lleno(ahora)}
+            # Los ids negativos son grupos y canales
+            ritmo = ENVIOS_POR_MINUTO_GRUPO / 60 if chat_id < 0 else ENVIOS_POR_SEGUNDO_CHAT
+            cubo = self._cubos[chat_id] = _Cubo(ritmo, ENVIOS_RAFAGA_CHAT)
+        return cubo
+
+    def _listo_en(self, chat_id: int, ahora: float) -> float:
+        return max(self._cubo(chat_id).listo_en(ahora), self._bloqueos.get(chat_id, 0.0))
+
+    def _programar(self, chat_id: int, ahora: float):
+        """Coloca el chat en `_listos` o `_en_espera` según su límite."""
+        prioridad, secuencia, _, _ = self._colas[chat_id][0]
+        listo = self._listo_en(chat_id, ahora)
+        if listo <= ahora:
+            heapq.heappush(self._listos, (prioridad, secuencia, chat_id))
+        else:
+            heapq.heappush(self._en_espera, (listo, chat_id))
+
+    async def _despachar(self):
+        """Concede turnos de envío: primero la prioridad más alta entre los chats que pueden enviar."""
+        while True:
+            ahora = time.monotonic()
+            while self._en_espera and self._en_espera[0][0] <= ahora:
+                _, chat_id = heapq.heappop(self._en_espera)
+                self._programar(chat_id, ahora)
+
+            if not self._listos:
+                self._aviso.clear()
+                timeout = self._en_espera[0][0] - ahora if self._en_espera else None
+                try:
+                    await asyncio.wait_for(self._aviso.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            espera = self._global.listo_en(ahora) - ahora
+            if espera > 0:
+                await asyncio.sleep(espera)
+                continue
+
+            _, _, chat_id = heapq.heappop(self._listos)
+            # Un RetryAfter pudo bloquear el chat después de marcarlo como listo
+            if self._listo_en(chat_id, ahora) > ahora:
+                self._programar(chat_id, ahora)
+                continue
+
+            cola = self._colas[chat_id]
+            prioridad, _, futuro, llegada = cola.popleft()
+            self.pendientes[prioridad] -= 1
+            if not futuro.done():
+                self._global.consumir(ahora)
+                self._cubo(chat_id).consumir(ahora)
+                self.esperas.append(ahora - llegada)
+                futuro.set_result(None)
+
+            if cola:
+                self._programar(chat_id, ahora)
+            else:
+                del self._colas[chat_id]
+
+    async def _turno(self, chat_id: int, prioridad: int):
+        """Espera hasta que el planificador permita enviar a este chat."""
+        if self._trabajador is None or self._trabajador.done():
+            self._aviso = asyncio.Event()
+            self._trabajador = asyncio.create_task(self._despachar())
+
+        ahora = time.monotonic()
+        futuro = asyncio.get_running_loop().create_future()
+        cola = self._colas.get(chat_id)
+        nueva = cola is None
+        if nueva:
+            cola = self._colas[chat_id] = deque()
+        cola.append((prioridad, next(self._secuencia), futuro, ahora))
+        self.pendientes[prioridad] += 1
+        self.pico_cola = max(self.pico_cola, self.en_cola)
+        if nueva:
+            self._programar(chat_id, ahora)
+            self._aviso.set()
+        await futuro
+
+    async def process_request(self, callback, args, kwargs, endpoint, data, rate_limit_args):
+        chat_id = data.get("chat_id")
+        # Las llamadas que no escriben en un chat (answerCallbackQuery, answerInlineQuery,
+        # getMe...) no cuentan para los límites de mensajes y deben responder al momento
+        if chat_id is None:
+            return await callback(*args, **kwargs)
+        try:
+            chat_id = int(chat_id)
+        except (TypeError, ValueError):
+            # @usuario de un canal: se agrupa en un único cubo de grupo
+            chat_id = -1
+
+        prioridad = rate_limit_args if rate_limit_args in NOMBRES_PRIORIDAD else PRIORIDAD_INTERACTIVA
+        for intento in range(ENVIOS_MAX_REINTENTOS + 1):
+            await self._turno(chat_id, prioridad)
+            try:
+                resultado = await callback(*args, **kwargs)
+                self.enviados += 1
+                return resultado
+            except RetryAfter as e:
+                if intento == ENVIOS_MAX_REINTENTOS:
+                    raise
+                segundos = e.retry_after.total_seconds() if hasattr(e.retry_after, "total_seconds") else e.retry_after
+                self.reintentos += 1
+                self._bloqueos[chat_id] = time.monotonic() + segundos
+                print(f"⚠️ Telegram pidió esperar {segundos:.0f}s en el chat {chat_id} ({endpoint}), reintentando")
+
+    # --- Métricas ---
+
+    @property
+    def en_cola(self) -> int:
+        """Envíos esperando turno."""
+        return sum(self.pendientes.values())
+
+
+def formatear_estado_envios(limitador: LimitadorEnvios | None) -> str:
+    """Resumen de la cola de envíos para /admin envios."""
+    if not isinstance(limitador, LimitadorEnvios):
+        return "📤 La cola de envíos no está activa."
+
+    esperas = sorted(limitador.esperas)
+    if esperas:
+        media = sum(esperas) / len(esperas)
+        p95 = esperas[min(len(esperas) - 1, int(len(esperas) * 0.95))]
+        linea_esperas = f"⏱ Espera: media {media * 1000:.0f} ms, p95 {p95 * 1000:.0f} ms, máx {esperas[-1] * 1000:.0f} ms"
+    else:
+        linea_esperas = "⏱ Espera: sin datos"
+
+    por_prioridad = ", ".join(f"{NOMBRES_PRIORIDAD[p]} {n}" for p, n in limitador.pendientes.items())
+    return (
+        f"📤 *Cola de envíos*\n\n"
+        f"📥 En cola: {limitador.en_cola} ({por_prioridad})\n"
+        f"📈 Pico de cola: {limitador.pico_cola}\n"
+        f"{linea_esperas}\n"
+        f"✉️ Enviados: {limitador.enviados}\n"
+        f"🔁 Reintentos por RetryAfter: {limitador.reintentos}\n"
+        f"⚙️ Límites: {ENVIOS_POR_SEGUNDO:g}/s global, {ENVIOS_POR_SEGUNDO_CHAT:g}/s por chat, "
+        f"{ENVIOS_POR_MINUTO_GRUPO:g}/min por grupo"
+    )
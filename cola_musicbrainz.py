@@ -0,0 +1,97 @@
+"""
+Módulo de cola global de peticiones a MusicBrainz.
+Todas las llamadas pasan por una única cola con prioridad que las espacia
+al ritmo permitido por MusicBrainz (~1 petición/segundo) y respeta Retry-After.
+"""
+import os
+import asyncio
+import itertools
+import httpx
+
+MUSICBRAINZ_BASE = os.getenv("MUSICBRAINZ_BASE", "https://musicbrainz.org/ws/2")
+HEADERS_MB = {"User-Agent": "TelegramMusicBot/1.0 (bot_telegram)", "Accept": "application/json"}
+
+MB_PETICIONES_POR_SEGUNDO = float(os.getenv("MB_PETICIONES_POR_SEGUNDO", "1"))
+MB_MAX_REINTENTOS = 3
+# Si la espera estimada supera estos segundos se avisa al usuario de su posición
+MB_AVISO_ESPERA_SEGUNDOS = 3
+
+# Prioridades (menor = antes)
+PRIORIDAD_INTERACTIVA = 0
+PRIORIDAD_FONDO = 1
+
+_cola: asyncio.PriorityQueue | None = None
+_trabajador: asyncio.Task | None = None
+_pendientes = {PRIORIDAD_INTERACTIVA: 0, PRIORIDAD_FONDO: 0}
+_secuencia = itertools.count()
+
+
+def _retry_after(resp: httpx.Response) -> float:
+    """Segundos a esperar según la cabecera Retry-After (por defecto 5)."""
+    try:
+        return max(float(resp.headers.get("Retry-After", "5")), 1 / MB_PETICIONES_POR_SEGUNDO)
+    except ValueError:
+        return 5.0
+
+
+async def _procesar_cola():
+    """Consume la cola respetando el ritmo de MusicBrainz."""
+    loop = asyncio.get_running_loop()
+    proximo = 0.0
+    async with httpx.AsyncClient(headers=HEADERS_MB, timeout=15) as cliente:
+        while True:
+            prioridad, _, futuro, ruta, params = await _cola.get()
+            _pendientes[prioridad] -= 1
+            if futuro.cancelled():
+                continue
+
+            for intento in range(MB_MAX_REINTENTOS + 1):
+                espera = proximo - loop.time()
+                if espera > 0:
+                    await asyncio.sleep(espera)
+                proximo = loop.time() + 1 / MB_PETICIONES_POR_SEGUNDO
+
+                try:
+                    resp = await cliente.get(f"{MUSICBRAINZ_BASE}/{ruta}", params=params)
+                    if resp.status_code in (429, 503) and intento < MB_MAX_REINTENTOS:
+                        proximo = loop.time() + _retry_after(resp)
+                        print(f"⚠️ MusicBrainz respondió {resp.status_code}, reintentando en {proximo - loop.time():.0f}s")
+                        continue
+                    resp.raise_for_status()
+                    if not futuro.done():
+                        futuro.set_result(resp.json())
+                except Exception as e:
+                    if not futuro.done():
+                        futuro.set_exception(e)
+                break
+
+
+def posicion_en_cola(prioridad: int = PRIORIDAD_INTERACTIVA) -> int:
+    """Número de peticiones que se atenderían antes de una nueva con esta prioridad."""
+    return sum(n for p, n in _pendientes.items() if p <= prioridad)
+
+
+async def peticion_mb(ruta: str, params: dict, prioridad: int = PRIORIDAD_INTERACTIVA, aviso=None) -> dict:
+    """Encola una petición GET a MusicBrainz y espera su JSON.
+
+    Args:
+        ruta: Ruta relativa a la API (ej: "artist/")
+        params: Parámetros de la consulta
+        prioridad: PRIORIDAD_INTERACTIVA o PRIORIDAD_FONDO
+        aviso: Corrutina opcional aviso(posicion, segundos) si la espera es larga
+    """
+    global _cola, _trabajador
+    if _trabajador is None or _trabajador.done():
+        _cola = asyncio.PriorityQueue()
+        _pendientes.update({p: 0 for p in _pendientes})
+        _trabajador = asyncio.create_task(_procesar_cola())
+
+    posicion = posicion_en_cola(prioridad)
+    espera = posicion / MB_PETICIONES_POR_SEGUNDO
+    if aviso and espera >= MB_AVISO_ESPERA_SEGUNDOS:
+        await aviso(posicion, espera)
+
+    futuro = asyncio.get_running_loop().create_future()
+    _pendientes[prioridad] += 1
+    _cola.put_nowait((prioridad, next(_secuencia), futuro, ruta, params))
+    return await futuro
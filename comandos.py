@@ -6,39 +6,28 @@ from telegram.ext import ContextTypes
 
 from acceso import control_acceso, obtener_usuarios_baneados
 from estadisticas import registrar, formatear_estadisticas
+from rutas import ruta, datos
+from configuracion import BANDAS_ACTIVO, TIEMPO_ACTIVO, CALENDARIO_ACTIVO
 
 
 def get_main_keyboard():
-    """Devuelve el teclado inline con los botones principales."""
-    keyboard = [
-        [
-            InlineKeyboardButton("🎸 Buscar banda", callback_data="btn_banda"),
-            InlineKeyboardButton("🌤 Tiempo", callback_data="btn_tiempo"),
-        ],
-        [
-            InlineKeyboardButton("📅 Calendario", callback_data="btn_calendario"),
-            InlineKeyboardButton("📊 Estadísticas", callback_data="btn_stats"),
-        ]
+    """Devuelve el teclado inline con los botones principales (solo de las funciones activas)."""
+    botones = [
+        InlineKeyboardButton(texto, callback_data=datos(prefijo))
+        for texto, prefijo, activo in (
+            ("🎸 Buscar banda", "mb", BANDAS_ACTIVO),
+            ("🌤 Tiempo", "mt", TIEMPO_ACTIVO),
+            ("📅 Calendario", "mc", CALENDARIO_ACTIVO),
+            ("📊 Estadísticas", "ms", True),
+        )
+        if activo
     ]
-    return InlineKeyboardMarkup(keyboard)
-
-
-def get_calendario_keyboard():
-    """Devuelve el teclado del calendario."""
-    keyboard = [
-        [
-            InlineKeyboardButton("➕ Añadir turno", callback_data="cal_add"),
-            InlineKeyboardButton("📄 Ver turnos", callback_data="cal_ver"),
-        ],
-        [
-            InlineKeyboardButton("❌ Eliminar turno", callback_data="cal_del"),
-            InlineKeyboardButton("🗑 Borrar todo", callback_data="cal_clear"),
-        ],
-        [
-            InlineKeyboardButton("◀️ Volver", callback_data="btn_volver"),
-        ]
-    ]
-    return InlineKeyboardMarkup(keyboard)
+    return InlineKeyboardMarkup([botones[i:i + 2] for i in range(0, len(botones), 2)])
+
+
+def get_cancelar_keyboard():
+    """Teclado con un único botón de cancelar (flujos de texto del menú)."""
+    return InlineKeyboardMarkup([[InlineKeyboardButton("❌ Cancelar", callback_data=datos("mx"))]])
 
 
 async def start_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -46,14 +35,22 @@ async def start_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if not await control_acceso(update):
         return
     registrar("comandos_start", update)
+    comandos = [
+        linea
+        for linea, activo in (
+            ("🎵 /banda <nombre> — Discografía de un grupo", BANDAS_ACTIVO),
+            ("🌤 /tiempo <ciudad> — Tiempo actual y previsión", TIEMPO_ACTIVO),
+            ("📅 /horario — Calendario laboral", CALENDARIO_ACTIVO),
+            ("⏭ /proximo — Tus próximos turnos", CALENDARIO_ACTIVO),
+            ("📊 /stats — Estadísticas del bot", True),
+            ("👋 O escríbeme un saludo", True),
+        )
+        if activo
+    ]
     await update.message.reply_text(
         "¡Hola! 👋 Soy un bot multifunción.\n\n"
-        "🎵 /banda <nombre> — Discografía de un grupo\n"
-        "🌤 /tiempo <ciudad> — Tiempo actual y previsión\n"
-        "📅 /horario — Calendario laboral\n"
-        "📊 /stats — Estadísticas del bot\n"
-        "👋 O escríbeme un saludo\n\n"
-        "También puedes usar los botones de abajo:",
+        + "\n".join(comandos)
+        + "\n\nTambién puedes usar los botones de abajo:",
         reply_markup=get_main_keyboard(),
     )
 
@@ -64,7 +61,7 @@ async def stats_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
     registrar("comandos_stats", update)
     
-    msg = formatear_estadisticas()
+    msg = await formatear_estadisticas()
     
     # Añadir usuarios baneados al mensaje
     usuarios_baneados = obtener_usuarios_baneados()
@@ -82,3 +79,70 @@ async def miid_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
         f"Añade este número a ADMIN\\_IDS en el archivo .env para ser administrador.",
         parse_mode="Markdown",
     )
+
+
+# --- Botones del menú principal ---
+
+@ruta("ms", nombre="menu_stats")
+async def menu_stats_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Botón de estadísticas."""
+    registrar("comandos_stats", update)
+    msg = await formatear_estadisticas()
+    msg += f"🚫 Usuarios baneados: {len(obtener_usuarios_baneados())}\n"
+    await update.callback_query.edit_message_text(msg, parse_mode="Markdown", reply_markup=get_main_keyboard())
+
+
+@ruta("mb", nombre="menu_banda")
+async def menu_banda_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Botón de búsqueda de banda."""
+    context.user_data["esperando_banda"] = True
+    await update.callback_query.edit_message_text(
+        "🎵 Escribe el nombre del grupo que quieres buscar:",
+        reply_markup=get_cancelar_keyboard(),
+    )
+
+
+@ruta("mt", nombre="menu_tiempo")
+async def menu_tiempo_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Botón de consulta del tiempo."""
+    context.user_data["esperando_ciudad"] = True
+    await update.callback_query.edit_message_text(
+        "🌤 Escribe el nombre de la ciudad o envía tu ubicación 📍:",
+        reply_markup=get_cancelar_keyboard(),
+    )
+
+
+@ruta("mc", nombre="menu_calendario")
+async def menu_calendario_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Botón de calendario (también es el 'Cancelar' de los flujos del calendario)."""
+    from calendario_cmd import get_calendario_keyboard
+    registrar("calendario", update)
+    context.user_data["cal_paso"] = None
+    await update.callback_query.edit_message_text(
+        "📅 *Calendario laboral*\n\n"
+        "Gestiona tus turnos de entrada y salida.\n"
+        "Recibirás una notificación 10 minutos antes.",
+        parse_mode="Markdown",
+        reply_markup=get_calendario_keyboard(),
+    )
+
+
+@ruta("mv", nombre="menu_volver")
+async def menu_volver_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Botón volver."""
+    await update.callback_query.edit_message_text(
+        "Elige una opción:",
+        reply_markup=get_main_keyboard(),
+    )
+
+
+@ruta("mx", nombre="menu_cancelar")
+async def menu_cancelar_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Botón cancelar: sale de cualquier flujo a medias."""
+    context.user_data["esperando_banda"] = False
+    context.user_data["esperando_ciudad"] = False
+    context.user_data["cal_paso"] = None
+    await update.callback_query.edit_message_text(
+        "👌 Cancelado. Usa los botones o escribe un comando.",
+        reply_markup=get_main_keyboard(),
+    )
@@ -0,0 +1,58 @@
+"""
+Módulo de procesamiento concurrente de updates.
+Procesa updates de distintos usuarios en paralelo, pero los de un mismo
+usuario de uno en uno y en orden de llegada, para que los flujos de varios
+pasos guardados en `context.user_data` (cal_paso, esperando_banda, ...)
+sigan funcionando.
+"""
+import asyncio
+from telegram.ext import BaseUpdateProcessor
+
+
+class ProcesadorPorUsuario(BaseUpdateProcessor):
+    """Update processor con serialización por usuario y límite global de updates en curso."""
+
+    def __init__(self, max_en_curso: int):
+        super().__init__(max_en_curso)
+        # user_id → [lock, updates esperando o en curso]
+        self._locks: dict[int, list] = {}
+
+    def _adquirir(self, user_id: int) -> asyncio.Lock:
+        entrada = self._locks.setdefault(user_id, [asyncio.Lock(), 0])
+        entrada[1] += 1
+        return entrada[0]
+
+    def _liberar(self, user_id: int):
+        entrada = self._locks[user_id]
+        entrada[1] -= 1
+        if entrada[1] == 0:
+            del self._locks[user_id]
+
+    async def process_update(self, update, coroutine):
+        """Espera el turno del usuario *antes* de ocupar un hueco del límite global,
+        para que los updates en cola de un usuario no bloqueen a los demás."""
+        user = getattr(update, "effective_user", None)
+        if user is None:
+            await super().process_update(update, coroutine)
+            return
+
+        lock = self._adquirir(user.id)
+        try:
+            async with lock:
+                await super().process_update(update, coroutine)
+        finally:
+            self._liberar(user.id)
+
+    async def do_process_update(self, update, coroutine):
+        await coroutine
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    @property
+    def usuarios_en_curso(self) -> int:
+        """Usuarios con updates esperando o en proceso."""
+        return len(self._locks)
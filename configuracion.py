@@ -0,0 +1,21 @@
+"""
+Configuración común del bot.
+Carga el .env una sola vez (bot.py importa este módulo antes que ningún otro,
+porque casi todos leen sus variables al importarse) y define qué funciones
+están activas. Una función desactivada no registra handlers, no aparece en
+los menús y sus módulos ni siquiera se importan.
+"""
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+def _activo(variable: str) -> bool:
+    return os.getenv(variable, "true").lower() == "true"
+
+
+# Funciones opcionales (true/false)
+BANDAS_ACTIVO = _activo("BANDAS_ACTIVO")
+TIEMPO_ACTIVO = _activo("TIEMPO_ACTIVO")
+CALENDARIO_ACTIVO = _activo("CALENDARIO_ACTIVO")
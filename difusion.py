@@ -0,0 +1,273 @@
+"""
+Módulo de difusión de mensajes a todos los usuarios (/admin broadcast).
+Los destinatarios son los usuarios conocidos: los de las estadísticas, los del
+calendario y los que tienen estado guardado, menos los baneados. Se envían por
+lotes en segundo plano con prioridad de difusión en la cola de envíos, así que
+el tráfico interactivo siempre pasa antes.
+
+El progreso se guarda en SQLite al terminar cada lote, desde un hilo: si el bot
+se reinicia, la difusión continúa por donde iba (como mucho se repiten los
+envíos del lote que estaba en vuelo). Al terminar se informa al admin que la lanzó.
+"""
+import os
+import time
+import asyncio
+import sqlite3
+import threading
+from pathlib import Path
+from telegram.error import Forbidden, TelegramError
+
+from cola_envios import PRIORIDAD_DIFUSION
+
+DIFUSION_FILE = Path(os.getenv("DIFUSION_FILE", str(Path(__file__).parent / "difusion.db")))
+# Envíos en vuelo a la vez (la cola de envíos decide el ritmo real)
+DIFUSION_LOTE = int(os.getenv("DIFUSION_LOTE", "30"))
+# Segundos sin progreso a partir de los cuales otro proceso puede retomar la difusión
+DIFUSION_ABANDONO = 120
+
+PENDIENTE, ENVIADO, BLOQUEADO, FALLIDO, CANCELADO = "pendiente", "enviado", "bloqueado", "fallido", "cancelado"
+
+# El progreso de cada lote se anota desde un hilo: la conexión se comparte con `_bloqueo`
+_conexion: sqlite3.Connection | None = None
+_bloqueo = threading.Lock()
+_tarea: asyncio.Task | None = None
+
+
+def _db() -> sqlite3.Connection:
+    """Abre (una sola vez) la base de datos de difusiones. Usar siempre con `_bloqueo`."""
+    global _conexion
+    if _conexion is None:
+        _conexion = sqlite3.connect(DIFUSION_FILE, check_same_thread=False)
+        _conexion.execute("PRAGMA journal_mode=WAL")
+        _conexion.execute("PRAGMA synchronous=NORMAL")
+        _conexion.execute(
+            "CREATE TABLE IF NOT EXISTS difusiones (id INTEGER PRIMARY KEY, texto TEXT NOT NULL, "
+            "admin_chat INTEGER NOT NULL, creada REAL NOT NULL, terminada REAL, "
+            "segundos REAL NOT NULL DEFAULT 0, latido REAL NOT NULL DEFAULT 0)"
+        )
+        _conexion.execute(
+            "CREATE TABLE IF NOT EXISTS destinatarios (difusion INTEGER NOT NULL, user_id INTEGER NOT NULL, "
+            "estado TEXT NOT NULL, error TEXT, PRIMARY KEY (difusion, user_id))"
+        )
+        _conexion.commit()
+    return _conexion
+
+
+def _usuarios_conocidos() -> set[int]:
+    """Usuarios de las estadísticas (de todos los workers) y del calendario (se ejecuta en un hilo)."""
+    import calendario
+    import estadisticas
+
+    return set(estadisticas.usuarios_conocidos()) | calendario.usuarios_calendario()
+
+
+async def destinatarios(app) -> set[int]:
+    """Usuarios conocidos por el bot, sin los baneados."""
+    from acceso import obtener_usuarios_baneados
+
+    # Consulta al Manager y lectura de los ficheros del calendario: fuera del event loop
+    usuarios = await asyncio.to_thread(_usuarios_conocidos)
+    usuarios_persistidos = getattr(app.persistence, "usuarios", None)
+    if usuarios_persistidos:
+        usuarios |= usuarios_persistidos()
+    return usuarios - set(obtener_usuarios_baneados())
+
+
+def en_curso() -> int | None:
+    """Id de la difusión sin terminar, si la hay."""
+    with _bloqueo:
+        fila = _db().execute("SELECT id FROM difusiones WHERE terminada IS NULL ORDER BY id LIMIT 1").fetchone()
+    return fila[0] if fila else None
+
+
+def _reclamar(difusion_id: int, forzar: bool) -> bool:
+    """Se queda con la difusión si nadie la está enviando (o si `forzar`)."""
+    ahora = time.time()
+    with _bloqueo:
+        db = _db()
+        reclamada = db.execute(
+            "UPDATE difusiones SET latido = ? WHERE id = ? AND terminada IS NULL AND (? OR latido < ?)",
+            (ahora, difusion_id, forzar, ahora - DIFUSION_ABANDONO),
+        ).rowcount
+        db.commit()
+    return bool(reclamada)
+
+
+async def _enviar(bot, user_id: int, texto: str) -> tuple[str, str | None, int]:
+    """Envía a un destinatario. Devuelve (estado, error, user_id)."""
+    error = None
+    try:
+        await bot.send_message(chat_id=user_id, text=texto, rate_limit_args=PRIORIDAD_DIFUSION)
+        estado = ENVIADO
+    except Forbidden as e:
+        # Bloqueó el bot o borró la cuenta
+        estado, error = BLOQUEADO, str(e)
+    except TelegramError as e:
+        estado, error = FALLIDO, str(e)
+    return estado, error, user_id
+
+
+def _anotar(difusion_id: int, resultados: list[tuple[str, str | None, int]], segundos: float = 0.0):
+    """Guarda el resultado de varios envíos en una sola transacción."""
+    with _bloqueo:
+        db = _db()
+        with db:
+            db.executemany("UPDATE destinatarios SET estado = ?, error = ? WHERE difusion = ? AND user_id = ?",
+                           [(estado, error, difusion_id, uid) for estado, error, uid in resultados])
+            db.execute("UPDATE difusiones SET latido = ?, segundos = segundos + ? WHERE id = ?",
+                       (time.time(), segundos, difusion_id))
+
+
+async def _ejecutar(app, difusion_id: int):
+    """Envía los destinatarios pendientes por lotes y avisa al admin al terminar."""
+    with _bloqueo:
+        texto, admin_chat = _db().execute("SELECT texto, admin_chat FROM difusiones WHERE id = ?",
+                                          (difusion_id,)).fetchone()
+    inicio = time.monotonic()
+    hechos = []  # envíos terminados y aún sin anotar
+
+    async def enviar(uid: int):
+        hechos.append(await _enviar(app.bot, uid, texto))
+
+    try:
+        while True:
+            with _bloqueo:
+                lote = [uid for (uid,) in _db().execute(
+                    "SELECT user_id FROM destinatarios WHERE difusion = ? AND estado = ? LIMIT ?",
+                    (difusion_id, PENDIENTE, DIFUSION_LOTE),
+                )]
+            if not lote:
+                break
+            await asyncio.gather(*(enviar(uid) for uid in lote))
+            # Un commit por lote, desde un hilo
+            resultados, hechos = hechos, []
+            await asyncio.to_thread(_anotar, difusion_id, resultados)
+    finally:
+        # Si se cancela a mitad de lote, lo ya enviado se anota aquí mismo para no repetirlo al reanudar
+        _anotar(difusion_id, hechos, time.monotonic() - inicio)
+
+    with _bloqueo:
+        db = _db()
+        terminada = db.execute("UPDATE difusiones SET terminada = ? WHERE id = ? AND terminada IS NULL",
+                               (time.time(), difusion_id)).rowcount
+        db.commit()
+    if terminada:
+        print(f"📣 Difusión #{difusion_id} terminada")
+        try:
+            await app.bot.send_message(chat_id=admin_chat, text=formatear_difusion(difusion_id), parse_mode="Markdown")
+        except TelegramError as e:
+            print(f"⚠️ No se pudo enviar el informe de la difusión #{difusion_id}: {e}")
+
+
+def _lanzar(app, difusion_id: int):
+    global _tarea
+    _tarea = asyncio.get_running_loop().create_task(_ejecutar(app, difusion_id))
+
+
+async def iniciar(app, texto: str, admin_chat: int) -> tuple[int, int]:
+    """Crea una difusión para todos los destinatarios y empieza a enviarla.
+
+    Returns:
+        (id de la difusión, número de destinatarios)
+    """
+    usuarios = await destinatarios(app)
+    if en_curso() is not None:
+        raise RuntimeError("Ya hay una difusión en curso")
+    with _bloqueo:
+        db = _db()
+        difusion_id = db.execute(
+            "INSERT INTO difusiones (texto, admin_chat, creada, latido) VALUES (?, ?, ?, ?)",
+            (texto, admin_chat, time.time(), time.time()),
+        ).lastrowid
+        db.executemany("INSERT INTO destinatarios (difusion, user_id, estado) VALUES (?, ?, ?)",
+                       [(difusion_id, uid, PENDIENTE) for uid in usuarios])
+        db.commit()
+    _lanzar(app, difusion_id)
+    return difusion_id, len(usuarios)
+
+
+async def reanudar(app, forzar: bool = False) -> int | None:
+    """Retoma la difusión a medias, si nadie la está enviando. Devuelve su id.
+
+    Args:
+        forzar: Retomarla aunque tenga actividad reciente (cuando este es el único proceso)
+    """
+    difusion_id = en_curso()
+    if difusion_id is None or (_tarea and not _tarea.done()) or not _reclamar(difusion_id, forzar):
+        return None
+    with _bloqueo:
+        pendientes = _db().execute("SELECT COUNT(*) FROM destinatarios WHERE difusion = ? AND estado = ?",
+                                   (difusion_id, PENDIENTE)).fetchone()[0]
+    print(f"📣 Reanudando la difusión #{difusion_id} ({pendientes} pendientes)")
+    _lanzar(app, difusion_id)
+    return difusion_id
+
+
+def parar() -> int | None:
+    """Cancela la difusión en curso: sus pendientes ya no se envían. Devuelve su id."""
+    difusion_id = en_curso()
+    if difusion_id is None:
+        return None
+    if _tarea and not _tarea.done():
+        _tarea.cancel()
+    with _bloqueo:
+        db = _db()
+        db.execute("UPDATE destinatarios SET estado = ? WHERE difusion = ? AND estado = ?",
+                   (CANCELADO, difusion_id, PENDIENTE))
+        db.execute("UPDATE difusiones SET terminada = ? WHERE id = ?", (time.time(), difusion_id))
+        db.commit()
+    return difusion_id
+
+
+def formatear_difusion(difusion_id: int | None = None) -> str:
+    """Resultado (o progreso) de una difusión; por defecto, la última."""
+    with _bloqueo:
+        db = _db()
+        if difusion_id is None:
+            difusion_id = db.execute("SELECT MAX(id) FROM difusiones").fetchone()[0]
+            if difusion_id is None:
+                return "📣 Todavía no se ha hecho ninguna difusión."
+        terminada, segundos = db.execute("SELECT terminada, segundos FROM difusiones WHERE id = ?",
+                                         (difusion_id,)).fetchone()
+        cuentas = dict(db.execute("SELECT estado, COUNT(*) FROM destinatarios WHERE difusion = ? GROUP BY estado",
+                                  (difusion_id,)).fetchall())
+    total = sum(cuentas.values())
+    enviados = cuentas.get(ENVIADO, 0)
+    ritmo = f" ({enviados / segundos:.1f} mensajes/s)" if segundos and enviados else ""
+    lineas = [
+        f"📣 *Difusión #{difusion_id}* — {'terminada' if terminada else 'en curso'}\n",
+        f"👥 Destinatarios: {total}",
+        f"✅ Enviados: {enviados}",
+        f"🚫 Bloqueados: {cuentas.get(BLOQUEADO, 0)}",
+        f"❌ Fallidos: {cuentas.get(FALLIDO, 0)}",
+    ]
+    if cuentas.get(PENDIENTE):
+        lineas.append(f"⏳ Pendientes: {cuentas[PENDIENTE]}")
+    if cuentas.get(CANCELADO):
+        lineas.append(f"✋ Cancelados: {cuentas[CANCELADO]}")
+    lineas.append(f"⏱ Tiempo enviando: {segundos:.1f} s{ritmo}")
+    return "\n".join(lineas)
+
+
+def activar(app):
+    """Retoma al arrancar la difusión que quedó a medias y la detiene al parar el bot.
+
+    Solo para el proceso único: con varios workers cada uno llama a `reanudar` sin forzar.
+    """
+    post_init_previo = app.post_init
+    post_stop_previo = app.post_stop
+
+    async def post_init(application):
+        if post_init_previo:
+            await post_init_previo(application)
+        await reanudar(application, forzar=True)
+
+    async def post_stop(application):
+        # El progreso ya está en disco: se retoma en el siguiente arranque
+        if _tarea and not _tarea.done():
+            _tarea.cancel()
+        if post_stop_previo:
+            await post_stop_previo(application)
+
+    app.post_init = post_init
+    app.post_stop = post_stop
@@ -30,6 +30,9 @@ STATS = {
     "notificaciones_enviadas": 0,
 }
 
+# Con varios workers: función que devuelve las instantáneas de los demás procesos
+_agregador = None
+
 
 def registrar(tipo: str, update: Update):
     """Registra una petición en las estadísticas y notifica por email."""
@@ -55,23 +58,69 @@ def incrementar_contador(tipo: str):
         STATS[tipo] += 1
 
 
-def formatear_estadisticas() -> str:
+def instantanea() -> dict:
+    """Copia serializable de las estadísticas (para compartir entre procesos)."""
+    datos = STATS.copy()
+    datos["inicio"] = STATS["inicio"].timestamp()
+    datos["usuarios"] = list(STATS["usuarios"])
+    return datos
+
+
+def establecer_agregador(funcion):
+    """Registra la función que aporta las estadísticas de otros workers."""
+    global _agregador
+    _agregador = funcion
+
+
+def _combinar(instantaneas: list[dict]) -> dict:
+    """Suma las estadísticas de varios workers."""
+    total = {"inicio": min(i["inicio"] for i in instantaneas), "usuarios": set()}
+    for datos in instantaneas:
+        total["usuarios"].update(datos["usuarios"])
+        for clave, valor in datos.items():
+            if clave not in ("inicio", "usuarios"):
+                total[clave] = total.get(clave, 0) + valor
+    total["inicio"] = datetime.fromtimestamp(total["inicio"])
+    return total
+
+
+def usuarios_conocidos() -> set[int]:
+    """Usuarios que han usado el bot desde que arrancó (de todos los workers).
+    Con varios workers consulta el Manager: llamar desde un hilo, no desde el event loop."""
+    usuarios = set(STATS["usuarios"])
+    if _agregador:
+        for datos in _agregador():
+            usuarios.update(datos["usuarios"])
+    return usuarios
+
+
+async def formatear_estadisticas() -> str:
     """Formatea las estadísticas para mostrar en Telegram."""
-    uptime = datetime.now() - STATS["inicio"]
+    stats = STATS
+    workers = 1
+    if _agregador:
+        # Las de los demás workers están en el Manager: cada acceso es una llamada entre procesos
+        otras = await asyncio.to_thread(_agregador)
+        stats = _combinar([instantanea()] + otras)
+        workers += len(otras)
+
+    uptime = datetime.now() - stats["inicio"]
     horas, resto = divmod(int(uptime.total_seconds()), 3600)
     minutos, segundos = divmod(resto, 60)
 
     msg = (
         "📊 *Estadísticas del bot*\n\n"
         f"⏱ Uptime: {horas}h {minutos}m {segundos}s\n"
-        f"📨 Peticiones totales: {STATS['total']}\n\n"
-        f"👋 Saludos: {STATS['saludos']}\n"
-        f"🎸 Búsquedas de bandas: {STATS['bandas']}\n"
-        f"🌤 Consultas de tiempo: {STATS['tiempo']}\n"
-        f"📅 Calendario: {STATS['calendario']}\n"
-        f"▶️ Comandos /start: {STATS['comandos_start']}\n"
-        f"📊 Comandos /stats: {STATS['comandos_stats']}\n\n"
-        f"👥 Usuarios únicos: {len(STATS['usuarios'])}\n"
-        f"🔔 Notificaciones enviadas: {STATS['notificaciones_enviadas']}\n"
+        f"📨 Peticiones totales: {stats['total']}\n\n"
+        f"👋 Saludos: {stats['saludos']}\n"
+        f"🎸 Búsquedas de bandas: {stats['bandas']}\n"
+        f"🌤 Consultas de tiempo: {stats['tiempo']}\n"
+        f"📅 Calendario: {stats['calendario']}\n"
+        f"▶️ Comandos /start: {stats['comandos_start']}\n"
+        f"📊 Comandos /stats: {stats['comandos_stats']}\n\n"
+        f"👥 Usuarios únicos: {len(stats['usuarios'])}\n"
+        f"🔔 Notificaciones enviadas: {stats['notificaciones_enviadas']}\n"
     )
+    if workers > 1:
+        msg += f"🧩 Workers: {workers}\n"
     return msg
@@ -0,0 +1,136 @@
+"""
+Módulo de reparto de updates entre varios procesos worker.
+Un proceso frontal (polling o webhook) solo recibe updates y los envía al
+worker `user_id % NUM_WORKERS`, de modo que el estado de cada usuario
+(user_data, rate limit, calendario) vive siempre en el mismo proceso.
+El estado de acceso común (modo, límite, baneados, lista blanca) se
+comparte entre todos en un dict del Manager (ver acceso.py).
+El frontal supervisa los workers y reinicia los que se caen.
+"""
+import asyncio
+import multiprocessing as mp
+from telegram import Update
+from telegram.ext import TypeHandler, ContextTypes
+
+# Cada cuántos segundos se comprueban los workers y se publican sus estadísticas
+INTERVALO_SUPERVISION = 5
+
+
+# Comandos de admin que cambian el estado de otro usuario: van al worker de ese usuario
+# (el cambio se comparte con todos, pero sus avisos de rate limit solo están en ese worker)
+ACCIONES_ADMIN_SOBRE_USUARIO = ("ban", "unban", "allow", "deny")
+
+
+def fragmento_de(update: Update, n: int) -> int:
+    """Worker que atiende este update (los que no tienen usuario van al 0)."""
+    mensaje = update.message
+    if mensaje and mensaje.text and mensaje.text.startswith("/admin "):
+        partes = mensaje.text.split()
+        if len(partes) >= 3 and partes[1].lower() in ACCIONES_ADMIN_SOBRE_USUARIO and partes[2].isdigit():
+            return int(partes[2]) % n
+
+    user = update.effective_user
+    return user.id % n if user else 0
+
+
+# --- Worker ---
+
+async def _ejecutar_worker(k: int, n: int, cola, compartidas, acceso_compartido):
+    """Bucle del worker: recibe updates del frontal y los procesa con la aplicación normal."""
+    import acceso
+    import bot
+    import difusion
+    import estadisticas
+    import vigilancia
+
+    acceso.compartir_estado(acceso_compartido)
+    app = bot.construir_aplicacion(bot.nuevo_builder().updater(None))
+    app.job_queue.run_repeating(
+        acceso.sincronizar_estado, interval=acceso.INTERVALO_SINCRONIZACION, first=acceso.INTERVALO_SINCRONIZACION,
+    )
+
+    async def publicar_estadisticas(context: ContextTypes.DEFAULT_TYPE):
+        await asyncio.to_thread(compartidas.__setitem__, k, estadisticas.instantanea())
+
+    app.job_queue.run_repeating(publicar_estadisticas, interval=INTERVALO_SUPERVISION, first=0)
+    estadisticas.establecer_agregador(lambda: [v for kk, v in compartidas.items() if kk != k])
+
+    async with app:
+        await app.start()
+        puerto = vigilancia.SALUD_PUERTO + 1 + k if vigilancia.SALUD_PUERTO else 0
+        await vigilancia.iniciar(app, puerto)
+        # Sin forzar: si otro worker la está enviando, se deja
+        await difusion.reanudar(app)
+        print(f"🧩 Worker {k}/{n} listo")
+        while True:
+            datos = await asyncio.to_thread(cola.get)
+            if datos is None:
+                break
+            await app.update_queue.put(Update.de_json(datos, app.bot))
+        await app.stop()
+
+
+def _proceso_worker(k: int, n: int, cola, compartidas, acceso_compartido):
+    """Punto de entrada del proceso worker."""
+    import calendario
+    import cola_envios
+    import cola_musicbrainz
+
+    calendario.usar_fragmento(k, n)
+    # Los límites de MusicBrainz y el global de Telegram son por bot: se reparten entre los workers
+    # (el límite por chat no, porque cada chat privado vive en un solo worker)
+    cola_musicbrainz.MB_PETICIONES_POR_SEGUNDO /= n
+    cola_envios.ENVIOS_POR_SEGUNDO /= n
+    try:
+        asyncio.run(_ejecutar_worker(k, n, cola, compartidas, acceso_compartido))
+    except KeyboardInterrupt:
+        pass
+
+
+# --- Frontal y supervisor ---
+
+def ejecutar_front(n: int):
+    """Reparte el calendario, lanza n workers y recibe updates para enrutarlos."""
+    import acceso
+    import bot
+    import calendario
+
+    calendario.repartir_en_fragmentos(n)
+    gestor = mp.Manager()
+    compartidas = gestor.dict()
+    acceso_compartido = gestor.dict(acceso.estado_inicial())
+    colas = [mp.Queue() for _ in range(n)]
+    procesos: list[mp.Process] = [None] * n
+
+    def lanzar(k: int):
+        procesos[k] = mp.Process(
+            target=_proceso_worker, args=(k, n, colas[k], compartidas, acceso_compartido),
+            name=f"worker-{k}", daemon=True,
+        )
+        procesos[k].start()
+
+    for k in range(n):
+        lanzar(k)
+
+    async def enrutar(update: Update, context: ContextTypes.DEFAULT_TYPE):
+        colas[fragmento_de(update, n)].put(update.to_dict())
+
+    async def supervisar(context: ContextTypes.DEFAULT_TYPE):
+        for k, proceso in enumerate(procesos):
+            if not proceso.is_alive():
+                print(f"⚠️ Worker {k} caído (código {proceso.exitcode}), reiniciando...")
+                lanzar(k)
+
+    app = bot.nuevo_builder().build()
+    app.add_handler(TypeHandler(Update, enrutar))
+    app.job_queue.run_repeating(supervisar, interval=INTERVALO_SUPERVISION, first=INTERVALO_SUPERVISION)
+    print(f"🧩 Modo multiproceso: {n} workers")
+
+    try:
+        bot.ejecutar(app)
+    finally:
+        for cola in colas:
+            cola.put(None)
+        for proceso in procesos:
+            proceso.join(timeout=10)
+        gestor.shutdown()
@@ -0,0 +1,119 @@
+"""
+Módulo de geocodificación local (offline) a partir de un fichero de GeoNames.
+Carga las ciudades en un índice compacto ordenado por nombre normalizado
+y resuelve búsquedas con búsqueda binaria, sin llamadas de red.
+
+Formato esperado: TSV de GeoNames (cities15000.txt, cities5000.txt, ...).
+"""
+import os
+import bisect
+from array import array
+from pathlib import Path
+
+from texto import normalizar
+
+# Ruta al fichero de ciudades (vacío = geocodificación local desactivada)
+GEOCODER_LOCAL_FILE = os.getenv("GEOCODER_LOCAL_FILE", "")
+
+# Columnas del formato GeoNames que usamos
+_COL_NOMBRE = 1
+_COL_ASCII = 2
+_COL_LAT = 4
+_COL_LON = 5
+_COL_PAIS = 8
+_COL_POBLACION = 14
+
+# Índice en memoria: claves ordenadas + arrays paralelos
+_claves: list[str] = []
+_ciudad_de_clave = array("I")
+_lat = array("d")
+_lon = array("d")
+_nombres: list[str] = []
+_cargado = False
+
+
+def activo() -> bool:
+    """Indica si hay un fichero de ciudades configurado."""
+    return bool(GEOCODER_LOCAL_FILE)
+
+
+def indice_cargado() -> bool:
+    """Indica si el índice ya está en memoria."""
+    return _cargado
+
+
+def cargar_indice(ruta: str | Path | None = None) -> int:
+    """Carga el fichero de ciudades y construye el índice. Devuelve nº de ciudades."""
+    global _claves, _ciudad_de_clave, _lat, _lon, _nombres, _cargado
+
+    ruta = Path(ruta or GEOCODER_LOCAL_FILE)
+    entradas = []  # (clave, -poblacion, indice_ciudad)
+    lat, lon, nombres = array("d"), array("d"), []
+
+    try:
+        f = open(ruta, "r", encoding="utf-8")
+    except OSError as e:
+        # Se marca como cargado (vacío) para no reintentar en cada búsqueda
+        print(f"⚠️ No se pudo cargar el geocodificador local: {e}")
+        _cargado = True
+        return 0
+
+    with f:
+        for linea in f:
+            campos = linea.rstrip("\n").split("\t")
+            if len(campos) <= _COL_POBLACION:
+                continue
+            try:
+                la, lo = float(campos[_COL_LAT]), float(campos[_COL_LON])
+                poblacion = int(campos[_COL_POBLACION] or 0)
+            except ValueError:
+                continue
+
+            idx = len(nombres)
+            lat.append(la)
+            lon.append(lo)
+            nombres.append(f"{campos[_COL_NOMBRE]}, {campos[_COL_PAIS]}")
+
+            clave = normalizar(campos[_COL_NOMBRE])
+            entradas.append((clave, -poblacion, idx))
+            clave_ascii = normalizar(campos[_COL_ASCII])
+            if clave_ascii and clave_ascii != clave:
+                entradas.append((clave_ascii, -poblacion, idx))
+
+    # A igual nombre, la ciudad más poblada queda primero
+    entradas.sort()
+
+    _claves = [e[0] for e in entradas]
+    _ciudad_de_clave = array("I", (e[2] for e in entradas))
+    _lat, _lon, _nombres = lat, lon, nombres
+    _cargado = True
+    print(f"🗺 Geocodificador local: {len(nombres)} ciudades cargadas desde {ruta.name}")
+    return len(nombres)
+
+
+def buscar(ciudad: str) -> tuple[float, float, str] | None:
+    """Busca una ciudad en el índice local. Devuelve (lat, lon, nombre_completo).
+
+    Acepta "Ciudad" o "Ciudad, CC" (código de país ISO de GeoNames).
+    """
+    if not _cargado:
+        return None
+
+    nombre, _, pais = ciudad.partition(",")
+    clave = normalizar(nombre)
+    pais = pais.strip().upper()
+    if not clave:
+        return None
+
+    i = bisect.bisect_left(_claves, clave)
+    while i < len(_claves) and _claves[i] == clave:
+        c = _ciudad_de_clave[i]
+        if not pais or _nombres[c].endswith(f", {pais}"):
+            return _lat[c], _lon[c], _nombres[c]
+        i += 1
+    return None
+
+
+def ciudades():
+    """Itera sobre las ciudades cargadas como (lat, lon, nombre_completo)."""
+    return zip(_lat, _lon, _nombres)
@@ -0,0 +1,79 @@
+"""
+Módulo de índice local de artistas para sugerencias por prefijo.
+Se construye con los artistas ya resueltos (caché de MusicBrainz) y se
+amplía con cada búsqueda nueva. Las búsquedas son binarias sobre una
+lista ordenada de nombres normalizados.
+"""
+import asyncio
+import bisect
+
+import cache_bandas
+from texto import normalizar
+
+# Entradas ordenadas por clave: (clave, nombre, mbid, descripcion)
+_entradas: list[tuple[str, str, str, str]] = []
+_mbids: set[str] = set()
+_cargado = False
+_carga = asyncio.Lock()
+
+
+def describir_artista(info: dict) -> str:
+    """Texto corto que acompaña a la sugerencia."""
+    partes = [p for p in (info.get("tipo"), info.get("pais"), info.get("inicio")) if p and p != "?"]
+    return " · ".join(partes)
+
+
+def _entrada(info: dict) -> tuple[str, str, str, str]:
+    return normalizar(info["nombre"]), info["nombre"], info["mbid"], describir_artista(info)
+
+
+def registrar_artista(info: dict):
+    """Añade un artista al índice (ignora MBIDs ya indexados)."""
+    mbid = info.get("mbid")
+    if not mbid or mbid in _mbids:
+        return
+    _mbids.add(mbid)
+    bisect.insort(_entradas, _entrada(info))
+
+
+def _leer_guardados() -> list[tuple[str, str, str, str]]:
+    """Entradas de todos los artistas guardados en la caché (una por MBID)."""
+    entradas = {}
+    for info in cache_bandas.artistas_guardados():
+        if info.get("mbid"):
+            entradas.setdefault(info["mbid"], _entrada(info))
+    return list(entradas.values())
+
+
+async def cargar_indice():
+    """Construye el índice con los artistas guardados en la caché (solo la primera vez)."""
+    global _cargado
+    if _cargado:
+        return
+    async with _carga:
+        if _cargado:
+            return
+        # Lectura de toda la tabla: fuera del event loop
+        guardadas = await asyncio.to_thread(_leer_guardados)
+        # Los registrados mientras tanto ya están en el índice
+        nuevas = [e for e in guardadas if e[2] not in _mbids]
+        _mbids.update(e[2] for e in nuevas)
+        _entradas.extend(nuevas)
+        _entradas.sort()
+        _cargado = True
+
+
+def buscar_prefijo(texto: str, limite: int = 10) -> list[tuple[str, str, str]]:
+    """Devuelve hasta `limite` artistas cuyo nombre empieza por `texto`.
+    Cada resultado es (nombre, mbid, descripcion). Requiere `cargar_indice()` antes."""
+    prefijo = normalizar(texto)
+    if not prefijo:
+        return []
+    inicio = bisect.bisect_left(_entradas, (prefijo,))
+    fin = bisect.bisect_left(_entradas, (prefijo + "\uffff",), lo=inicio)
+    return [(nombre, mbid, desc) for _, nombre, mbid, desc in _entradas[inicio:min(fin, inicio + limite)]]
+
+
+def total_artistas() -> int:
+    """Número de artistas indexados."""
+    return len(_entradas)
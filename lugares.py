@@ -0,0 +1,93 @@
+"""
+Módulo de lugares conocidos con índice espacial.
+Agrupa los lugares en celdas de una rejilla lat/lon para encontrar
+el lugar conocido más cercano a una ubicación sin recorrerlos todos.
+"""
+import os
+import math
+import threading
+from array import array
+from collections import defaultdict
+
+# Radio máximo para considerar que una ubicación está "en" un lugar conocido
+RADIO_LUGAR_KM = float(os.getenv("RADIO_LUGAR_KM", "5"))
+
+# Tamaño de celda de la rejilla en grados (~11 km en latitud)
+CELDA_GRADOS = 0.1
+RADIO_TIERRA_KM = 6371.0
+KM_POR_GRADO = 111.2
+
+_lat = array("d")
+_lon = array("d")
+_nombres: list[str] = []
+# Un lugar por posición (~10 m): dos ciudades homónimas del mismo país son lugares distintos
+_por_posicion: dict[tuple[float, float], int] = {}
+_celdas: dict[tuple[int, int], list[int]] = defaultdict(list)
+# registrar_lugares se llama desde un hilo mientras el bot sigue registrando lugares
+_escritura = threading.Lock()
+
+
+def _celda(lat: float, lon: float) -> tuple[int, int]:
+    """Devuelve la celda de la rejilla que contiene el punto."""
+    return math.floor(lat / CELDA_GRADOS), math.floor(lon / CELDA_GRADOS)
+
+
+def distancia_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Distancia haversine entre dos puntos en km."""
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp = p2 - p1
+    dl = math.radians(lon2 - lon1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * RADIO_TIERRA_KM * math.asin(math.sqrt(a))
+
+
+def registrar_lugar(lat: float, lon: float, nombre: str):
+    """Añade un lugar conocido al índice (ignora posiciones ya registradas)."""
+    clave = (round(lat, 4), round(lon, 4))
+    with _escritura:
+        if clave in _por_posicion:
+            return
+        idx = len(_nombres)
+        _lat.append(lat)
+        _lon.append(lon)
+        _nombres.append(nombre)
+        _por_posicion[clave] = idx
+        # La celda se rellena al final: lugar_cercano nunca ve un índice a medias
+        _celdas[_celda(lat, lon)].append(idx)
+
+
+def registrar_lugares(lugares):
+    """Añade en bloque un iterable de (lat, lon, nombre)."""
+    for lat, lon, nombre in lugares:
+        registrar_lugar(lat, lon, nombre)
+
+
+def total_lugares() -> int:
+    """Número de lugares indexados."""
+    return len(_nombres)
+
+
+def lugar_cercano(lat: float, lon: float, radio_km: float = RADIO_LUGAR_KM) -> tuple[float, float, str] | None:
+    """Busca el lugar conocido más cercano dentro de `radio_km`.
+    Devuelve (lat, lon, nombre) o None."""
+    if not _nombres:
+        return None
+
+    # Celdas a revisar alrededor del punto según el radio
+    dlat = radio_km / KM_POR_GRADO
+    cos_lat = max(math.cos(math.radians(lat)), 0.01)
+    dlon = min(radio_km / (KM_POR_GRADO * cos_lat), 180.0)
+    fila_min, col_min = _celda(lat - dlat, lon - dlon)
+    fila_max, col_max = _celda(lat + dlat, lon + dlon)
+
+    mejor, mejor_dist = None, radio_km
+    for fila in range(fila_min, fila_max + 1):
+        for col in range(col_min, col_max + 1):
+            for idx in _celdas.get((fila, col), ()):
+                d = distancia_km(lat, lon, _lat[idx], _lon[idx])
+                if d <= mejor_dist:
+                    mejor, mejor_dist = idx, d
+
+    if mejor is None:
+        return None
+    return _lat[mejor], _lon[mejor], _nombres[mejor]
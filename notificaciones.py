@@ -4,10 +4,7 @@ Envía un email al administrador cada vez que un usuario realiza una acción.
 """
 
 import os
-import smtplib
 import asyncio
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
 from datetime import datetime
 
 
@@ -29,6 +26,11 @@ def _enviar_email_sync(asunto: str, cuerpo: str):
     if not cfg["activo"] or not cfg["user"] or not cfg["password"] or not cfg["destino"]:
         return
 
+    # smtplib y email solo se cargan si de verdad se envía algo
+    import smtplib
+    from email.mime.text import MIMEText
+    from email.mime.multipart import MIMEMultipart
+
     try:
         msg = MIMEMultipart()
         msg["From"] = cfg["user"]
@@ -0,0 +1,129 @@
+"""
+Módulo de updates pendientes al arrancar.
+Tras una caída, Telegram guarda los updates que no se llegaron a recoger y
+run_polling los procesaría uno a uno, aunque ya no sirvan. Según
+PENDIENTES_ARRANQUE, antes de empezar el polling normal:
+
+    todos      se procesan todos, como siempre
+    compactar  se recogen de golpe y se quedan solo los útiles (por defecto):
+               - se descartan las pulsaciones de botones y las inline queries
+                 (Telegram ya dejó de esperar su respuesta)
+               - de cada usuario se conserva solo el último de cada comando
+                 (/tiempo, /banda...), el último texto libre y la última ubicación
+               - salvo si el usuario estaba a mitad de un flujo (cal_paso,
+                 esperando_ciudad...): entonces cada texto es un paso y se
+                 conservan todos, en orden
+               Los que quedan se encolan juntos y se procesan en paralelo
+               (en orden dentro de cada usuario, ver concurrencia.py)
+    descartar  se descartan todos
+"""
+import os
+import time
+import asyncio
+from collections import Counter
+from telegram import Update
+
+from persistencia import estados_guardados
+
+PENDIENTES_ARRANQUE = os.getenv("PENDIENTES_ARRANQUE", "compactar").lower()
+# Updates por llamada a getUpdates (máximo de la Bot API)
+PENDIENTES_LOTE = 100
+
+
+def _clave(update: Update, en_flujo: set[int]) -> tuple | None:
+    """Qué hace único a un update: dos pendientes con la misma clave son duplicados."""
+    mensaje = update.message
+    if mensaje is None or update.effective_user is None:
+        return None
+    if mensaje.location:
+        tipo = "ubicacion"
+    elif mensaje.text and mensaje.text.startswith("/"):
+        # "/tiempo@mi_bot Madrid" → "/tiempo"
+        tipo = mensaje.text.split()[0].split("@")[0].lower()
+    elif mensaje.text and update.effective_user.id not in en_flujo:
+        tipo = "texto"
+    else:
+        return None
+    return update.effective_user.id, mensaje.chat_id, tipo
+
+
+def espera_texto(estado: dict) -> bool:
+    """Indica si el estado de conversación de un usuario espera su próximo texto."""
+    return bool(estado.get("cal_paso")) or any(v for k, v in estado.items() if k.startswith("esperando_"))
+
+
+def compactar(updates: list[Update], en_flujo: set[int] = frozenset()) -> tuple[list[Update], Counter]:
+    """Filtra los updates pendientes.
+
+    Args:
+        updates: updates pendientes en orden de llegada
+        en_flujo: usuarios a mitad de un flujo, cuyos textos libres se conservan todos
+
+    Returns:
+        (updates que se conservan en su orden original, descartados por motivo)
+    """
+    descartados: Counter = Counter()
+    ultimo: dict[tuple, int] = {}
+    for update in updates:
+        clave = _clave(update, en_flujo)
+        if clave is not None:
+            ultimo[clave] = update.update_id
+
+    conservados = []
+    for update in updates:
+        if update.callback_query or update.inline_query:
+            descartados["botones e inline"] += 1
+            continue
+        clave = _clave(update, en_flujo)
+        if clave is not None and ultimo[clave] != update.update_id:
+            descartados["repetidos"] += 1
+            continue
+        conservados.append(update)
+    return conservados, descartados
+
+
+async def _recoger(bot) -> list[Update]:
+    """Recoge todos los updates pendientes y los confirma para que no se vuelvan a entregar."""
+    updates: list[Update] = []
+    offset = None
+    while True:
+        lote = await bot.get_updates(offset=offset, limit=PENDIENTES_LOTE, timeout=0)
+        if not lote:
+            return updates
+        updates.extend(lote)
+        offset = lote[-1].update_id + 1
+
+
+async def encolar_pendientes(app):
+    """Recoge, compacta y encola los updates pendientes antes de empezar el polling."""
+    inicio = time.perf_counter()
+    # Con un webhook activo getUpdates falla; run_polling lo borraría después de todos modos
+    await app.bot.delete_webhook()
+    updates = await _recoger(app.bot)
+    if not updates:
+        return
+    # El estado de conversación todavía no está cargado (y el proceso frontal del modo
+    # multiproceso ni siquiera tiene persistencia): se mira directamente en disco
+    usuarios = {u.effective_user.id for u in updates if u.message and u.message.text and u.effective_user}
+    estados = await asyncio.to_thread(estados_guardados, usuarios)
+    flujo = {uid for uid, estado in estados.items() if espera_texto(estado)}
+    conservados, descartados = compactar(updates, flujo)
+    for update in conservados:
+        await app.update_queue.put(update)
+    detalle = ", ".join(f"{motivo}: {n}" for motivo, n in descartados.items())
+    print(f"📥 Updates pendientes: {len(updates)} → {len(conservados)} "
+          f"({detalle or 'ninguno descartado'}) en {1000 * (time.perf_counter() - inicio):.0f} ms")
+
+
+def activar(app):
+    """Programa `encolar_pendientes` para después de inicializar la aplicación (solo polling)."""
+    if PENDIENTES_ARRANQUE != "compactar":
+        return
+    post_init_previo = app.post_init
+
+    async def post_init(application):
+        if post_init_previo:
+            await post_init_previo(application)
+        await encolar_pendientes(application)
+
+    app.post_init = post_init
@@ -0,0 +1,170 @@
+"""
+Módulo de perfilado bajo demanda del proceso en marcha.
+- Perfil de CPU por muestreo: un hilo lee periódicamente la pila del hilo del
+  bucle de eventos (sin instrumentar cada llamada, así que el coste es bajo).
+  El hilo solo toma muestras cuando obtiene el GIL, así que los tramos de CPU
+  más cortos que sys.getswitchinterval() (5 ms) quedan infrarrepresentados.
+- Memoria: instantáneas de tracemalloc comparadas con la anterior.
+Se usa desde /admin profile y /admin mem.
+"""
+import os
+import sys
+import time
+import asyncio
+import threading
+import tracemalloc
+from collections import Counter
+
+# Duración máxima de un perfil y periodo de muestreo
+PERFIL_MAX_SEGUNDOS = 120
+PERFIL_INTERVALO = 0.005
+# Funciones que se muestran en los resúmenes
+PERFIL_TOP = 12
+# Marcos que guarda tracemalloc por asignación (más = más detalle y más coste)
+MEM_PROFUNDIDAD = 5
+
+# Marco en el que el bucle espera eventos: las muestras ahí cuentan como inactividad
+_FUNCIONES_INACTIVAS = {("selectors.py", "select"), ("selectors.py", "poll")}
+
+_perfilando = False
+_instantanea_anterior: tracemalloc.Snapshot | None = None
+
+
+def _nombre_marco(marco) -> str:
+    codigo = marco.f_code
+    return f"{codigo.co_name} ({os.path.basename(codigo.co_filename)}:{codigo.co_firstlineno})"
+
+
+def _muestrear(hilo: int, segundos: float, intervalo: float) -> tuple[Counter, int]:
+    """Cuenta las pilas del hilo `hilo` durante `segundos`. Devuelve (pilas, muestras inactivas)."""
+    pilas: Counter = Counter()
+    inactivas = 0
+    fin = time.monotonic() + segundos
+    while time.monotonic() < fin:
+        marco = sys._current_frames().get(hilo)
+        if marco is not None:
+            codigo = marco.f_code
+            if (os.path.basename(codigo.co_filename), codigo.co_name) in _FUNCIONES_INACTIVAS:
+                inactivas += 1
+            else:
+                pila = []
+                while marco is not None:
+                    pila.append(_nombre_marco(marco))
+                    marco = marco.f_back
+                pilas[";".join(reversed(pila))] += 1
+        del marco
+        time.sleep(intervalo)
+    return pilas, inactivas
+
+
+def perfilando() -> bool:
+    return _perfilando
+
+
+async def perfilar(segundos: float) -> tuple[Counter, int]:
+    """Muestrea el hilo del bucle actual durante `segundos` sin bloquearlo.
+
+    Returns:
+        (pilas colapsadas → muestras, muestras con el bucle inactivo)
+    """
+    global _perfilando
+    if _perfilando:
+        raise RuntimeError("Ya hay un perfil en curso")
+    _perfilando = True
+    try:
+        segundos = min(segundos, PERFIL_MAX_SEGUNDOS)
+        return await asyncio.to_thread(_muestrear, threading.get_ident(), segundos, PERFIL_INTERVALO)
+    finally:
+        _perfilando = False
+
+
+def formatear_perfil(pilas: Counter, inactivas: int, segundos: float) -> str:
+    """Resumen de las funciones más calientes (propias y acumuladas)."""
+    activas = sum(pilas.values())
+    total = activas + inactivas
+    if not activas:
+        return f"🔬 *Perfil de {segundos:g}s*\n\n😴 El bucle estuvo inactivo en las {total} muestras."
+
+    propias: Counter = Counter()
+    acumuladas: Counter = Counter()
+    for pila, n in pilas.items():
+        funciones = pila.split(";")
+        propias[funciones[-1]] += n
+        for funcion in set(funciones):
+            acumuladas[funcion] += n
+
+    def lineas(contador: Counter) -> str:
+        return "\n".join(
+            f"`{100 * n / total:5.1f}% {funcion}`" for funcion, n in contador.most_common(PERFIL_TOP)
+        )
+
+    return (
+        f"🔬 *Perfil de {segundos:g}s* ({total} muestras, bucle ocupado {100 * activas / total:.1f}%)\n\n"
+        f"🔥 *Tiempo propio:*\n{lineas(propias)}\n\n"
+        f"📚 *Tiempo acumulado:*\n{lineas(acumuladas)}"
+    )
+
+
+def pilas_colapsadas(pilas: Counter) -> str:
+    """Formato 'pila;colapsada muestras' de flamegraph.pl / speedscope."""
+    return "".join(f"{pila} {n}\n" for pila, n in pilas.most_common())
+
+
+# --- Memoria ---
+
+def _tomar_instantanea() -> tracemalloc.Snapshot:
+    return tracemalloc.take_snapshot().filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        tracemalloc.Filter(False, "<unknown>"),
+    ))
+
+
+def _formatear_estadistica(estadistica, diferencia: bool) -> str:
+    marco = estadistica.traceback[0]
+    sitio = f"{os.path.basename(marco.filename)}:{marco.lineno}"
+    if diferencia:
+        return f"`{estadistica.size_diff / 1024:+9.1f} KiB {sitio} ({estadistica.count_diff:+d})`"
+    return f"`{estadistica.size / 1024:9.1f} KiB {sitio} ({estadistica.count})`"
+
+
+def _informe_memoria() -> str:
+    global _instantanea_anterior
+    instantanea = _tomar_instantanea()
+    actual, pico = tracemalloc.get_traced_memory()
+    partes = [
+        f"🧠 *Memoria (tracemalloc)*\n\n"
+        f"📦 Rastreado: {actual / 1048576:.1f} MiB (pico {pico / 1048576:.1f} MiB)\n\n"
+        f"🔝 *Mayores sitios de asignación:*\n"
+        + "\n".join(_formatear_estadistica(e, False) for e in instantanea.statistics("lineno")[:PERFIL_TOP])
+    ]
+    if _instantanea_anterior is not None:
+        crecimiento = [e for e in instantanea.compare_to(_instantanea_anterior, "lineno") if e.size_diff > 0]
+        partes.append(
+            "📈 *Crecimiento desde la instantánea anterior:*\n"
+            + ("\n".join(_formatear_estadistica(e, True) for e in crecimiento[:PERFIL_TOP]) or "Sin crecimiento")
+        )
+    _instantanea_anterior = instantanea
+    return "\n\n".join(partes)
+
+
+async def informe_memoria() -> str:
+    """Compara la memoria con la instantánea anterior. La primera llamada activa tracemalloc."""
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(MEM_PROFUNDIDAD)
+        return (
+            "🧠 Rastreo de memoria activado. Solo se ven las asignaciones a partir de ahora: "
+            "repite `/admin mem` dentro de un rato para ver los mayores sitios y su crecimiento, "
+            "y `/admin mem parar` al terminar."
+        )
+    return await asyncio.to_thread(_informe_memoria)
+
+
+def parar_memoria() -> bool:
+    """Desactiva tracemalloc y libera las instantáneas. Devuelve si estaba activo."""
+    global _instantanea_anterior
+    _instantanea_anterior = None
+    if not tracemalloc.is_tracing():
+        return False
+    tracemalloc.stop()
+    return True
@@ -0,0 +1,199 @@
+"""
+Módulo de persistencia del estado de conversación (context.user_data).
+Guarda en SQLite solo los usuarios cuyo estado ha cambiado, carga cada
+usuario la primera vez que escribe tras un reinicio y descarta el estado
+que lleva más de ESTADO_TTL_MINUTOS sin actividad. La marca de tiempo de
+cada fila es la última actividad del usuario, aunque su estado no cambie.
+"""
+import os
+import json
+import time
+import asyncio
+import sqlite3
+import threading
+from pathlib import Path
+from telegram.ext import BasePersistence, PersistenceInput
+
+ESTADO_FILE = Path(os.getenv("ESTADO_FILE", str(Path(__file__).parent / "estado.db")))
+ESTADO_TTL_MINUTOS = int(os.getenv("ESTADO_TTL_MINUTOS", "60"))
+# Cada cuántos segundos se vuelcan a disco los usuarios modificados
+ESTADO_INTERVALO_GUARDADO = int(os.getenv("ESTADO_INTERVALO_GUARDADO", "30"))
+
+
+def estados_guardados(user_ids, ruta: Path = ESTADO_FILE, ttl_minutos: int = ESTADO_TTL_MINUTOS) -> dict[int, dict]:
+    """Estado guardado de varios usuarios, sin cargarlos ni contarlo como actividad.
+
+    Abre el fichero en solo lectura, así que sirve también en el proceso frontal del
+    modo multiproceso, que no tiene persistencia. Los que no tienen estado o caducó no aparecen.
+    """
+    user_ids = list(user_ids)
+    if not user_ids or not Path(ruta).exists():
+        return {}
+    db = sqlite3.connect(f"{Path(ruta).resolve().as_uri()}?mode=ro", uri=True)
+    try:
+        filas = db.execute(
+            f"SELECT user_id, datos FROM user_data WHERE ts >= ? AND user_id IN ({','.join('?' * len(user_ids))})",
+            (time.time() - ttl_minutos * 60, *user_ids),
+        ).fetchall()
+    finally:
+        db.close()
+    return {uid: json.loads(datos) for uid, datos in filas}
+
+
+class PersistenciaUsuarios(BasePersistence):
+    """Persistencia incremental y perezosa de user_data (chat_data y bot_data no se usan)."""
+
+    def __init__(self, ruta: Path = ESTADO_FILE, ttl_minutos: int = ESTADO_TTL_MINUTOS):
+        super().__init__(
+            store_data=PersistenceInput(bot_data=False, chat_data=False, user_data=True, callback_data=False),
+            update_interval=ESTADO_INTERVALO_GUARDADO,
+        )
+        self.ttl = ttl_minutos * 60
+        # La actividad se apunta en disco como mucho cada ttl/4, y se purga con la misma frecuencia
+        self.margen = self.ttl / 4
+        # Las escrituras se confirman desde un hilo; la conexión se comparte con `_bloqueo`
+        self._db = sqlite3.connect(ruta, check_same_thread=False)
+        self._bloqueo = threading.Lock()
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS user_data (user_id INTEGER PRIMARY KEY, datos TEXT NOT NULL, ts REAL NOT NULL)"
+        )
+        self._db.commit()
+        # Usuarios ya cargados en memoria → última actividad
+        self._actividad: dict[int, float] = {}
+        # Último JSON escrito por usuario y su marca de tiempo, para no reescribir si no cambió
+        self._escrito: dict[int, tuple[str, float]] = {}
+        self._ultima_purga = 0.0
+        self.purgar_caducados()
+
+    def _escribir(self, sql: str, parametros: tuple) -> int:
+        """Ejecuta una escritura y la confirma. Devuelve las filas afectadas."""
+        with self._bloqueo:
+            filas = self._db.execute(sql, parametros).rowcount
+            self._db.commit()
+        return filas
+
+    async def _escribir_async(self, sql: str, parametros: tuple) -> int:
+        """Como `_escribir`, pero fuera del event loop."""
+        return await asyncio.to_thread(self._escribir, sql, parametros)
+
+    # --- user_data ---
+
+    async def get_user_data(self) -> dict:
+        # No se carga nada al arrancar: cada usuario se lee en refresh_user_data
+        return {}
+
+    async def refresh_user_data(self, user_id: int, user_data: dict):
+        """Carga el usuario la primera vez que aparece y caduca su estado si lleva mucho inactivo."""
+        ahora = time.time()
+        if ahora - self._ultima_purga >= self.margen:
+            self._ultima_purga = ahora
+            limite = ahora - self.ttl
+            await self._escribir_async("DELETE FROM user_data WHERE ts < ?", (limite,))
+            self._olvidar_inactivos(limite)
+        ultima = self._actividad.get(user_id)
+
+        if ultima is None:
+            # Primera vez tras arrancar o tras purgarlo de memoria: manda lo que haya en disco
+            user_data.clear()
+            with self._bloqueo:
+                fila = self._db.execute("SELECT datos, ts FROM user_data WHERE user_id = ?", (user_id,)).fetchone()
+            if fila and ahora - fila[1] < self.ttl:
+                user_data.update(json.loads(fila[0]))
+                self._escrito[user_id] = (fila[0], fila[1])
+        elif ahora - ultima >= self.ttl:
+            user_data.clear()
+
+        self._actividad[user_id] = ahora
+
+    async def update_user_data(self, user_id: int, data: dict):
+        """Escribe solo este usuario, y solo si su estado cambió o su actividad en disco se ha quedado vieja.
+
+        PTB lo llama en cada ciclo de guardado para todo usuario que ha tenido updates.
+        """
+        try:
+            datos = json.dumps(data, ensure_ascii=False, sort_keys=True)
+        except TypeError as e:
+            # Un handler guardó algo que no es JSON: se guarda como texto (y sin las claves raras)
+            # en vez de romper el guardado de todos los usuarios
+            print(f"⚠️ Estado del usuario {user_id} con valores no serializables ({e}), se guardan como texto")
+            datos = json.dumps(data, ensure_ascii=False, default=repr, skipkeys=True)
+        ahora = self._actividad.get(user_id, time.time())
+        escrito, ts = self._escrito.get(user_id, (None, 0.0))
+        if escrito == datos:
+            if data and ahora - ts >= self.margen:
+                await self._escribir_async("UPDATE user_data SET ts = ? WHERE user_id = ?", (ahora, user_id))
+                self._escrito[user_id] = (datos, ahora)
+            return
+        if data:
+            await self._escribir_async("INSERT OR REPLACE INTO user_data VALUES (?, ?, ?)", (user_id, datos, ahora))
+        else:
+            await self._escribir_async("DELETE FROM user_data WHERE user_id = ?", (user_id,))
+        self._escrito[user_id] = (datos, ahora)
+
+    async def drop_user_data(self, user_id: int):
+        self._escrito.pop(user_id, None)
+        self._actividad.pop(user_id, None)
+        await self._escribir_async("DELETE FROM user_data WHERE user_id = ?", (user_id,))
+
+    def usuarios(self) -> set[int]:
+        """Usuarios con estado guardado (han hablado con el bot hace menos de ESTADO_TTL_MINUTOS)."""
+        with self._bloqueo:
+            return {uid for (uid,) in self._db.execute("SELECT user_id FROM user_data")}
+
+    def _olvidar_inactivos(self, limite: float):
+        """Olvida en memoria a los usuarios sin actividad desde `limite`."""
+        for user_id in [u for u, ultima in self._actividad.items() if ultima < limite]:
+            del self._actividad[user_id]
+        for user_id in [u for u in self._escrito if u not in self._actividad]:
+            del self._escrito[user_id]
+
+    def purgar_caducados(self) -> int:
+        """Borra de disco el estado caducado y olvida en memoria a los usuarios inactivos.
+        Devuelve cuántos usuarios se eliminaron de disco."""
+        ahora = time.time()
+        limite = ahora - self.ttl
+        eliminados = self._escribir("DELETE FROM user_data WHERE ts < ?", (limite,))
+        self._olvidar_inactivos(limite)
+        self._ultima_purga = ahora
+        return eliminados
+
+    async def flush(self):
+        await asyncio.to_thread(self.purgar_caducados)
+        self._db.close()
+
+    # --- Datos no persistidos ---
+
+    async def get_chat_data(self) -> dict:
+        return {}
+
+    async def get_bot_data(self) -> dict:
+        return {}
+
+    async def get_callback_data(self):
+        return None
+
+    async def get_conversations(self, name: str) -> dict:
+        return {}
+
+    async def update_conversation(self, name: str, key, new_state):
+        pass
+
+    async def update_chat_data(self, chat_id: int, data: dict):
+        pass
+
+    async def update_bot_data(self, data: dict):
+        pass
+
+    async def update_callback_data(self, data):
+        pass
+
+    async def drop_chat_data(self, chat_id: int):
+        pass
+
+    async def refresh_chat_data(self, chat_id: int, chat_data: dict):
+        pass
+
+    async def refresh_bot_data(self, bot_data: dict):
+        pass
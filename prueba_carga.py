@@ -0,0 +1,206 @@
+"""
+Prueba de carga del bot contra servidores falsos locales.
+Arranca servidor_falso.py, lanza `bot.py` apuntando a él y reproduce sesiones
+de usuario sintéticas (saludos, /tiempo, /banda, calendario, botones) a un
+ritmo objetivo. Informa de updates/s y latencia p50/p95/p99 por comando.
+
+Uso:
+    python prueba_carga.py --usuarios 50 --ritmo 100 --duracion 30 \\
+        --latencia-telegram 20 --latencia-meteo 100 --latencia-mb 300
+"""
+import os
+import sys
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+import statistics
+from collections import defaultdict
+from pathlib import Path
+
+from servidor_falso import iniciar_servidor
+
+# Segundos máximos de espera por las respuestas de un paso
+TIMEOUT_PASO = 15
+
+# Sesiones: lista de pasos (etiqueta, tipo, contenido, respuestas esperadas del bot).
+# Los botones generan answerCallbackQuery + la edición del mensaje; su contenido es el
+# callback_data que codifica rutas.py (p. ej. "cd:0" = día lunes, "ct:0" = entrada).
+SESIONES = {
+    "saludo": [
+        ("saludo", "texto", "hola", 1),
+    ],
+    "tiempo": [
+        ("/tiempo", "texto", "/tiempo Ciudad{u}", 2),
+    ],
+    "ubicacion": [
+        ("ubicacion", "ubicacion", None, 2),
+    ],
+    "banda": [
+        ("/banda", "texto", "/banda Grupo{g}", 2),
+    ],
+    "calendario": [
+        ("/horario", "texto", "/horario", 1),
+        ("btn cal_add", "boton", "ca", 2),
+        ("btn cal_dia", "boton", "cd:0", 2),
+        ("texto hora", "texto", "08:{m:02d}", 1),
+        ("btn cal_tipo", "boton", "ct:0", 2),
+        ("btn cal_ver", "boton", "cv", 2),
+    ],
+    "botones": [
+        ("/start", "texto", "/start", 1),
+        ("btn menu_tiempo", "boton", "mt", 2),
+        ("texto ciudad", "texto", "Ciudad{u}", 2),
+        ("btn menu_stats", "boton", "ms", 2),
+    ],
+}
+
+
+class Limitador:
+    """Espacia las inyecciones de updates al ritmo objetivo (updates/s)."""
+
+    def __init__(self, ritmo: float):
+        self.intervalo = 1 / ritmo
+        self.siguiente = time.perf_counter()
+
+    async def esperar(self):
+        ahora = time.perf_counter()
+        self.siguiente = max(self.siguiente + self.intervalo, ahora)
+        espera = self.siguiente - ahora
+        if espera > 0:
+            await asyncio.sleep(espera)
+
+
+def _percentil(valores: list[float], p: float) -> float:
+    valores = sorted(valores)
+    return valores[min(len(valores) - 1, int(len(valores) * p))]
+
+
+async def _usuario_virtual(user_id: int, telegram, respuestas: dict, limitador: Limitador,
+                           fin: float, latencias: dict, timeouts: dict, rnd: random.Random):
+    """Repite sesiones aleatorias hasta `fin`, paso a paso, esperando las respuestas de cada uno."""
+    cola = respuestas[user_id]
+    while time.perf_counter() < fin:
+        for etiqueta, tipo, contenido, esperadas in SESIONES[rnd.choice(list(SESIONES))]:
+            if time.perf_counter() >= fin:
+                return
+            await limitador.esperar()
+
+            # Descartar respuestas tardías de pasos anteriores
+            while not cola.empty():
+                cola.get_nowait()
+
+            inicio = time.perf_counter()
+            if tipo == "texto":
+                telegram.enviar_texto(user_id, contenido.format(u=user_id, g=user_id % 20, m=rnd.randint(0, 59)))
+            elif tipo == "boton":
+                telegram.pulsar_boton(user_id, contenido)
+            else:
+                telegram.enviar_ubicacion(user_id, rnd.uniform(-60, 70), rnd.uniform(-180, 180))
+
+            try:
+                ultima = inicio
+                for _ in range(esperadas):
+                    ultima = await asyncio.wait_for(cola.get(), TIMEOUT_PASO)
+                latencias[etiqueta].append(ultima - inicio)
+            except asyncio.TimeoutError:
+                timeouts[etiqueta] += 1
+
+
+async def ejecutar_prueba(args):
+    telegram, puerto = await iniciar_servidor(
+        args.latencia_telegram / 1000, args.latencia_meteo / 1000, args.latencia_mb / 1000,
+    )
+    base = f"http://127.0.0.1:{puerto}"
+    respuestas: dict[int, asyncio.Queue] = defaultdict(asyncio.Queue)
+    telegram.al_responder = lambda chat_id, metodo, t: respuestas[chat_id].put_nowait(t)
+
+    directorio = Path(tempfile.mkdtemp(prefix="prueba_carga_"))
+    entorno = {
+        **os.environ,
+        "TELEGRAM_BOT_TOKEN": "123:prueba",
+        "TELEGRAM_API_URL": base,
+        "OPEN_METEO_URL": f"{base}/meteo/forecast",
+        "GEOCODING_URL": f"{base}/meteo/search",
+        "MUSICBRAINZ_BASE": f"{base}/mb/ws/2",
+        "MB_PETICIONES_POR_SEGUNDO": str(args.mb_ritmo),
+        "MAX_PETICIONES_POR_MINUTO": "1000000",
+        "EMAIL_ACTIVO": "false",
+        "MODO_CONEXION": "polling",
+        "NUM_WORKERS": str(args.workers),
+        "CALENDARIO_FILE": str(directorio / "calendario.json"),
+        "CACHE_BANDAS_FILE": str(directorio / "cache_bandas.db"),
+        "ESTADO_FILE": str(directorio / "estado.db"),
+        "DIFUSION_FILE": str(directorio / "difusion.db"),
+    }
+    bot = await asyncio.create_subprocess_exec(
+        sys.executable, str(Path(__file__).parent / "bot.py"),
+        env=entorno,
+        stdout=None if args.verbose else asyncio.subprocess.DEVNULL,
+        stderr=None if args.verbose else asyncio.subprocess.DEVNULL,
+    )
+
+    try:
+        await asyncio.wait_for(telegram.primer_poll.wait(), 30)
+    except asyncio.TimeoutError:
+        bot.kill()
+        print("❌ El bot no empezó a hacer polling en 30 s (usa --verbose para ver su salida).")
+        return
+
+    print(f"🚀 {args.usuarios} usuarios, {args.ritmo} updates/s objetivo, {args.duracion}s "
+          f"(latencias ms: telegram {args.latencia_telegram}, meteo {args.latencia_meteo}, mb {args.latencia_mb})")
+
+    latencias: dict[str, list[float]] = defaultdict(list)
+    timeouts: dict[str, int] = defaultdict(int)
+    limitador = Limitador(args.ritmo)
+    rnd = random.Random(args.semilla)
+    inicio = time.perf_counter()
+    fin = inicio + args.duracion
+
+    await asyncio.gather(*[
+        _usuario_virtual(1000 + u, telegram, respuestas, limitador, fin, latencias, timeouts,
+                         random.Random(rnd.random()))
+        for u in range(args.usuarios)
+    ])
+    transcurrido = time.perf_counter() - inicio
+
+    telegram.cerrar()
+    bot.terminate()
+    try:
+        await asyncio.wait_for(bot.wait(), 10)
+    except asyncio.TimeoutError:
+        bot.kill()
+
+    total = sum(len(v) for v in latencias.values())
+    print(f"\n📊 {total} pasos completados en {transcurrido:.1f}s → {total / transcurrido:.1f} updates/s\n")
+    print(f"{'Comando':<16}{'n':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'timeouts':>10}")
+    for etiqueta in sorted(set(latencias) | set(timeouts)):
+        valores = latencias.get(etiqueta, [])
+        if valores:
+            p50, p95, p99 = (_percentil(valores, p) * 1000 for p in (0.5, 0.95, 0.99))
+            print(f"{etiqueta:<16}{len(valores):>7}{p50:>10.1f}{p95:>10.1f}{p99:>10.1f}{timeouts[etiqueta]:>10}")
+        else:
+            print(f"{etiqueta:<16}{0:>7}{'-':>10}{'-':>10}{'-':>10}{timeouts[etiqueta]:>10}")
+    todas = [v for vs in latencias.values() for v in vs]
+    if todas:
+        print(f"\nMedia global: {statistics.mean(todas) * 1000:.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de carga del bot con servidores falsos locales.")
+    parser.add_argument("--usuarios", type=int, default=50, help="usuarios virtuales simultáneos")
+    parser.add_argument("--ritmo", type=float, default=50, help="updates/s objetivo")
+    parser.add_argument("--duracion", type=float, default=30, help="segundos de prueba")
+    parser.add_argument("--latencia-telegram", type=float, default=20, help="ms por llamada a la Bot API")
+    parser.add_argument("--latencia-meteo", type=float, default=100, help="ms por llamada a Open-Meteo")
+    parser.add_argument("--latencia-mb", type=float, default=300, help="ms por llamada a MusicBrainz")
+    parser.add_argument("--mb-ritmo", type=float, default=50, help="MB_PETICIONES_POR_SEGUNDO del bot")
+    parser.add_argument("--workers", type=int, default=1, help="NUM_WORKERS del bot")
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--verbose", action="store_true", help="mostrar la salida del bot")
+    asyncio.run(ejecutar_prueba(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+Módulo de enrutado de callbacks de botones inline.
+Cada módulo registra sus rutas con el decorador `ruta`, indicando un prefijo
+corto y los campos tipados que lleva el botón. El callback_data queda como
+`prefijo:campo:campo` (máximo 64 bytes, el límite de Telegram) y el despacho
+es una sola búsqueda en un diccionario por prefijo.
+
+    @ruta("cd", Opcion(DIAS), nombre="cal_dia")
+    async def elegir_dia(update, context, dia): ...
+
+    InlineKeyboardButton("Lunes", callback_data=datos("cd", "lunes"))
+"""
+import time
+import uuid
+import base64
+from telegram import Update
+from telegram.ext import ContextTypes
+
+SEPARADOR = ":"
+# Límite de Telegram para callback_data
+MAX_BYTES_CALLBACK = 64
+
+
+# --- Campos tipados ---
+
+class Entero:
+    """Entero no negativo, en base 36 para ocupar menos."""
+
+    def codificar(self, valor: int) -> str:
+        if valor < 0:
+            raise ValueError(f"Entero negativo en callback: {valor}")
+        digitos = ""
+        while True:
+            valor, resto = divmod(valor, 36)
+            digitos = "0123456789abcdefghijklmnopqrstuvwxyz"[resto] + digitos
+            if not valor:
+                return digitos
+
+    def decodificar(self, texto: str) -> int:
+        return int(texto, 36)
+
+
+class Opcion:
+    """Un valor de una lista fija, codificado por su posición."""
+
+    def __init__(self, valores):
+        self.valores = tuple(valores)
+        self._indices = {v: i for i, v in enumerate(self.valores)}
+
+    def codificar(self, valor) -> str:
+        return Entero().codificar(self._indices[valor])
+
+    def decodificar(self, texto: str):
+        return self.valores[int(texto, 36)]
+
+
+class Uuid:
+    """UUID (p. ej. un MBID de MusicBrainz) en 22 caracteres base64 en lugar de 36."""
+
+    def codificar(self, valor: str) -> str:
+        return base64.urlsafe_b64encode(uuid.UUID(valor).bytes).rstrip(b"=").decode()
+
+    def decodificar(self, texto: str) -> str:
+        return str(uuid.UUID(bytes=base64.urlsafe_b64decode(texto + "==")))
+
+
+# --- Registro y despacho ---
+
+# prefijo → (handler, campos, nombre)
+_RUTAS: dict[str, tuple] = {}
+# prefijo → [pulsaciones, segundos totales, segundos máximo, errores]
+_METRICAS: dict[str, list] = {}
+_obsoletos = 0
+
+
+def ruta(prefijo: str, *campos, nombre: str | None = None):
+    """Decorador que registra un handler `handler(update, context, *valores)` para un prefijo."""
+    if SEPARADOR in prefijo:
+        raise ValueError(f"El prefijo no puede contener '{SEPARADOR}': {prefijo}")
+
+    def registrar_ruta(handler):
+        if prefijo in _RUTAS:
+            raise ValueError(f"Prefijo de callback duplicado: {prefijo}")
+        _RUTAS[prefijo] = (handler, campos, nombre or handler.__name__)
+        _METRICAS[prefijo] = [0, 0.0, 0.0, 0]
+        return handler
+
+    return registrar_ruta
+
+
+def datos(prefijo: str, *valores) -> str:
+    """callback_data para un botón de la ruta `prefijo` con estos valores."""
+    _, campos, _ = _RUTAS[prefijo]
+    if len(valores) != len(campos):
+        raise ValueError(f"La ruta {prefijo} espera {len(campos)} valores, no {len(valores)}")
+    texto = SEPARADOR.join([prefijo, *(c.codificar(v) for c, v in zip(campos, valores))])
+    if len(texto.encode()) > MAX_BYTES_CALLBACK:
+        raise ValueError(f"callback_data de {len(texto.encode())} bytes (máx. {MAX_BYTES_CALLBACK}): {texto}")
+    return texto
+
+
+async def despachar(update: Update, context: ContextTypes.DEFAULT_TYPE) -> bool:
+    """Ejecuta la ruta del callback. Devuelve False si el botón no corresponde a ninguna."""
+    global _obsoletos
+    prefijo, *partes = (update.callback_query.data or "").split(SEPARADOR)
+    entrada = _RUTAS.get(prefijo)
+    try:
+        if entrada is None or len(partes) != len(entrada[1]):
+            raise ValueError(prefijo)
+        valores = [campo.decodificar(parte) for campo, parte in zip(entrada[1], partes)]
+    except (ValueError, IndexError, KeyError):
+        # Botones de mensajes antiguos (otro formato o rutas que ya no existen)
+        _obsoletos += 1
+        return False
+
+    metricas = _METRICAS[prefijo]
+    inicio = time.perf_counter()
+    try:
+        await entrada[0](update, context, *valores)
+    except Exception:
+        metricas[3] += 1
+        raise
+    finally:
+        duracion = time.perf_counter() - inicio
+        metricas[0] += 1
+        metricas[1] += duracion
+        metricas[2] = max(metricas[2], duracion)
+    return True
+
+
+def formatear_rutas() -> str:
+    """Pulsaciones y tiempos por ruta para /admin rutas."""
+    lineas = [
+        f"`{nombre:<14} {n:>6} {1000 * total / n:>7.1f} {1000 * maximo:>7.1f} {errores:>3}`"
+        for prefijo, (n, total, maximo, errores) in sorted(_METRICAS.items(), key=lambda x: -x[1][1])
+        if n
+        for nombre in [_RUTAS[prefijo][2]]
+    ]
+    if not lineas:
+        return "🔘 Todavía no se ha pulsado ningún botón."
+    return (
+        "🔘 *Botones* (pulsaciones, ms medio, ms máx., errores)\n\n"
+        + "\n".join(lineas)
+        + (f"\n\n⌛ Botones caducados: {_obsoletos}" if _obsoletos else "")
+    )
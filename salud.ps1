@@ -0,0 +1,24 @@
+# Script para comprobar el estado del bot de Telegram
+# Uso: .\salud.ps1
+
+Write-Host "🩺 Comprobando el estado del bot..." -ForegroundColor Cyan
+Write-Host ""
+
+$puerto = if ($env:SALUD_PUERTO) { $env:SALUD_PUERTO } else { 8081 }
+try {
+    $estado = Invoke-RestMethod -Uri "http://127.0.0.1:$puerto/listo" -TimeoutSec 5
+    Write-Host "✅ Bot listo" -ForegroundColor Green
+} catch {
+    if ($_.Exception.Response) {
+        $estado = $_.ErrorDetails.Message | ConvertFrom-Json
+        Write-Host "⚠️  El bot responde pero no está listo" -ForegroundColor Yellow
+    } else {
+        Write-Host "❌ El bot no responde en el puerto $puerto" -ForegroundColor Red
+        exit 1
+    }
+}
+
+Write-Host "   Lag del bucle: $($estado.lag_ms.actual) ms (máx. $($estado.lag_ms.maximo) ms, bloqueos: $($estado.bloqueos))"
+Write-Host "   Último poll hace: $($estado.segundos_desde_poll) s"
+Write-Host "   Colas: $($estado.colas | ConvertTo-Json -Compress)"
+Write-Host ""
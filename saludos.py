@@ -1,11 +1,16 @@
 """
 Módulo de respuestas a saludos y mensajes de texto general.
+Los mensajes libres se clasifican en intenciones (saludo, "tiempo en X",
+"busca la banda X", "mis turnos") buscando cada frase como palabras
+completas, sin mayúsculas ni acentos.
 """
+import unicodedata
 from telegram import Update
 from telegram.ext import ContextTypes
 
 from acceso import control_acceso
 from estadisticas import registrar
+from configuracion import BANDAS_ACTIVO, TIEMPO_ACTIVO, CALENDARIO_ACTIVO
 
 # Saludos reconocidos y sus respuestas
 SALUDOS = {
@@ -22,19 +27,153 @@ SALUDOS = {
     "saludos": "¡Saludos! 🤗",
 }
 
+# Frases que piden algo concreto. Las que llevan argumento (ciudad, grupo) lo toman
+# del resto del mensaje y solo cuentan al principio (o tras un saludo)
+FRASES_TIEMPO = ("tiempo en", "el tiempo en", "qué tiempo hace en", "clima en", "el clima en")
+# "banda" o "grupo" sueltos son demasiado comunes para lanzar una búsqueda en MusicBrainz
+FRASES_BANDA = ("busca la banda", "busca el grupo", "info de la banda", "info del grupo", "discografía de")
+FRASES_TURNOS = ("mis turnos", "mi horario", "mis horarios", "mi calendario", "ver turnos")
+
+# Intenciones, de mayor a menor prioridad
+TIEMPO, BANDA, TURNOS, SALUDO = range(4)
+CON_ARGUMENTO = {TIEMPO, BANDA}
+
+# Signos que se ignoran alrededor del argumento
+_PUNTUACION = " \t\n?¿!¡.,;:\"'«»"
+
+
+def _tabla_plegado() -> dict[int, str]:
+    """Minúsculas sin acentos, carácter a carácter (conserva las posiciones del texto original)."""
+    tabla = {}
+    for codigo in range(0x41, 0x250):
+        c = chr(codigo)
+        base = "".join(x for x in unicodedata.normalize("NFD", c.lower()) if not unicodedata.combining(x))
+        if len(base) == 1 and base != c:
+            tabla[codigo] = base
+    return tabla
+
+
+# Se construye con el primer mensaje, no al arrancar
+_TABLA_PLEGADO: dict[int, str] = {}
+
+
+def plegar(texto: str) -> str:
+    """Minúsculas y sin acentos, con la misma longitud que `texto`."""
+    if texto.isascii():
+        return texto.lower()
+    if not _TABLA_PLEGADO:
+        _TABLA_PLEGADO.update(_tabla_plegado())
+    return texto.translate(_TABLA_PLEGADO)
+
+
+def _frase_normalizada(frase: str) -> str:
+    return " ".join(plegar(frase).split())
+
+
+def _palabra_completa(texto: str, inicio: int, fin: int) -> bool:
+    """True si texto[inicio:fin] no está pegado a otras letras o cifras."""
+    return (inicio == 0 or not texto[inicio - 1].isalnum()) and (fin == len(texto) or not texto[fin].isalnum())
+
+
+class Clasificador:
+    """Busca en un texto todas las frases de intención, como palabras completas."""
+
+    def __init__(self, frases: dict[str, tuple]):
+        """`frases`: frase → (intención, dato asociado)."""
+        self._frases = [(_frase_normalizada(f), intencion, dato) for f, (intencion, dato) in frases.items()]
+
+    def clasificar(self, texto: str) -> tuple[int, object, str] | None:
+        """Devuelve (intención, dato, argumento) de mayor prioridad, o None."""
+        if "  " in texto or not texto.isprintable():
+            texto = " ".join(texto.split())
+        plegado = plegar(texto)
+        # Son pocas frases: basta con buscarlas una a una
+        encontradas = []
+        for frase, intencion, dato in self._frases:
+            if frase not in plegado:
+                continue
+            inicio = plegado.find(frase)
+            while inicio != -1 and not _palabra_completa(plegado, inicio, inicio + len(frase)):
+                inicio = plegado.find(frase, inicio + 1)
+            if inicio != -1:
+                encontradas.append((inicio, -len(frase), intencion, dato))
+        mejor = None
+        limpio = True  # hasta aquí solo hay frases reconocidas y puntuación
+        anterior = 0
+        for inicio, largo, intencion, dato in sorted(encontradas):
+            if inicio < anterior:
+                continue  # dentro de una frase más larga
+            limpio = limpio and not plegado[anterior:inicio].strip(_PUNTUACION)
+            anterior = inicio - largo
+            argumento = ""
+            if intencion in CON_ARGUMENTO:
+                argumento = texto[anterior:].strip(_PUNTUACION)
+                if not (limpio and argumento):
+                    continue
+            if mejor is None or intencion < mejor[0]:
+                mejor = (intencion, dato, argumento)
+            if intencion in CON_ARGUMENTO:
+                break  # el resto del mensaje es el argumento
+        return mejor
+
+
+def _frases_intenciones() -> dict[str, tuple]:
+    """Frases de las intenciones cuyas funciones están activas."""
+    frases = {s: (SALUDO, r) for s, r in SALUDOS.items()}
+    if CALENDARIO_ACTIVO:
+        frases.update({f: (TURNOS, None) for f in FRASES_TURNOS})
+    if BANDAS_ACTIVO:
+        frases.update({f: (BANDA, None) for f in FRASES_BANDA})
+    if TIEMPO_ACTIVO:
+        frases.update({f: (TIEMPO, None) for f in FRASES_TIEMPO})
+    return frases
+
+
+_clasificador: Clasificador | None = None
+
+
+def clasificar(texto: str) -> tuple[int, object, str] | None:
+    """Clasifica con el patrón de las intenciones activas (compilado la primera vez)."""
+    global _clasificador
+    if _clasificador is None:
+        _clasificador = Clasificador(_frases_intenciones())
+    return _clasificador.clasificar(texto)
+
 
 async def procesar_saludo(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Detecta y responde a saludos en mensajes de texto."""
+    """Clasifica un mensaje libre y lo atiende: tiempo, banda, turnos o saludo."""
+    resultado = clasificar(update.message.text)
+
+    # Tiempo y banda reutilizan los comandos, que ya aplican el control de acceso
+    if resultado and resultado[0] == TIEMPO:
+        from tiempo import tiempo_handler
+        context.args = resultado[2].split()
+        await tiempo_handler(update, context)
+        return
+    if resultado and resultado[0] == BANDA:
+        from bandas import banda_handler
+        context.args = resultado[2].split()
+        await banda_handler(update, context)
+        return
+
     if not await control_acceso(update):
         return
-    
-    registrar("saludos", update)
-    texto = update.message.text.lower().strip()
 
-    for saludo, respuesta in SALUDOS.items():
-        if saludo in texto:
-            await update.message.reply_text(respuesta)
-            return
+    if resultado and resultado[0] == TURNOS:
+        from calendario import formatear_calendario
+        from calendario_cmd import get_calendario_keyboard
+        registrar("calendario", update)
+        await update.message.reply_text(
+            formatear_calendario(update.effective_user.id),
+            parse_mode="Markdown",
+            reply_markup=get_calendario_keyboard(),
+        )
+        return
+
+    registrar("saludos", update)
+    if resultado:
+        await update.message.reply_text(resultado[1])
+        return
 
     # Si no reconoce un saludo, da una respuesta genérica
     await update.message.reply_text("No entendí tu saludo, pero ¡hola de todos modos! 😊")
@@ -0,0 +1,257 @@
+"""
+Servidor HTTP local que imita la Bot API de Telegram, Open-Meteo y MusicBrainz.
+Sirve para medir el bot sin cuenta de Telegram ni llamadas a servicios reales
+(ver prueba_carga.py). Cada servicio tiene una latencia configurable.
+
+Rutas:
+    /bot<token>/<método>       Bot API (getUpdates, sendMessage, editMessageText, ...)
+    /file/bot<token>/<ruta>    Descarga de ficheros enviados por los usuarios
+    /meteo/forecast            Open-Meteo (previsión)
+    /meteo/search              Open-Meteo (geocodificación)
+    /mb/ws/2/...               MusicBrainz (búsqueda de artistas y release-groups)
+"""
+import json
+import time
+import uuid
+import asyncio
+import zlib
+import tornado.web
+import tornado.httpserver
+import tornado.netutil
+
+
+class TelegramFalso:
+    """Estado de la Bot API falsa: cola de updates y registro de respuestas del bot."""
+
+    def __init__(self, latencia: float = 0.0):
+        self.latencia = latencia
+        self._updates: list[dict] = []
+        self._siguiente_update = 1
+        self._siguiente_mensaje = 1
+        self._hay_updates = asyncio.Event()
+        self._chat_de_callback: dict[str, int] = {}
+        self._chat_de_inline: dict[str, int] = {}
+        # Ficheros enviados por los usuarios: file_id → contenido
+        self.ficheros: dict[str, bytes] = {}
+        self.primer_poll = asyncio.Event()
+        # Se llama con (chat_id, método, instante) en cada respuesta del bot
+        self.al_responder = None
+
+    # --- Inyección de updates ---
+
+    def _encolar(self, contenido: dict) -> int:
+        update_id = self._siguiente_update
+        self._siguiente_update += 1
+        self._updates.append({"update_id": update_id, **contenido})
+        self._hay_updates.set()
+        return update_id
+
+    def _mensaje(self, user_id: int, **campos) -> dict:
+        self._siguiente_mensaje += 1
+        return {
+            "message_id": self._siguiente_mensaje,
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private"},
+            "from": {"id": user_id, "is_bot": False, "first_name": f"Usuario{user_id}"},
+            **campos,
+        }
+
+    def enviar_texto(self, user_id: int, texto: str) -> int:
+        """Simula un mensaje de texto (o comando) del usuario."""
+        campos = {"text": texto}
+        if texto.startswith("/"):
+            comando = texto.split()[0]
+            campos["entities"] = [{"type": "bot_command", "offset": 0, "length": len(comando)}]
+        return self._encolar({"message": self._mensaje(user_id, **campos)})
+
+    def enviar_ubicacion(self, user_id: int, lat: float, lon: float) -> int:
+        """Simula el envío de una ubicación."""
+        return self._encolar({"message": self._mensaje(user_id, location={"latitude": lat, "longitude": lon})})
+
+    def enviar_documento(self, user_id: int, nombre: str, contenido: bytes) -> int:
+        """Simula el envío de un fichero."""
+        file_id = uuid.uuid4().hex
+        self.ficheros[file_id] = contenido
+        return self._encolar({"message": self._mensaje(user_id, document={
+            "file_id": file_id, "file_unique_id": file_id, "file_name": nombre, "file_size": len(contenido),
+        })})
+
+    def pulsar_boton(self, user_id: int, datos: str) -> int:
+        """Simula la pulsación de un botón inline."""
+        callback_id = uuid.uuid4().hex
+        self._chat_de_callback[callback_id] = user_id
+        return self._encolar({"callback_query": {
+            "id": callback_id,
+            "from": {"id": user_id, "is_bot": False, "first_name": f"Usuario{user_id}"},
+            "chat_instance": str(user_id),
+            "data": datos,
+            "message": self._mensaje(user_id, text="menú", **{"from": {"id": 1, "is_bot": True, "first_name": "Bot"}}),
+        }})
+
+    def consulta_inline(self, user_id: int, texto: str) -> int:
+        """Simula una inline query."""
+        inline_id = uuid.uuid4().hex
+        self._chat_de_inline[inline_id] = user_id
+        return self._encolar({"inline_query": {
+            "id": inline_id,
+            "from": {"id": user_id, "is_bot": False, "first_name": f"Usuario{user_id}"},
+            "query": texto,
+            "offset": "",
+        }})
+
+    def cerrar(self):
+        """Libera el long polling pendiente (antes de parar el bot)."""
+        self._hay_updates.set()
+
+    # --- Métodos de la Bot API ---
+
+    async def get_updates(self, params: dict) -> list[dict]:
+        self.primer_poll.set()
+        offset = int(params.get("offset") or 0)
+        timeout = float(params.get("timeout") or 0)
+        self._updates = [u for u in self._updates if u["update_id"] >= offset]
+        if not self._updates and timeout > 0:
+            self._hay_updates.clear()
+            try:
+                await asyncio.wait_for(self._hay_updates.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        limite = int(params.get("limit") or 100)
+        return self._updates[:limite]
+
+    async def llamar(self, metodo: str, params: dict):
+        """Ejecuta un método de la Bot API y devuelve su `result`."""
+        if metodo == "getUpdates":
+            return await self.get_updates(params)
+        if metodo == "deleteWebhook":
+            if str(params.get("drop_pending_updates")).lower() == "true":
+                self._updates.clear()
+            return True
+        if metodo == "getMe":
+            return {"id": 1, "is_bot": True, "first_name": "Bot", "username": "bot_falso",
+                    "can_join_groups": True, "can_read_all_group_messages": False,
+                    "supports_inline_queries": True}
+
+        if metodo == "getFile":
+            file_id = params.get("file_id")
+            return {"file_id": file_id, "file_unique_id": file_id,
+                    "file_size": len(self.ficheros[file_id]), "file_path": f"documents/{file_id}"}
+
+        if self.latencia:
+            await asyncio.sleep(self.latencia)
+
+        chat_id = params.get("chat_id")
+        if metodo == "answerCallbackQuery":
+            chat_id = self._chat_de_callback.pop(params.get("callback_query_id"), None)
+        elif metodo == "answerInlineQuery":
+            chat_id = self._chat_de_inline.pop(params.get("inline_query_id"), None)
+
+        if chat_id is not None and self.al_responder:
+            self.al_responder(int(chat_id), metodo, time.perf_counter())
+
+        if metodo in ("sendMessage", "editMessageText", "sendDocument"):
+            self._siguiente_mensaje += 1
+            return {
+                "message_id": int(params.get("message_id") or self._siguiente_mensaje),
+                "date": int(time.time()),
+                "chat": {"id": int(chat_id or 0), "type": "private"},
+                "text": params.get("text", ""),
+            }
+        return True
+
+
+class _BaseHandler(tornado.web.RequestHandler):
+    def initialize(self, estado):
+        self.estado = estado
+
+    def _params(self) -> dict:
+        if self.request.headers.get("Content-Type", "").startswith("application/json") and self.request.body:
+            return json.loads(self.request.body)
+        return {k: self.get_argument(k) for k in self.request.arguments}
+
+
+class _BotApiHandler(_BaseHandler):
+    async def post(self, token: str, metodo: str):
+        # Los ficheros subidos (sendDocument) llegan como parámetros más, con su contenido
+        ficheros = {k: f[0]["body"] for k, f in self.request.files.items()}
+        resultado = await self.estado["telegram"].llamar(metodo, {**self._params(), **ficheros})
+        self.write({"ok": True, "result": resultado})
+
+    get = post
+
+
+class _FicheroHandler(_BaseHandler):
+    async def get(self, token: str, ruta: str):
+        contenido = self.estado["telegram"].ficheros.get(ruta.rsplit("/", 1)[-1])
+        if contenido is None:
+            self.set_status(404)
+            return
+        self.write(contenido)
+
+
+def _coordenadas(nombre: str) -> tuple[float, float]:
+    """Coordenadas deterministas para un nombre."""
+    h = zlib.crc32(nombre.lower().encode())
+    return round(-60 + (h % 13000) / 100, 4), round(-180 + (h // 13000 % 36000) / 100, 4)
+
+
+class _GeocodingHandler(_BaseHandler):
+    async def get(self):
+        await asyncio.sleep(self.estado["latencia_meteo"])
+        nombre = self.get_argument("name", "")
+        lat, lon = _coordenadas(nombre)
+        self.write({"results": [{"name": nombre, "country": "Tierra", "latitude": lat, "longitude": lon}]})
+
+
+class _ForecastHandler(_BaseHandler):
+    async def get(self):
+        await asyncio.sleep(self.estado["latencia_meteo"])
+        self.write({
+            "current": {"temperature_2m": 20.0, "relative_humidity_2m": 50, "apparent_temperature": 19.5,
+                        "weather_code": 1, "wind_speed_10m": 10.0},
+            "hourly": {"time": [f"2026-01-01T{h:02d}:00" for h in range(12)],
+                       "temperature_2m": [18.0] * 12, "weather_code": [1] * 12,
+                       "precipitation_probability": [10] * 12},
+        })
+
+
+class _MusicBrainzHandler(_BaseHandler):
+    async def get(self, ruta: str):
+        await asyncio.sleep(self.estado["latencia_mb"])
+        ruta = ruta.strip("/")
+        if ruta == "artist":
+            nombre = self.get_argument("query", "")
+            limite = int(self.get_argument("limit", "1"))
+            self.write({"artists": [
+                {"id": str(uuid.uuid5(uuid.NAMESPACE_URL, f"{nombre}{i}")), "name": f"{nombre}{'' if i == 0 else i}",
+                 "country": "XX", "type": "Group", "life-span": {"begin": "1990"}}
+                for i in range(limite)
+            ]})
+        elif ruta.startswith("artist/"):
+            self.write({"id": ruta.split("/", 1)[1], "name": "Artista", "life-span": {"begin": "1990"}})
+        elif ruta == "release-group":
+            offset = int(self.get_argument("offset", "0"))
+            self.write({"release-group-count": 60, "release-groups": [
+                {"title": f"Álbum {i}", "first-release-date": f"{1990 + i}-01-01"}
+                for i in range(offset, min(60, offset + int(self.get_argument("limit", "25"))))
+            ]})
+        else:
+            self.set_status(404)
+
+
+async def iniciar_servidor(latencia_telegram: float = 0.0, latencia_meteo: float = 0.0,
+                           latencia_mb: float = 0.0, puerto: int = 0) -> tuple[TelegramFalso, int]:
+    """Arranca el servidor falso en el bucle actual. Devuelve (estado de Telegram, puerto)."""
+    telegram = TelegramFalso(latencia_telegram)
+    estado = {"telegram": telegram, "latencia_meteo": latencia_meteo, "latencia_mb": latencia_mb}
+    app = tornado.web.Application([
+        (r"/bot([^/]+)/(\w+)", _BotApiHandler, {"estado": estado}),
+        (r"/file/bot([^/]+)/(.+)", _FicheroHandler, {"estado": estado}),
+        (r"/meteo/search", _GeocodingHandler, {"estado": estado}),
+        (r"/meteo/forecast", _ForecastHandler, {"estado": estado}),
+        (r"/mb/ws/2/(.*)", _MusicBrainzHandler, {"estado": estado}),
+    ])
+    sockets = tornado.netutil.bind_sockets(puerto, "127.0.0.1")
+    servidor = tornado.httpserver.HTTPServer(app)
+    servidor.add_sockets(sockets)
+    return telegram, sockets[0].getsockname()[1]
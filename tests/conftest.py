@@ -0,0 +1,13 @@
+"""Fixtures comunes: cada prueba trabaja sobre ficheros propios en tmp_path."""
+import pytest
+
+import calendario
+
+
+@pytest.fixture
+def calendario_tmp(tmp_path, monkeypatch):
+    """Calendario vacío y sin festivos en un directorio temporal."""
+    monkeypatch.setattr(calendario, "CALENDARIO_FILE", tmp_path / "calendario.json")
+    monkeypatch.setattr(calendario, "CALENDARIO_PRINCIPAL", tmp_path / "calendario.json")
+    monkeypatch.setattr(calendario, "FESTIVOS_FILE", "")
+    return tmp_path
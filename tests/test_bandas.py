@@ -0,0 +1,28 @@
+import asyncio
+
+import bandas
+import cache_bandas
+
+
+def test_discografia_ordenada_entre_paginas(monkeypatch, total=130):
+    # MusicBrainz devuelve los álbumes sin orden: del más reciente al más antiguo
+    grupos = [{"title": f"Álbum {n}", "first-release-date": f"{2100 - n}-01-01"} for n in range(total)]
+    peticiones, paginas = [], {}
+
+    async def peticion_mb(ruta, params, aviso=None):
+        peticiones.append(params["offset"])
+        inicio = params["offset"]
+        return {"release-groups": grupos[inicio:inicio + params["limit"]], "release-group-count": total}
+
+    monkeypatch.setattr(bandas, "peticion_mb", peticion_mb)
+    monkeypatch.setattr(cache_bandas, "obtener_pagina", lambda mbid, n: paginas.get(n))
+    monkeypatch.setattr(cache_bandas, "guardar_pagina", lambda mbid, n, datos: paginas.__setitem__(n, datos))
+
+    segunda = asyncio.run(bandas.obtener_pagina_discografia("x", 1))
+    assert peticiones == [0, 100] and len(paginas) == 6
+    assert segunda["total"] == total and segunda["albumes"][0] == ("1996-01-01", "Álbum 104")
+    fechas = [f for n in range(6) for f, _ in paginas[n]["albumes"]]
+    assert fechas == sorted(fechas) and len(fechas) == total
+    # Las demás páginas ya no piden nada
+    asyncio.run(bandas.obtener_pagina_discografia("x", 5))
+    assert peticiones == [0, 100]
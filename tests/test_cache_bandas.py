@@ -0,0 +1,87 @@
+import asyncio
+import threading
+import time
+from collections import Counter, OrderedDict
+
+import pytest
+
+import cache_bandas
+from cache_bandas import guardar_artista, guardar_consulta, guardar_pagina, obtener_artista, obtener_mbid, obtener_pagina
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    """Caché vacía en tmp_path con presupuesto para unas pocas entradas."""
+    monkeypatch.setattr(cache_bandas, "CACHE_BANDAS_FILE", tmp_path / "cache_bandas.db")
+    monkeypatch.setattr(cache_bandas, "CACHE_BANDAS_MAX_BYTES", 350)
+    monkeypatch.setattr(cache_bandas, "_conexion", None)
+    monkeypatch.setattr(cache_bandas, "_memoria", OrderedDict())
+    monkeypatch.setattr(cache_bandas, "_en_memoria", Counter())
+    monkeypatch.setattr(cache_bandas, "_bytes_memoria", 0)
+    monkeypatch.setattr(cache_bandas, "_pendientes", {tabla: {} for tabla in cache_bandas._SQL})
+    monkeypatch.setattr(cache_bandas, "_volcando", {tabla: {} for tabla in cache_bandas._SQL})
+    monkeypatch.setattr(cache_bandas, "_volcado", asyncio.Lock())
+    monkeypatch.setattr(cache_bandas, "ESTADISTICAS_CACHE", {"aciertos": 0, "fallos": 0, "expulsiones": 0})
+    yield cache_bandas
+    if cache_bandas._conexion is not None:
+        cache_bandas._conexion.close()
+
+
+def _filas(tabla: str) -> int:
+    with cache_bandas._bloqueo:
+        return cache_bandas._db().execute(f"SELECT COUNT(*) FROM {tabla}").fetchone()[0]
+
+
+def test_lru_comun_a_las_tres_tablas(cache):
+    guardar_pagina("a", 1, {"albumes": ["x" * 100]})
+    guardar_artista("a", {"nombre": "A"})
+    guardar_consulta("A", "a")
+    obtener_pagina("a", 1)  # la página pasa a ser la más reciente
+    guardar_pagina("b", 1, {"albumes": ["y" * 200]})
+    # Sale lo menos usado (el artista), no la página ni la entrada recién guardada
+    assert ("artistas", "a") not in cache._memoria and ("paginas", "b:1") in cache._memoria
+    assert ("paginas", "a:1") in cache._memoria and cache._bytes_memoria <= cache.CACHE_BANDAS_MAX_BYTES
+    assert cache.ESTADISTICAS_CACHE["expulsiones"] == 1
+
+
+def test_volcado_en_lote(cache):
+    guardar_artista("a", {"nombre": "A"})
+    guardar_consulta("A", "a")
+    guardar_pagina("b", 1, {"albumes": ["y" * 200]})
+    # Sin volcar todavía: nada en disco pero se sigue leyendo lo pendiente
+    assert _filas("artistas") == 0
+    cache._memoria.clear()
+    assert obtener_artista("a") == {"nombre": "A"}
+
+    async def volcar_dos_veces():
+        return await cache.volcar_cache(), await cache.volcar_cache()
+
+    assert asyncio.run(volcar_dos_veces()) == (3, 0)
+    assert _filas("artistas") == 1
+    cache._memoria.clear()
+    assert obtener_mbid(" a ") == "a" and obtener_pagina("b", 1)["albumes"] == ["y" * 200]
+
+
+def test_purgar_durante_un_volcado(cache, monkeypatch):
+    escribir = cache._escribir
+    empezado = None
+
+    def escribir_lento(lote):
+        empezado.set()
+        time.sleep(0.2)
+        escribir(lote)
+
+    monkeypatch.setattr(cache, "_escribir", escribir_lento)
+    guardar_artista("a", {"nombre": "A"})
+
+    async def purgar_a_mitad():
+        nonlocal empezado
+        empezado = threading.Event()
+        volcado = asyncio.create_task(cache.volcar_cache())
+        await asyncio.to_thread(empezado.wait)
+        eliminadas = await cache.purgar_cache()
+        return await volcado, eliminadas
+
+    # El purgado espera al volcado en curso y borra también lo que este escribió
+    assert asyncio.run(purgar_a_mitad()) == (1, 1)
+    assert _filas("artistas") == 0 and obtener_artista("a") is None
@@ -0,0 +1,137 @@
+from datetime import date, datetime
+from itertools import islice
+from pathlib import Path
+
+import calendario
+from calendario import (
+    HORIZONTE_PROXIMOS, _intervalos, agregar_ausencia, agregar_turno, compactar_calendario, describir_patron,
+    eliminar_turno, en_ausencia, es_recurrente, guardar_lugar_tiempo, lugar_tiempo, obtener_turnos_usuario,
+    ocurrencias, ocurrencias_turnos, proximos_turnos, quitar_lugar_tiempo, validar_ausencia, validar_dia,
+    validar_patron,
+)
+
+
+def test_rotaciones():
+    turno = {"dia": validar_dia("rotación 05/01/2026 4x4"), "hora": "07:00", "tipo": "entrada"}
+    assert turno["dia"] == "rotacion:2026-01-05:11110000"
+    fechas = [m.date().isoformat() for m in islice(ocurrencias(turno, date(2026, 1, 7)), 5)]
+    assert fechas == ["2026-01-07", "2026-01-08", "2026-01-13", "2026-01-14", "2026-01-15"]
+    assert not list(ocurrencias(turno, date(2026, 1, 1), date(2026, 1, 4)))
+    assert validar_patron("2x2x3x2x2x3") == "11001110011000"
+    assert describir_patron("00111") == "0x2x3"
+    assert validar_dia("rotación 05/01/2026 0x5") is None
+
+
+def test_rotacion_y_semanal_mezcladas():
+    turno = {"dia": "rotacion:2026-01-05:11110000", "hora": "07:00", "tipo": "entrada"}
+    semanal = {"dia": "lunes", "hora": "08:00", "tipo": "entrada"}
+    mezcla = [(m.strftime("%a %d"), t["hora"])
+              for m, t in ocurrencias_turnos([turno, semanal], date(2026, 1, 5), date(2026, 1, 12))]
+    assert mezcla == [("Mon 05", "07:00"), ("Mon 05", "08:00"), ("Tue 06", "07:00"), ("Wed 07", "07:00"),
+                      ("Thu 08", "07:00"), ("Mon 12", "08:00")]
+
+
+def test_validar_ausencia():
+    assert validar_ausencia("24/12/2026") == "2026-12-24/2026-12-24"
+    assert validar_ausencia("24/12/2026 - 06/01/2027") == "2026-12-24/2027-01-06"
+    assert validar_ausencia("del 1/8/2026 al 31/8/2026") == "2026-08-01/2026-08-31"
+    assert validar_ausencia("2026-12-24/2027-01-06") == "2026-12-24/2027-01-06"
+    assert validar_ausencia("06/01/2027 - 24/12/2026") is None
+    assert validar_ausencia("01/01/2026 - 01/01/2028") is None
+
+
+def test_intervalos_se_fusionan():
+    assert _intervalos([(5, 7), (1, 2), (3, 3), (6, 9), (20, 20)]) == ([1, 5, 20], [3, 9, 20])
+
+
+def test_ausencias_y_festivos(calendario_tmp, monkeypatch):
+    festivos = Path(calendario_tmp) / "festivos.txt"
+    festivos.write_text("# Nacionales\n2026-10-12 Fiesta Nacional\nnavidad\n", encoding="utf-8")
+    monkeypatch.setattr(calendario, "FESTIVOS_FILE", str(festivos))
+    agregar_turno(1, "lunes", "08:00", "entrada")
+    agregar_turno(1, "2026-08-03", "09:00", "entrada")
+    agregar_ausencia(1, validar_ausencia("1/8/2026 - 16/8/2026"))
+    agregar_ausencia(1, validar_ausencia("24/12/2026"))
+    assert en_ausencia(1, date(2026, 8, 10)) and en_ausencia(1, date(2026, 12, 24))
+    assert en_ausencia(2, date(2026, 10, 12)) and not en_ausencia(2, date(2026, 8, 10))
+    assert not en_ausencia(1, date(2026, 8, 17))
+    # El índice se rehace al cambiar el calendario
+    eliminar_turno(1, len(obtener_turnos_usuario(1)) - 1)
+    assert not en_ausencia(1, date(2026, 12, 24))
+    semanal, fecha = obtener_turnos_usuario(1)[:2]
+    assert es_recurrente(semanal) and not es_recurrente(fecha)
+
+
+def test_compactacion(calendario_tmp):
+    hoy = date(2026, 6, 15)
+    for dia, hora in (("lunes", "08:00"), ("2026-06-01", "09:00"), ("2026-06-10", "09:00"),
+                      ("rotacion:2026-01-05:11110000", "07:00"), ("2026-07-01", "09:00")):
+        agregar_turno(1, dia, hora, "entrada")
+    agregar_ausencia(1, "2026-05-01/2026-05-03")
+    agregar_ausencia(1, "2026-06-01/2026-06-20")
+    agregar_turno(2, "2026-01-01", "09:00", "entrada")
+    resultado = compactar_calendario(7, hoy)
+    assert resultado["turnos"] == 3 and resultado["usuarios"] == 1
+    dias = [t["dia"] for t in obtener_turnos_usuario(1)]
+    assert dias == ["lunes", "rotacion:2026-01-05:11110000", "2026-06-10", "2026-07-01", "2026-06-01/2026-06-20"]
+    assert compactar_calendario(7, hoy)["turnos"] == 0
+
+
+def test_proximos_turnos(calendario_tmp):
+    agregar_turno(1, "lunes", "08:00", "entrada")
+    agregar_turno(1, "domingo", "20:00", "entrada")
+    agregar_turno(1, "2026-10-20", "07:30", "entrada")
+    agregar_ausencia(1, "2026-10-26/2026-10-26")
+    # Domingo 18/10/2026 a las 21:00: lo siguiente es el lunes, tras dar la vuelta a la semana
+    ahora = datetime(2026, 10, 18, 21, 0)
+    proximos = [m.strftime("%a %d %H:%M") for m, _ in proximos_turnos(1, 4, ahora)]
+    assert proximos == ["Mon 19 08:00", "Tue 20 07:30", "Sun 25 20:00", "Sun 01 20:00"]
+    # Más allá del horizonte sigue generando
+    lejos = proximos_turnos(1, 2 * HORIZONTE_PROXIMOS, ahora)
+    assert len(lejos) == 2 * HORIZONTE_PROXIMOS and lejos == sorted(lejos, key=lambda x: x[0])
+
+
+def test_lugar_tiempo(calendario_tmp):
+    agregar_turno(1, "lunes", "08:00", "entrada")
+    guardar_lugar_tiempo(1, 40.42, -3.7, "Madrid, España")
+    guardar_lugar_tiempo(1, 37.39, -5.98, "Sevilla, España")
+    assert lugar_tiempo(1)["lugar"] == "Sevilla, España" and lugar_tiempo(2) is None
+    # Es un ajuste, no un turno
+    assert obtener_turnos_usuario(1) == [{"dia": "lunes", "hora": "08:00", "tipo": "entrada"}]
+    assert calendario.usuarios_calendario() == {1}
+    assert quitar_lugar_tiempo(1) and not quitar_lugar_tiempo(1)
+    assert calendario.CLAVE_AJUSTES not in calendario.cargar_calendario()
+
+
+def test_lugar_tiempo_en_fragmentos(calendario_tmp, monkeypatch):
+    guardar_lugar_tiempo(1, 40.42, -3.7, "Madrid, España")
+    guardar_lugar_tiempo(2, 37.39, -5.98, "Sevilla, España")
+    calendario.repartir_en_fragmentos(2)
+    monkeypatch.setattr(calendario, "CALENDARIO_FILE", calendario._ruta_fragmento(1, 2))
+    assert lugar_tiempo(1)["lugar"] == "Madrid, España" and lugar_tiempo(2) is None
+    guardar_lugar_tiempo(3, 41.39, 2.17, "Barcelona, España")
+    assert calendario.usuarios_calendario() == {1, 2, 3}
+    monkeypatch.setattr(calendario, "CALENDARIO_FILE", calendario.CALENDARIO_PRINCIPAL)
+    assert calendario.consolidar_fragmentos() == 2
+    assert [lugar_tiempo(u)["lugar"].split(",")[0] for u in (1, 2, 3)] == ["Madrid", "Sevilla", "Barcelona"]
+
+
+def test_recordatorio_lleva_la_ciudad(calendario_tmp):
+    agregar_turno(1, "lunes", "08:00", "entrada")
+    agregar_turno(2, "lunes", "08:00", "entrada")
+    guardar_lugar_tiempo(1, 40.42, -3.7, "Madrid, España")
+    # El lunes 19/10/2026 a las 07:50 tocan los dos recordatorios
+    ahora = datetime(2026, 10, 19, 7, 50)
+    turnos = {t["user_id"]: t["tiempo"] for t in calendario.obtener_turnos_ventanas(10, ahora=ahora)[0]}
+    assert turnos == {1: {"lugar": "Madrid, España", "lat": 40.42, "lon": -3.7}, 2: None}
+    assert compactar_calendario(7, date(2026, 10, 19))["turnos"] == 0 and lugar_tiempo(1)
+
+
+def test_usuarios_calendario_con_fragmentos(calendario_tmp, monkeypatch):
+    agregar_turno(1, "lunes", "08:00", "entrada")
+    agregar_turno(2, "lunes", "08:00", "entrada")
+    calendario.repartir_en_fragmentos(2)
+    # El worker del usuario 2 borra su único turno: calendario.json ya no cuenta
+    monkeypatch.setattr(calendario, "CALENDARIO_FILE", calendario._ruta_fragmento(0, 2))
+    eliminar_turno(2, 0)
+    assert calendario.usuarios_calendario() == {1}
@@ -0,0 +1,79 @@
+import csv
+import io
+from datetime import date, timedelta
+
+import calendario
+from calendario import TIPO_AUSENCIA
+from calendario_archivos import IMPORTAR_MAX_TURNOS, exportar_ics, leer_fichero
+
+CSV_TURNOS = (
+    "día;hora;tipo\n"
+    "lunes;08:00;entrada\n"
+    "Lunes;16:00;salida\n"
+    "20/03/2026;7:30;\n"
+    "rotación 05/01/2026 4x4;19:00;salida\n"
+    "24/12/2026 - 06/01/2027;;ausencia\n"
+    "martes;25:00;entrada\n"
+    "# comentario\n"
+    "jueves;09:00;descanso\n"
+)
+
+
+def _leer(nombre: str, texto: str):
+    return leer_fichero(nombre, io.BytesIO(texto.encode()))
+
+
+def test_csv():
+    turnos, errores, total, _ = _leer("turnos.csv", CSV_TURNOS)
+    assert len(turnos) == 5 and total == 2, (turnos, errores)
+    assert errores[0].startswith("línea 7: hora")
+
+
+def test_csv_campos_raros():
+    # Un campo entre comillas de varias líneas no descuadra la numeración; uno enorme no rompe la lectura
+    raro = 'lunes;08:00;entrada\n"martes\ny miércoles";09:00;entrada\nmartes;25:00;entrada\n'
+    _, errores, _, _ = _leer("raro.csv", raro)
+    assert [e.split(":")[0] for e in errores] == ["línea 2", "línea 4"]
+    enorme = f'lunes;08:00;entrada\n"{"x" * (csv.field_size_limit() + 1)}";09:00;entrada\n'
+    validos, errores, total, _ = _leer("enorme.csv", enorme)
+    assert len(validos) == 1 and total == 1 and errores[0].startswith("línea 2: CSV no válido")
+
+
+def test_exportar_e_importar_da_lo_mismo(calendario_tmp):
+    turnos, _, _, _ = _leer("turnos.csv", CSV_TURNOS)
+    assert calendario.agregar_turnos(1, turnos) == 5
+    assert calendario.agregar_turnos(1, turnos) == 0
+
+    exportado = "".join(exportar_ics(1, date(2026, 1, 1)))
+    assert all(len(linea.encode()) <= 75 for linea in exportado.split("\r\n"))
+    reimportados, errores, total, _ = _leer("turnos.ics", exportado)
+    assert total == 0, errores
+    calendario.agregar_turnos(2, reimportados)
+    assert calendario.obtener_turnos_usuario(2) == calendario.obtener_turnos_usuario(1)
+
+
+def test_ics_de_otra_aplicacion():
+    # Semanal con salida al día siguiente, diario cada 4 días, vacaciones de día completo y uno mensual
+    otro = "\r\n".join([
+        "BEGIN:VCALENDAR",
+        "BEGIN:VEVENT", "DTSTART;TZID=Europe/Madrid:20260105T220000", "DTEND;TZID=Europe/Madrid:20260106T060000",
+        "RRULE:FREQ=WEEKLY;BYDAY=MO,", " FR", "SUMMARY:Noche", "END:VEVENT",
+        "BEGIN:VEVENT", "DTSTART:20260107T070000", "RRULE:FREQ=DAILY;INTERVAL=4", "END:VEVENT",
+        "BEGIN:VEVENT", "DTSTART;VALUE=DATE:20260801", "DTEND;VALUE=DATE:20260817", "END:VEVENT",
+        "BEGIN:VEVENT", "DTSTART:20260107T070000", "RRULE:FREQ=MONTHLY", "END:VEVENT",
+        "END:VCALENDAR",
+    ])
+    turnos, errores, total, _ = _leer("otro.ics", otro)
+    claves = [(t["dia"], t["hora"], t["tipo"]) for t in turnos]
+    assert claves == [("lunes", "22:00", "entrada"), ("viernes", "22:00", "entrada"),
+                      ("martes", "06:00", "salida"), ("sábado", "06:00", "salida"),
+                      ("rotacion:2026-01-07:1000", "07:00", "entrada"),
+                      ("2026-08-01/2026-08-16", "", TIPO_AUSENCIA)]
+    assert total == 1 and "MONTHLY" in errores[0]
+
+
+def test_importacion_se_recorta_al_maximo():
+    filas = "".join(f"{(date(2027, 1, 1) + timedelta(days=k)).strftime('%d/%m/%Y')};08:00;entrada\n"
+                    for k in range(IMPORTAR_MAX_TURNOS + 220))
+    turnos, _, _, sobrantes = _leer("grande.csv", filas)
+    assert len(turnos) == IMPORTAR_MAX_TURNOS and sobrantes == 220
@@ -0,0 +1,65 @@
+import asyncio
+import time
+
+from telegram.error import RetryAfter
+
+import cola_envios
+from cola_envios import (
+    ENVIOS_RAFAGA_CHAT, PRIORIDAD_DIFUSION, PRIORIDAD_INTERACTIVA, PRIORIDAD_RECORDATORIO, LimitadorEnvios,
+)
+
+
+def test_rafagas_orden_por_chat_y_limites(monkeypatch, chats=20, mensajes=5):
+    monkeypatch.setattr(cola_envios, "ENVIOS_POR_SEGUNDO", 100)
+    limitador = LimitadorEnvios()
+    enviados: dict[int, list] = {c: [] for c in range(1, chats + 1)}
+    instantes: list[float] = []
+    fallo_hecho = set()
+
+    async def callback(chat_id, n, prioridad):
+        if n == 3 and chat_id == 1 and chat_id not in fallo_hecho:
+            fallo_hecho.add(chat_id)
+            raise RetryAfter(1)
+        instantes.append(time.monotonic())
+        enviados[chat_id].append(n)
+
+    async def chat(chat_id):
+        prioridad = PRIORIDAD_DIFUSION if chat_id % 2 else PRIORIDAD_INTERACTIVA
+        for n in range(mensajes):
+            await limitador.process_request(
+                callback, (chat_id, n, prioridad), {}, "sendMessage", {"chat_id": chat_id}, prioridad,
+            )
+
+    async def simular():
+        inicio = time.monotonic()
+        await asyncio.gather(*[chat(c) for c in enviados])
+        duracion = time.monotonic() - inicio
+        await limitador.shutdown()
+        return duracion
+
+    duracion = asyncio.run(simular())
+    assert all(lista == list(range(mensajes)) for lista in enviados.values()), enviados
+    # Ningún segundo supera el límite global más la ráfaga inicial
+    for i, t in enumerate(instantes):
+        assert sum(1 for u in instantes[i:] if u - t < 1) <= 2 * cola_envios.ENVIOS_POR_SEGUNDO
+    assert duracion >= (mensajes - ENVIOS_RAFAGA_CHAT) / cola_envios.ENVIOS_POR_SEGUNDO_CHAT * 0.9
+    assert limitador.reintentos == 1 and limitador.en_cola == 0
+
+
+def test_prioridades_con_el_limite_saturado():
+    # Interactivas antes que recordatorios, y estos antes que la difusión
+    orden = []
+
+    async def callback(chat_id, n, prioridad):
+        orden.append(prioridad)
+
+    async def simular():
+        limitador = LimitadorEnvios()
+        await asyncio.gather(*[
+            limitador.process_request(callback, (c, 0, p), {}, "sendMessage", {"chat_id": c}, p)
+            for c, p in enumerate([PRIORIDAD_DIFUSION, PRIORIDAD_INTERACTIVA, PRIORIDAD_RECORDATORIO] * 10, start=100)
+        ])
+        await limitador.shutdown()
+
+    asyncio.run(simular())
+    assert orden == sorted(orden)
@@ -0,0 +1,85 @@
+import asyncio
+import random
+from types import SimpleNamespace
+
+from concurrencia import ProcesadorPorUsuario
+
+
+def _update(user_id: int):
+    """Update mínimo para el procesador: solo necesita `effective_user`."""
+    return SimpleNamespace(effective_user=SimpleNamespace(id=user_id))
+
+
+def test_orden_por_usuario_y_limite_global(usuarios=5, mensajes=20, max_en_curso=4):
+    procesador = ProcesadorPorUsuario(max_en_curso)
+    rnd = random.Random(0)
+    procesados: dict[int, list[int]] = {u: [] for u in range(usuarios)}
+    por_usuario: dict[int, int] = {u: 0 for u in range(usuarios)}
+    en_curso, pico, solapados = 0, 0, []
+
+    async def handler(user_id: int, n: int):
+        nonlocal en_curso, pico
+        en_curso += 1
+        por_usuario[user_id] += 1
+        pico = max(pico, en_curso)
+        if por_usuario[user_id] > 1:
+            solapados.append(user_id)
+        await asyncio.sleep(rnd.uniform(0, 0.01))
+        procesados[user_id].append(n)
+        por_usuario[user_id] -= 1
+        en_curso -= 1
+
+    async def lanzar():
+        await asyncio.gather(*[
+            procesador.process_update(_update(u), handler(u, n)) for n in range(mensajes) for u in range(usuarios)
+        ])
+
+    asyncio.run(lanzar())
+    assert not solapados, "dos updates de un usuario a la vez"
+    assert all(orden == list(range(mensajes)) for orden in procesados.values()), procesados
+    # Con más usuarios que huecos, el límite se llega a usar entero pero no se supera
+    assert pico == max_en_curso
+    assert procesador.usuarios_en_curso == 0
+
+
+def test_usuarios_distintos_en_paralelo():
+    # El primero espera algo que solo hace el segundo
+    async def comprobar():
+        procesador = ProcesadorPorUsuario(2)
+        senal = asyncio.Event()
+
+        async def espera():
+            await senal.wait()
+
+        async def avisa():
+            senal.set()
+
+        primero = asyncio.create_task(procesador.process_update(_update(1), espera()))
+        await asyncio.sleep(0)
+        await asyncio.wait_for(procesador.process_update(_update(2), avisa()), timeout=1)
+        await asyncio.wait_for(primero, timeout=1)
+
+    asyncio.run(comprobar())
+
+
+def test_cola_de_un_usuario_no_ocupa_huecos(max_en_curso=2, en_cola=10):
+    async def comprobar():
+        procesador = ProcesadorPorUsuario(max_en_curso)
+        bloqueo = asyncio.Event()
+
+        async def lento():
+            await bloqueo.wait()
+
+        async def rapido():
+            pass
+
+        cola = [asyncio.create_task(procesador.process_update(_update(1), lento())) for _ in range(en_cola)]
+        await asyncio.sleep(0)
+        # El usuario 1 tiene un update en curso y el resto esperando su turno: el 2 entra igualmente
+        await asyncio.wait_for(procesador.process_update(_update(2), rapido()), timeout=1)
+        assert procesador.usuarios_en_curso == 1
+        bloqueo.set()
+        await asyncio.wait_for(asyncio.gather(*cola), timeout=1)
+        assert procesador.usuarios_en_curso == 0
+
+    asyncio.run(comprobar())
@@ -0,0 +1,49 @@
+import asyncio
+from collections import Counter
+from types import SimpleNamespace
+
+from telegram.error import Forbidden
+
+import difusion
+from difusion import PENDIENTE, formatear_difusion, reanudar
+
+
+def test_corte_y_reanudacion_sin_repetir(tmp_path, monkeypatch, usuarios=200):
+    # Difunde a usuarios falsos y corta a mitad, como un reinicio
+    monkeypatch.setattr(difusion, "DIFUSION_FILE", tmp_path / "difusion.db")
+    monkeypatch.setattr(difusion, "_conexion", None)
+    monkeypatch.setattr(difusion, "_tarea", None)
+    recibidos: Counter = Counter()
+
+    async def send_message(chat_id, text, **kwargs):
+        await asyncio.sleep(0.005)
+        if chat_id % 10 == 0:
+            raise Forbidden("Forbidden: bot was blocked by the user")
+        if chat_id > 0:  # el admin (-1) recibe el informe final
+            recibidos[chat_id] += 1
+
+    app = SimpleNamespace(bot=SimpleNamespace(send_message=send_message))
+    db = difusion._db()
+    difusion_id = db.execute("INSERT INTO difusiones (texto, admin_chat, creada) VALUES ('hola', -1, 0)").lastrowid
+    db.executemany("INSERT INTO destinatarios VALUES (?, ?, ?, NULL)",
+                   [(difusion_id, uid, PENDIENTE) for uid in range(1, usuarios + 1)])
+    db.commit()
+
+    async def simular():
+        difusion._lanzar(app, difusion_id)
+        await asyncio.sleep(0.02)
+        difusion._tarea.cancel()
+        await asyncio.gather(difusion._tarea, return_exceptions=True)
+        a_medias = sum(recibidos.values())
+        assert 0 < a_medias < usuarios
+        assert await reanudar(app) is None, "no debe retomarse con actividad reciente"
+        assert await reanudar(app, forzar=True) == difusion_id
+        await difusion._tarea
+
+    try:
+        asyncio.run(simular())
+        assert set(recibidos.values()) == {1}, "algún usuario lo recibió dos veces"
+        assert len(recibidos) == usuarios - usuarios // 10
+        assert f"Bloqueados: {usuarios // 10}" in formatear_difusion(difusion_id)
+    finally:
+        difusion._conexion.close()
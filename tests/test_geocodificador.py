@@ -0,0 +1,40 @@
+import pytest
+
+import geocodificador
+
+
+def _fila(nombre: str, ascii_: str, lat: float, lon: float, pais: str, poblacion: int) -> str:
+    campos = [""] * 19
+    campos[1], campos[2], campos[4], campos[5], campos[8], campos[14] = (
+        nombre, ascii_, str(lat), str(lon), pais, str(poblacion))
+    return "\t".join(campos) + "\n"
+
+
+@pytest.fixture
+def indice(tmp_path, monkeypatch):
+    """Índice con tres ciudades; el de módulo se restaura al terminar."""
+    for nombre in ("_claves", "_ciudad_de_clave", "_lat", "_lon", "_nombres", "_cargado"):
+        monkeypatch.setattr(geocodificador, nombre, getattr(geocodificador, nombre))
+    ruta = tmp_path / "ciudades.txt"
+    ruta.write_text(
+        _fila("Córdoba", "Cordoba", 37.88, -4.77, "ES", 325000)
+        + _fila("Córdoba", "Cordoba", -31.41, -64.18, "AR", 1400000)
+        + _fila("Málaga", "Malaga", 36.72, -4.42, "ES", 570000)
+        + "línea incompleta\n",
+        encoding="utf-8",
+    )
+    assert geocodificador.cargar_indice(ruta) == 3
+
+
+def test_buscar(indice):
+    # A igual nombre gana la más poblada, salvo que se indique el país
+    assert geocodificador.buscar("cordoba") == (-31.41, -64.18, "Córdoba, AR")
+    assert geocodificador.buscar("Córdoba, es") == (37.88, -4.77, "Córdoba, ES")
+    assert geocodificador.buscar("  MALAGA ")[2] == "Málaga, ES"
+    assert geocodificador.buscar("Sevilla") is None
+
+
+def test_sin_fichero(tmp_path, monkeypatch):
+    monkeypatch.setattr(geocodificador, "_cargado", False)
+    assert geocodificador.cargar_indice(tmp_path / "no_existe.txt") == 0
+    assert geocodificador.indice_cargado()
@@ -0,0 +1,27 @@
+import asyncio
+
+import cache_bandas
+import indice_artistas
+
+
+def _info(nombre, mbid):
+    return {"nombre": nombre, "mbid": mbid, "tipo": "Group", "pais": "ES", "inicio": "1990"}
+
+
+def test_carga_unica_y_registro_incremental(monkeypatch):
+    monkeypatch.setattr(indice_artistas, "_entradas", [])
+    monkeypatch.setattr(indice_artistas, "_mbids", set())
+    monkeypatch.setattr(indice_artistas, "_cargado", False)
+    guardados = [_info("Extremoduro", "1"), _info("Extrechinato", "2"), _info("Marea", "3"), _info("Extremoduro", "1")]
+    monkeypatch.setattr(cache_bandas, "artistas_guardados", lambda: iter(guardados))
+    # Registrado antes de la carga: no se duplica
+    indice_artistas.registrar_artista(_info("Marea", "3"))
+    asyncio.run(indice_artistas.cargar_indice())
+    assert indice_artistas.total_artistas() == 3
+    assert [n for n, _, _ in indice_artistas.buscar_prefijo("extr")] == ["Extrechinato", "Extremoduro"]
+    # La segunda carga no vuelve a leer la caché
+    monkeypatch.setattr(cache_bandas, "artistas_guardados", lambda: iter([_info("Extra", "4")]))
+    asyncio.run(indice_artistas.cargar_indice())
+    indice_artistas.registrar_artista(_info("Extraperlo", "5"))
+    assert [n for n, _, _ in indice_artistas.buscar_prefijo("EXTR")] == ["Extraperlo", "Extrechinato", "Extremoduro"]
+    assert indice_artistas.buscar_prefijo("extr", limite=1)[0][1] == "5"
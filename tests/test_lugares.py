@@ -0,0 +1,34 @@
+from array import array
+from collections import defaultdict
+
+import pytest
+
+import lugares
+from lugares import lugar_cercano, registrar_lugares, total_lugares
+
+
+@pytest.fixture(autouse=True)
+def indice_vacio(monkeypatch):
+    monkeypatch.setattr(lugares, "_lat", array("d"))
+    monkeypatch.setattr(lugares, "_lon", array("d"))
+    monkeypatch.setattr(lugares, "_nombres", [])
+    monkeypatch.setattr(lugares, "_por_posicion", {})
+    monkeypatch.setattr(lugares, "_celdas", defaultdict(list))
+
+
+def test_lugar_cercano():
+    assert lugar_cercano(40.4, -3.7) is None
+    registrar_lugares([(40.4168, -3.7038, "Madrid"), (40.4818, -3.3643, "Alcalá de Henares")])
+    assert lugar_cercano(40.42, -3.70)[2] == "Madrid"
+    assert lugar_cercano(40.47, -3.37)[2] == "Alcalá de Henares"
+    # Fuera del radio no hay lugar, aunque esté en una celda vecina
+    assert lugar_cercano(40.45, -3.55) is None
+    assert lugar_cercano(40.45, -3.55, radio_km=20)[2] == "Madrid"
+
+
+def test_una_entrada_por_posicion():
+    # Dos homónimos en sitios distintos son dos lugares; la misma posición, uno
+    registrar_lugares([(42.60, -5.57, "San Andrés, ES"), (28.47, -16.25, "San Andrés, ES"),
+                       (42.60, -5.57, "San Andrés del Rabanedo, ES")])
+    assert total_lugares() == 2
+    assert lugar_cercano(42.60, -5.57)[2] == "San Andrés, ES"
@@ -0,0 +1,51 @@
+from itertools import count
+
+from telegram import Bot, Update
+
+from pendientes import compactar, espera_texto
+
+_bot = Bot("1:a")
+_ids = count(1)
+
+
+def _mensaje(user_id: int, **campos) -> Update:
+    return Update.de_json({"update_id": next(_ids), "message": {
+        "message_id": 1, "date": 0, "chat": {"id": user_id, "type": "private"},
+        "from": {"id": user_id, "is_bot": False, "first_name": "U"}, **campos,
+    }}, _bot)
+
+
+def _boton(user_id: int) -> Update:
+    return Update.de_json({"update_id": next(_ids), "callback_query": {
+        "id": "x", "chat_instance": "x", "data": "ms",
+        "from": {"id": user_id, "is_bot": False, "first_name": "U"},
+    }}, _bot)
+
+
+def _lote() -> list[Update]:
+    return [
+        _mensaje(1, text="/tiempo Madrid"), _mensaje(1, text="/tiempo Madrid"), _boton(1),
+        _mensaje(1, text="/banda Queen"), _mensaje(1, text="/tiempo@bot_falso Sevilla"),
+        _mensaje(2, text="hola"), _mensaje(2, text="¿hay alguien?"), _boton(2), _boton(2),
+        _mensaje(2, location={"latitude": 40.4, "longitude": -3.7}),
+        _mensaje(3, text="/start"),
+        # El 4 estaba añadiendo un turno: el día y la hora son dos pasos del mismo flujo
+        _mensaje(4, text="15/03/2026"), _mensaje(4, text="08:00"),
+    ]
+
+
+def test_espera_texto():
+    assert espera_texto({"cal_paso": "dia"}) and espera_texto({"esperando_banda": True})
+    assert not espera_texto({"cal_paso": None, "esperando_ciudad": False})
+
+
+def test_compactar():
+    conservados, descartados = compactar(_lote(), en_flujo={4})
+    textos = [(u.effective_user.id, u.message.text or "📍") for u in conservados]
+    assert textos == [(1, "/banda Queen"), (1, "/tiempo@bot_falso Sevilla"), (2, "¿hay alguien?"),
+                      (2, "📍"), (3, "/start"), (4, "15/03/2026"), (4, "08:00")]
+    assert descartados == {"botones e inline": 3, "repetidos": 3}
+
+
+def test_compactar_sin_flujo_deja_el_ultimo_texto():
+    assert [u.message.text for u in compactar(_lote())[0] if u.effective_user.id == 4] == ["08:00"]
@@ -0,0 +1,38 @@
+import asyncio
+import time
+
+from perfilado import informe_memoria, parar_memoria, perfilar
+
+
+def trabajo_caliente():
+    return sum(i * i for i in range(300000))
+
+
+def test_perfil_encuentra_el_trabajo_de_cpu():
+    async def carga():
+        fin = time.monotonic() + 1
+        while time.monotonic() < fin:
+            trabajo_caliente()
+            await asyncio.sleep(0.001)
+
+    async def perfilar_carga():
+        tarea = asyncio.create_task(carga())
+        pilas, _ = await perfilar(1)
+        await tarea
+        return pilas
+
+    assert any("trabajo_caliente" in pila for pila in asyncio.run(perfilar_carga()))
+
+
+def test_informe_memoria_muestra_la_mayor_asignacion():
+    async def informes():
+        await informe_memoria()
+        basura = [bytearray(1000) for _ in range(2000)]
+        informe = await informe_memoria()
+        del basura
+        return informe
+
+    try:
+        assert "test_perfilado.py" in asyncio.run(informes()).split("\n")[5]
+    finally:
+        assert parar_memoria()
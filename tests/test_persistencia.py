@@ -0,0 +1,34 @@
+import asyncio
+from datetime import date
+
+from persistencia import PersistenciaUsuarios, estados_guardados
+
+
+def test_estados_guardados_sin_persistencia_abierta(tmp_path):
+    ruta = tmp_path / "estado.db"
+    assert estados_guardados([1], ruta) == {}
+
+    async def guardar():
+        persistencia = PersistenciaUsuarios(ruta)
+        await persistencia.update_user_data(1, {"cal_paso": "dia"})
+        await persistencia.update_user_data(2, {"esperando_ciudad": True})
+        await persistencia.flush()
+
+    asyncio.run(guardar())
+    assert estados_guardados([1, 3], ruta) == {1: {"cal_paso": "dia"}}
+    # Caducado: como si no hubiera estado
+    assert estados_guardados([1, 2], ruta, ttl_minutos=-1) == {}
+
+
+def test_valores_no_json_no_rompen_el_guardado(tmp_path):
+    ruta = tmp_path / "estado.db"
+
+    async def guardar():
+        persistencia = PersistenciaUsuarios(ruta)
+        await persistencia.update_user_data(1, {"fecha": date(2026, 10, 19), 5: "x", (1, 2): "tupla"})
+        await persistencia.update_user_data(2, {"cal_paso": "hora"})
+        await persistencia.flush()
+
+    asyncio.run(guardar())
+    assert estados_guardados([1, 2], ruta) == {1: {"fecha": "datetime.date(2026, 10, 19)", "5": "x"},
+                                               2: {"cal_paso": "hora"}}
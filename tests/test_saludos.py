@@ -0,0 +1,27 @@
+import pytest
+
+from saludos import BANDA, SALUDO, TIEMPO, TURNOS, clasificar
+
+
+@pytest.mark.parametrize("texto, esperado", [
+    ("Hola", (SALUDO, "¡Hola! 👋 ¿Cómo estás?")),
+    ("BUENOS DÍAS!!", (SALUDO, "¡Buenos días! ☀️")),
+    # Falsos positivos del recorrido con `saludo in texto`
+    ("this is it", None),
+    ("they said", None),
+    ("chocolate", None),
+    ("¿Qué tiempo hace en San Sebastián?", (TIEMPO, "San Sebastián")),
+    ("hola, tiempo en Málaga", (TIEMPO, "Málaga")),
+    ("Busca la banda Héroes del   Silencio", (BANDA, "Héroes del Silencio")),
+    ("hola! info del grupo Queen", (BANDA, "Queen")),
+    # "banda" o "grupo" sueltos no buscan nada
+    ("Banda Héroes del Silencio", None),
+    ("grupo de trabajo", None),
+    ("discografía de Extremoduro", (BANDA, "Extremoduro")),
+    ("mi banda favorita es Queen", None),
+    ("mis turnos", (TURNOS, "")),
+    ("hey, mis   turnos?", (TURNOS, "")),
+])
+def test_clasificar(texto, esperado):
+    r = clasificar(texto)
+    assert (None if r is None else (r[0], r[2] if r[0] != SALUDO else r[1])) == esperado
@@ -0,0 +1,22 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import vigilancia
+
+
+def test_bloqueo_del_bucle_se_detecta(monkeypatch):
+    monkeypatch.setattr(vigilancia, "_bloqueos", 0)
+
+    async def bloquear():
+        app = SimpleNamespace(update_queue=asyncio.Queue(), update_processor=None, running=True,
+                              bot=SimpleNamespace(rate_limiter=None), add_handler=lambda *a, **k: None)
+        await vigilancia.iniciar(app, puerto=0)
+        await asyncio.sleep(0.5)
+        time.sleep(0.6)
+        await asyncio.sleep(0.5)
+        return vigilancia.estado()
+
+    datos = asyncio.run(bloquear())
+    assert vigilancia._bloqueos == 1
+    assert datos["lag_ms"]["maximo"] >= 500
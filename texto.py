@@ -0,0 +1,14 @@
+"""
+Utilidades de texto compartidas por los índices de búsqueda
+(geocodificador local y sugerencias de artistas).
+"""
+import unicodedata
+
+
+def normalizar(texto: str) -> str:
+    """Pasa a minúsculas, quita acentos y espacios repetidos."""
+    if texto.isascii():
+        return " ".join(texto.lower().split())
+    descompuesto = unicodedata.normalize("NFKD", texto)
+    sin_acentos = "".join(c for c in descompuesto if not unicodedata.combining(c))
+    return " ".join(sin_acentos.lower().split())
@@ -1,16 +1,29 @@
 """
 Módulo de consulta del tiempo usando Open-Meteo.
 """
+import os
+import time
+import asyncio
 import httpx
 from telegram import Update
 from telegram.ext import ContextTypes
 
 from acceso import control_acceso
 from estadisticas import registrar
+import geocodificador
+import lugares
 
 # API del tiempo (Open-Meteo, gratuita, sin API key)
-OPEN_METEO_URL = "https://api.open-meteo.com/v1/forecast"
-GEOCODING_URL = "https://geocoding-api.open-meteo.com/v1/search"
+OPEN_METEO_URL = os.getenv("OPEN_METEO_URL", "https://api.open-meteo.com/v1/forecast")
+GEOCODING_URL = os.getenv("GEOCODING_URL", "https://geocoding-api.open-meteo.com/v1/search")
+
+# Caché de previsiones por coordenadas (redondeadas a ~100 m)
+CACHE_TIEMPO_SEGUNDOS = int(os.getenv("CACHE_TIEMPO_SEGUNDOS", "600"))
+_cache_tiempo: dict[tuple[float, float], tuple[float, dict]] = {}
+
+# Evita que dos primeras consultas simultáneas carguen el índice local dos veces
+_carga_indice = asyncio.Lock()
+_indice_local_listo = False
 
 # Mapeo de códigos WMO a emojis/descripciones
 WMO_CODES = {
@@ -42,7 +55,13 @@ WMO_CODES = {
 
 
 async def obtener_tiempo(lat: float, lon: float) -> dict | None:
-    """Consulta Open-Meteo y devuelve tiempo actual + previsión horaria."""
+    """Consulta Open-Meteo y devuelve tiempo actual + previsión horaria.
+    Reutiliza la respuesta si hay una reciente para las mismas coordenadas."""
+    clave = (round(lat, 3), round(lon, 3))
+    cacheado = _cache_tiempo.get(clave)
+    if cacheado and time.monotonic() - cacheado[0] < CACHE_TIEMPO_SEGUNDOS:
+        return cacheado[1]
+
     async with httpx.AsyncClient(timeout=15) as client:
         resp = await client.get(
             OPEN_METEO_URL,
@@ -56,11 +75,44 @@ async def obtener_tiempo(lat: float, lon: float) -> dict | None:
             },
         )
         resp.raise_for_status()
-        return resp.json()
+        data = resp.json()
+
+    # Purgar entradas caducadas para que la caché no crezca sin límite
+    ahora = time.monotonic()
+    for k in [k for k, (t, _) in _cache_tiempo.items() if ahora - t >= CACHE_TIEMPO_SEGUNDOS]:
+        del _cache_tiempo[k]
+    _cache_tiempo[clave] = (ahora, data)
+    return data
+
+
+def _cargar_indice_local():
+    """Carga el geocodificador local y registra sus ciudades como lugares conocidos."""
+    if not geocodificador.indice_cargado():
+        geocodificador.cargar_indice()
+    lugares.registrar_lugares(geocodificador.ciudades())
+
+
+async def _asegurar_indice_local():
+    """Carga el geocodificador local (si está configurado) y lo indexa como lugares conocidos."""
+    global _indice_local_listo
+    if _indice_local_listo or not geocodificador.activo():
+        return
+    async with _carga_indice:
+        if not _indice_local_listo:
+            # ~150k lugares: fuera del event loop para no bloquear al resto de usuarios
+            await asyncio.to_thread(_cargar_indice_local)
+            _indice_local_listo = True
 
 
 async def geocodificar(ciudad: str) -> tuple[float, float, str] | None:
-    """Busca coordenadas de una ciudad. Devuelve (lat, lon, nombre_completo)."""
+    """Busca coordenadas de una ciudad. Devuelve (lat, lon, nombre_completo).
+    Usa primero el índice local (si está configurado) y solo consulta la API si no lo encuentra."""
+    if geocodificador.activo():
+        await _asegurar_indice_local()
+        local = geocodificador.buscar(ciudad)
+        if local:
+            return local
+
     async with httpx.AsyncClient(timeout=10) as client:
         resp = await client.get(
             GEOCODING_URL,
@@ -76,6 +128,7 @@ async def geocodificar(ciudad: str) -> tuple[float, float, str] | None:
         pais = r.get("country", "")
         admin = r.get("admin1", "")
         nombre_completo = f"{nombre}, {admin}, {pais}" if admin else f"{nombre}, {pais}"
+        lugares.registrar_lugar(r["latitude"], r["longitude"], nombre_completo)
         return r["latitude"], r["longitude"], nombre_completo
 
 
@@ -119,6 +172,22 @@ def formatear_tiempo(data: dict, ubicacion: str) -> str:
     return "\n".join(lineas)
 
 
+def formatear_tiempo_breve(data: dict, ubicacion: str, horas: int = 3) -> str:
+    """Resumen corto para adjuntar a un recordatorio de turno."""
+    current = data.get("current", {})
+    hourly = data.get("hourly", {})
+    emoji, desc = WMO_CODES.get(current.get("weather_code", 0), ("❓", "Desconocido"))
+    linea = f"{emoji} {ubicacion}: {current.get('temperature_2m', '?')}°C, {desc.lower()}"
+
+    temps = [t for t in hourly.get("temperature_2m", [])[:horas] if t is not None]
+    precip = [p for p in hourly.get("precipitation_probability", [])[:horas] if p is not None]
+    if temps:
+        linea += f"\n🕒 Próximas {horas} h: {min(temps)}–{max(temps)}°C"
+        if precip and max(precip) > 0:
+            linea += f", 🌧 {max(precip)}%"
+    return linea
+
+
 async def enviar_tiempo(update_or_query, lat: float, lon: float, ubicacion: str, es_boton: bool = False, get_main_keyboard_func=None):
     """Obtiene y envía el tiempo. Funciona tanto con mensajes como con botones."""
     try:
@@ -180,4 +249,12 @@ async def ubicacion_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     loc = update.message.location
     await update.message.reply_text("🔍 Consultando el tiempo en tu ubicación...")
-    await enviar_tiempo(update.message, loc.latitude, loc.longitude, "Tu ubicación")
+
+    # Ajustar al lugar conocido más cercano para dar un nombre y reutilizar su previsión
+    await _asegurar_indice_local()
+    cercano = lugares.lugar_cercano(loc.latitude, loc.longitude)
+    if cercano:
+        lat, lon, nombre = cercano
+        await enviar_tiempo(update.message, lat, lon, f"Cerca de {nombre}")
+    else:
+        await enviar_tiempo(update.message, loc.latitude, loc.longitude, "Tu ubicación")
@@ -0,0 +1,214 @@
+"""
+Módulo de vigilancia del bucle de eventos y endpoint de salud.
+Mide continuamente el retraso (lag) del bucle asyncio; si se bloquea más de
+LAG_UMBRAL_MS, un hilo aparte imprime la pila del código que lo bloquea.
+Un pequeño servidor HTTP local (en su propio hilo, para responder aunque el
+bucle esté bloqueado) publica el estado:
+
+    GET /salud   200 si el bucle responde, 503 si lleva bloqueado SALUD_MAX_BLOQUEO s
+    GET /listo   200 si además la aplicación está en marcha y el último poll es reciente
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import threading
+import traceback
+from collections import deque
+from telegram import Update
+from telegram.ext import TypeHandler
+from telegram.request import HTTPXRequest
+
+import cola_musicbrainz
+
+# Puerto del endpoint de salud (0 = desactivado). Los workers usan SALUD_PUERTO + 1 + k
+SALUD_HOST = os.getenv("SALUD_HOST", "127.0.0.1")
+SALUD_PUERTO = int(os.getenv("SALUD_PUERTO", "8081"))
+# Lag a partir del cual se avisa y se captura la pila
+LAG_UMBRAL_MS = int(os.getenv("LAG_UMBRAL_MS", "250"))
+# Cada cuántos segundos se mide el lag
+LAG_INTERVALO = 0.25
+# Segundos de bloqueo a partir de los cuales /salud responde 503
+SALUD_MAX_BLOQUEO = 5
+# Segundos sin un getUpdates correcto a partir de los cuales /listo responde 503
+SALUD_MAX_SIN_POLL = 60
+
+# Últimas mediciones de lag (segundos)
+_lags: deque[float] = deque(maxlen=240)
+_lag_maximo = 0.0
+_bloqueos = 0
+_latido = time.monotonic()
+_hilo_bucle: int | None = None
+_tarea_lag: asyncio.Task | None = None
+_app = None
+_requiere_poll = False
+_inicio = time.time()
+# Instantes (epoch) del último getUpdates correcto y del último update recibido
+ultimo_poll: float | None = None
+ultimo_update: float | None = None
+
+
+class PeticionPoll(HTTPXRequest):
+    """Petición HTTP para getUpdates que anota cuándo fue el último poll correcto."""
+
+    def __init__(self):
+        super().__init__(connection_pool_size=1)
+
+    async def do_request(self, *args, **kwargs):
+        global ultimo_poll
+        codigo, cuerpo = await super().do_request(*args, **kwargs)
+        if codigo == 200:
+            ultimo_poll = time.time()
+        return codigo, cuerpo
+
+
+async def _anotar_update(update, context):
+    """Registra la llegada de un update (sirve en modo webhook, donde no hay polls)."""
+    global ultimo_update
+    ultimo_update = time.time()
+
+
+# --- Medición del lag ---
+
+async def _medir_lag():
+    """Duerme LAG_INTERVALO y mide cuánto tarda de más en despertar."""
+    global _latido, _lag_maximo
+    loop = asyncio.get_running_loop()
+    while True:
+        inicio = loop.time()
+        await asyncio.sleep(LAG_INTERVALO)
+        lag = max(0.0, loop.time() - inicio - LAG_INTERVALO)
+        _latido = time.monotonic()
+        _lags.append(lag)
+        _lag_maximo = max(_lag_maximo, lag)
+        if lag * 1000 >= LAG_UMBRAL_MS:
+            print(f"🐢 Lag del bucle de eventos: {lag * 1000:.0f} ms")
+
+
+def _vigilar():
+    """Hilo que detecta el bucle bloqueado e imprime la pila del código que lo bloquea."""
+    global _bloqueos
+    reportado = None
+    while True:
+        time.sleep(LAG_INTERVALO / 2)
+        latido = _latido
+        bloqueado = time.monotonic() - latido - LAG_INTERVALO
+        if bloqueado * 1000 < LAG_UMBRAL_MS or reportado == latido:
+            continue
+        reportado = latido
+        _bloqueos += 1
+        marco = sys._current_frames().get(_hilo_bucle)
+        # Se omiten los marcos internos de asyncio: interesa el handler que bloquea
+        marcos = [m for m in traceback.extract_stack(marco) if f"{os.sep}asyncio{os.sep}" not in m.filename] if marco else []
+        pila = "".join(traceback.format_list(marcos)) or "(pila no disponible)\n"
+        print(f"🐢 Bucle de eventos bloqueado más de {bloqueado * 1000:.0f} ms. Pila actual:\n{pila}", end="")
+
+
+# --- Estado ---
+
+def _percentil(valores: list[float], p: float) -> float:
+    return valores[min(len(valores) - 1, int(len(valores) * p))] if valores else 0.0
+
+
+def estado() -> dict:
+    """Resumen del estado del proceso para el endpoint de salud."""
+    ahora = time.time()
+    lags = sorted(_lags)
+    colas = {"musicbrainz": cola_musicbrainz.posicion_en_cola(cola_musicbrainz.PRIORIDAD_FONDO)}
+    if _app is not None:
+        colas["updates"] = _app.update_queue.qsize()
+        procesador = _app.update_processor
+        colas["usuarios_en_curso"] = getattr(procesador, "usuarios_en_curso", 0)
+        colas["envios"] = getattr(_app.bot.rate_limiter, "en_cola", 0)
+
+    return {
+        "vivo": time.monotonic() - _latido < SALUD_MAX_BLOQUEO,
+        "en_marcha": bool(_app is not None and _app.running),
+        "lag_ms": {
+            "actual": round((_lags[-1] if _lags else 0) * 1000, 1),
+            "p50": round(_percentil(lags, 0.5) * 1000, 1),
+            "p99": round(_percentil(lags, 0.99) * 1000, 1),
+            "maximo": round(_lag_maximo * 1000, 1),
+        },
+        "bloqueos": _bloqueos,
+        "colas": colas,
+        "segundos_desde_poll": round(ahora - ultimo_poll, 1) if ultimo_poll else None,
+        "segundos_desde_update": round(ahora - ultimo_update, 1) if ultimo_update else None,
+        "segundos_en_marcha": round(ahora - _inicio),
+    }
+
+
+def listo(datos: dict) -> bool:
+    """El bot está listo si el bucle responde, la aplicación corre y (en polling) el poll es reciente."""
+    if not (datos["vivo"] and datos["en_marcha"]):
+        return False
+    if not _requiere_poll:
+        return True
+    sin_poll = datos["segundos_desde_poll"]
+    return sin_poll is not None and sin_poll < SALUD_MAX_SIN_POLL
+
+
+def _abrir_servidor(puerto: int):
+    """Servidor HTTP de salud (http.server solo se importa si el endpoint está activo)."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class ManejadorSalud(BaseHTTPRequestHandler):
+        def do_GET(self):
+            datos = estado()
+            if self.path.startswith("/salud"):
+                ok = datos["vivo"]
+            elif self.path.startswith("/listo"):
+                ok = listo(datos)
+            else:
+                self.send_error(404)
+                return
+            cuerpo = json.dumps(datos, ensure_ascii=False).encode()
+            self.send_response(200 if ok else 503)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(cuerpo)))
+            self.end_headers()
+            self.wfile.write(cuerpo)
+
+        def log_message(self, *args):
+            pass
+
+    return ThreadingHTTPServer((SALUD_HOST, puerto), ManejadorSalud)
+
+
+async def iniciar(app, puerto: int = SALUD_PUERTO, requiere_poll: bool = False):
+    """Arranca la medición de lag y el endpoint de salud en el bucle actual.
+
+    Args:
+        app: Aplicación cuyas colas se publican
+        puerto: Puerto del endpoint de salud (0 = sin endpoint)
+        requiere_poll: Si /listo exige un getUpdates reciente (modo polling)
+    """
+    global _app, _hilo_bucle, _latido, _requiere_poll, _tarea_lag
+    _app = app
+    _requiere_poll = requiere_poll
+    _hilo_bucle = threading.get_ident()
+    _latido = time.monotonic()
+    app.add_handler(TypeHandler(Update, _anotar_update), group=-100)
+    _tarea_lag = asyncio.get_running_loop().create_task(_medir_lag())
+    threading.Thread(target=_vigilar, name="vigilancia-lag", daemon=True).start()
+    if puerto:
+        try:
+            servidor = _abrir_servidor(puerto)
+        except OSError as e:
+            print(f"⚠️ No se pudo abrir el endpoint de salud en {SALUD_HOST}:{puerto}: {e}")
+        else:
+            threading.Thread(target=servidor.serve_forever, name="salud", daemon=True).start()
+            print(f"🩺 Salud en http://{SALUD_HOST}:{puerto}/salud y /listo")
+
+
+def activar(app, puerto: int = SALUD_PUERTO, requiere_poll: bool = False):
+    """Programa `iniciar` para cuando run_polling/run_webhook inicialicen la aplicación."""
+    post_init_previo = app.post_init
+
+    async def post_init(application):
+        await iniciar(application, puerto, requiere_poll)
+        if post_init_previo:
+            await post_init_previo(application)
+
+    app.post_init = post_init